@@ -1,4 +1,5 @@
-from fastapi import FastAPI, HTTPException, BackgroundTasks
+from fastapi import FastAPI, HTTPException
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
 from typing import Optional, Dict, Any
@@ -8,9 +9,12 @@ import uuid
 import json
 import os
 import time
+from concurrent.futures import ThreadPoolExecutor
 from fastapi.staticfiles import StaticFiles
 from fastapi.responses import FileResponse
-from video_transcriber import VideoTranscriber
+from job_queue import JobQueue, QueueFullError
+from job_store import create_job_store
+from video_transcriber import VideoTranscriber, WHISPER_ALLOWED_MODELS
 
 # Initialize global transcriber instance
 print("Initializing VideoTranscriber...")
@@ -43,15 +47,21 @@ class TranscriptionRequest(BaseModel):
     language: str = "it"
     save_to_db: bool = True
     recaptcha_token: Optional[str] = None
+    model: Optional[str] = None  # Modelo Whisper (None = WHISPER_MODEL)
+    force: bool = False  # Ignorar la caché de resultados y volver a transcribir
 
 class CreateReelRequest(BaseModel):
     url: str
     language: str = "it"
+    model: Optional[str] = None  # Modelo Whisper (None = WHISPER_MODEL)
+    force: bool = False  # Ignorar la caché de resultados y volver a transcribir
 
 class TranscriptionResponse(BaseModel):
     id: str
     status: str
     message: str
+    queue_position: Optional[int] = None  # 1 = el siguiente en empezar
+    estimated_start: Optional[float] = None  # Hora estimada de inicio (epoch, segundos)
 
 class TranscriptionStatus(BaseModel):
     id: str
@@ -59,9 +69,42 @@ class TranscriptionStatus(BaseModel):
     progress: int
     result: Optional[Dict[str, Any]] = None
     error: Optional[str] = None
+    message: Optional[str] = None
+    branches: Optional[Dict[str, Any]] = None  # Ramas en paralelo del flujo de reels (subida / transcripción)
+    queue_position: Optional[int] = None  # Posición en la cola mientras espera (None al empezar)
+    estimated_start: Optional[float] = None  # Hora estimada de inicio (epoch, segundos)
+
+# Almacén de trabajos: estado y resultado por separado, con caducidad (JOB_STORE / JOB_TTL_SECONDS)
+jobs = create_job_store()
+
+# Cola de trabajos: cuántos se ejecutan a la vez, cuántos pueden esperar y duración inicial estimada (segundos)
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+JOB_QUEUE_MAX_DEPTH = int(os.getenv("JOB_QUEUE_MAX_DEPTH", "20"))
+JOB_INITIAL_DURATION = float(os.getenv("JOB_INITIAL_DURATION", "120"))
+
+# Escrituras del estado de la cola fuera del loop de eventos; un solo hilo las aplica en orden
+queue_publisher = ThreadPoolExecutor(max_workers=1, thread_name_prefix="queue-publish")
+
+def publish_queue(waiting):
+    """Guarda en el almacén la posición y la hora estimada de inicio de cada trabajo en espera (en una transacción)"""
+    now = time.time()
+    updates = {job_id: {"queue_position": position, "estimated_start": round(now + seconds, 1)}
+               for job_id, position, seconds in waiting}
+    if updates:
+        queue_publisher.submit(write_queue_updates, updates)
+
+def write_queue_updates(updates):
+    try:
+        jobs.update_many(updates)
+    except Exception as e:
+        print(f"⚠️ Error guardando el estado de la cola: {e}")
+
+job_queue = JobQueue(workers=JOB_WORKERS, max_depth=JOB_QUEUE_MAX_DEPTH,
+                     initial_duration=JOB_INITIAL_DURATION, on_change=publish_queue)
 
-# Almacenamiento en memoria para transcripciones
-transcriptions = {}
+# Flujo de reels: progreso al terminar la descarga y peso de cada rama paralela hasta el envío a la API de Go
+REEL_DOWNLOAD_PROGRESS = 30
+REEL_BRANCH_WEIGHTS = {"upload": 20, "transcription": 45}
 
 async def verify_recaptcha(token: str) -> (bool, str):
     """Verifica el token de reCAPTCHA Enterprise con Google"""
@@ -122,109 +165,140 @@ async def verify_recaptcha(token: str) -> (bool, str):
         # En caso de error de excepción, devolver el error exacto
         return False, f"Error de excepción: {str(e)}"
 
+def validate_model(model: Optional[str]):
+    """Rechaza modelos Whisper no permitidos en esta instancia"""
+    if model and model not in WHISPER_ALLOWED_MODELS:
+        raise HTTPException(status_code=400, detail=f"Modelo no permitido: {model}. Opciones: {', '.join(WHISPER_ALLOWED_MODELS)}")
+
+@app.on_event("startup")
+async def preload_models():
+    # Precargar y calentar los modelos configurados sin bloquear el arranque
+    transcriber.preload_models()
+
+@app.on_event("startup")
+async def start_job_queue():
+    # Trabajos que quedaron a medias en un proceso anterior: error en vez de "en curso" para siempre
+    await run_in_threadpool(jobs.recover_interrupted)
+    job_queue.start()
+
+async def enqueue_job(task_id: str, message: str, process, *args) -> TranscriptionResponse:
+    """
+    Crea el trabajo y lo pone en la cola. Si la cola está llena responde 429 con Retry-After
+    (segundos estimados hasta que empiece el siguiente trabajo en espera) y el trabajo se borra:
+    el cliente no recibe su id, así que nadie lo consultaría.
+    """
+    await run_in_threadpool(jobs.create, task_id)
+    
+    async def run():
+        # Por el mismo hilo que publish_queue: una posición publicada antes no puede pisar esta
+        await asyncio.get_running_loop().run_in_executor(
+            queue_publisher, lambda: jobs.update(task_id, queue_position=None, estimated_start=None)
+        )
+        await process(task_id, *args)
+    
+    try:
+        position = job_queue.submit(task_id, run)
+    except QueueFullError as e:
+        await run_in_threadpool(jobs.delete, task_id)
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": str(e.retry_after)})
+    
+    # El almacén se actualiza en segundo plano: la posición se responde desde la cola
+    _, _, seconds = job_queue.waiting()[position - 1]
+    return TranscriptionResponse(id=task_id, status="pending", message=message,
+                                 queue_position=position, estimated_start=round(time.time() + seconds, 1))
+
 @app.get("/health")
 async def health_check():
-    return {"status": "healthy", "service": "transcription-api"}
+    models = transcriber.models_status()
+    return {"status": "healthy", "service": "transcription-api", "ready": models["ready"], "models": models, "downloads": transcriber.downloads_status(),
+            "translation": transcriber.translation_status(),
+            "result_cache": transcriber.result_cache.stats() if transcriber.result_cache else None,
+            "jobs": await run_in_threadpool(jobs.stats), "queue": job_queue.stats()}
+
+@app.get("/preview")
+async def preview_video(url: str):
+    """Metadatos del video sin descargarlo; el trabajo posterior reutiliza la extracción"""
+    loop = asyncio.get_event_loop()
+    try:
+        return await loop.run_in_executor(None, lambda: transcriber.get_video_metadata(url))
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"No se pudo obtener información del video: {e}")
 
 @app.post("/transcribe", response_model=TranscriptionResponse)
-async def start_transcription(request: TranscriptionRequest, background_tasks: BackgroundTasks):
+async def start_transcription(request: TranscriptionRequest):
     # Verificar reCAPTCHA
     is_human, reason = await verify_recaptcha(request.recaptcha_token)
     if not is_human:
         raise HTTPException(status_code=400, detail=f"Fallo en verificación de reCAPTCHA: {reason}")
+    validate_model(request.model)
 
     # Generar ID único
     task_id = str(uuid.uuid4())
-    
-    # Crear entrada inicial
-    transcriptions[task_id] = {
-        "id": task_id,
-        "status": "pending",
-        "progress": 0,
-        "result": None,
-        "error": None
-    }
-    
-
 
     # Si es video de youtube y se debe guardar en db, usar el nuevo flujo
     if request.type == "youtube" and request.save_to_db:
          # Crear request para el nuevo flujo
-         reel_request = CreateReelRequest(url=request.url, language=request.language)
-         # Iniciar creación de reel en background
-         background_tasks.add_task(process_reel_creation, task_id, reel_request)
-         
-         return TranscriptionResponse(
-            id=task_id,
-            status="pending",
-            message="Creación de Reel iniciada (Descarga -> Subida -> Transcripción)"
-        )
+         reel_request = CreateReelRequest(url=request.url, language=request.language, model=request.model, force=request.force)
+         # Encolar la creación de reel
+         return await enqueue_job(task_id, "Creación de Reel iniciada (Descarga -> Subida -> Transcripción)", process_reel_creation, reel_request)
     
     # Flujo antiguo (solo transcripción o audio)
-    background_tasks.add_task(process_transcription, task_id, request)
-    
-    return TranscriptionResponse(
-        id=task_id,
-        status="pending",
-        message="Transcripción iniciada"
-    )
+    return await enqueue_job(task_id, "Transcripción iniciada", process_transcription, request)
 
 @app.post("/create-reel", response_model=TranscriptionResponse)
-async def create_reel(request: CreateReelRequest, background_tasks: BackgroundTasks):
+async def create_reel(request: CreateReelRequest):
+    validate_model(request.model)
     # Generar ID único
     task_id = str(uuid.uuid4())
     
-    # Crear entrada inicial
-    transcriptions[task_id] = {
-        "id": task_id,
-        "status": "pending",
-        "progress": 0,
-        "result": None,
-        "error": None
-    }
-    
-    # Iniciar creación de reel en background
-    background_tasks.add_task(process_reel_creation, task_id, request)
-    
-    return TranscriptionResponse(
-        id=task_id,
-        status="pending",
-        message="Creación de Reel iniciada (Descarga -> Subida -> Transcripción)"
-    )
+    # Encolar la creación de reel
+    return await enqueue_job(task_id, "Creación de Reel iniciada (Descarga -> Subida -> Transcripción)", process_reel_creation, request)
 
 @app.get("/status/{task_id}", response_model=TranscriptionStatus)
-async def get_transcription_status(task_id: str):
-    if task_id not in transcriptions:
+async def get_transcription_status(task_id: str, include_result: bool = False):
+    job = await run_in_threadpool(jobs.get, task_id)
+    if job is None:
         raise HTTPException(status_code=404, detail="Transcripción no encontrada")
     
-    return TranscriptionStatus(**transcriptions[task_id])
+    # El sondeo solo lee los campos de estado; el resultado (que puede ser grande) se pide
+    # una vez con include_result=true cuando el trabajo termina
+    result = await run_in_threadpool(jobs.get_result, task_id) if include_result else None
+    return TranscriptionStatus(**job, result=result)
 
 async def process_transcription(task_id: str, request: TranscriptionRequest):
     try:
         # Actualizar estado
-        transcriptions[task_id]["status"] = "processing"
-        transcriptions[task_id]["progress"] = 10
+        await run_in_threadpool(jobs.update, task_id, status="processing", progress=10)
         
         # Nombre de archivo temporal para el JSON
         output_file = f"transcription_{task_id}.json"
         
         # Callback para actualizar el estado con mensajes de autenticación
         def status_update(msg):
-            transcriptions[task_id]["message"] = f"⚠️ AUTH REQUERIDA: {msg}"
+            jobs.update(task_id, message=f"⚠️ AUTH REQUERIDA: {msg}")
             print(f"[{task_id}] Status UPDATE: {msg}")
+        
+        # Modo streaming: los subtítulos de cada ventana se publican como resultado parcial
+        def subtitles_update(new_subtitles, seconds):
+            def append(partial):
+                partial = partial or {"subtitles": [], "partial": True}
+                partial["subtitles"].extend(new_subtitles)
+                return partial
+            jobs.modify_result(task_id, append)
+            jobs.update(task_id, message=f"Transcritos {seconds:.0f}s de audio")
 
         # Ejecutar transcripción (que es bloqueante) en un thread pool
         # para no bloquear el loop de eventos principal
         loop = asyncio.get_running_loop()
         success = await loop.run_in_executor(
             None, 
-            lambda: transcriber.transcribe_video(request.url, output_file, optimize_for_ui=True, status_callback=status_update)
+            lambda: transcriber.transcribe_video(request.url, output_file, optimize_for_ui=True, status_callback=status_update, model_name=request.model, force=request.force, on_subtitles=subtitles_update)
         )
         
         if not success:
             raise Exception("La transcripción no se pudo completar")
             
-        transcriptions[task_id]["progress"] = 90
+        await run_in_threadpool(jobs.update, task_id, progress=90)
         
         # Leer el resultado del JSON generado
         result_data = {}
@@ -237,31 +311,30 @@ async def process_transcription(task_id: str, request: TranscriptionRequest):
         else:
              raise Exception("No se generó el archivo de salida")
 
-        transcriptions[task_id]["result"] = result_data
-        
         # Si se debe guardar en la base de datos
+        if request.save_to_db:
+            await complete_pending_translations(result_data, task_id)
+        await run_in_threadpool(jobs.set_result, task_id, result_data)
+        
         if request.save_to_db:
             try:
                 # Enviar a la API de Go
                 await send_to_go_api(result_data, task_id)
             except Exception as e:
                 print(f"Error enviando a API de Go: {e}")
-                transcriptions[task_id]["error"] = f"Transcripción completada, pero falló envío a BD: {str(e)}"
+                await run_in_threadpool(jobs.update, task_id, error=f"Transcripción completada, pero falló envío a BD: {str(e)}")
         
         # Marcar como completado
-        transcriptions[task_id]["status"] = "completed"
-        transcriptions[task_id]["progress"] = 100
+        await run_in_threadpool(jobs.update, task_id, status="completed", progress=100)
         
     except Exception as e:
-        transcriptions[task_id]["status"] = "error"
-        transcriptions[task_id]["error"] = str(e)
+        await run_in_threadpool(jobs.update, task_id, status="error", error=str(e))
         print(f"Error en transcripción {task_id}: {e}")
 
 async def process_reel_creation(task_id: str, request: CreateReelRequest):
     try:
         # 1. Iniciar Descarga
-        transcriptions[task_id]["status"] = "processing_download"
-        transcriptions[task_id]["progress"] = 5
+        await run_in_threadpool(jobs.update, task_id, status="processing_download", progress=5)
         print(f"[{task_id}] Iniciando descarga de video...")
         
         loop = asyncio.get_running_loop()
@@ -270,9 +343,9 @@ async def process_reel_creation(task_id: str, request: CreateReelRequest):
         def status_update(msg):
             # Limpiamos un poco el mensaje si es muy largo, nos interesa el código y URL
             clean_msg = msg.replace('[youtube] ', '').strip()
-            transcriptions[task_id]["message"] = f"⚠️ {clean_msg}"
+            jobs.update(task_id, message=f"⚠️ {clean_msg}")
             # Opcional: poner en estado especial
-            # transcriptions[task_id]["status"] = "waiting_auth" 
+            # jobs.update(task_id, status="waiting_auth")
             print(f"[{task_id}] Mensaje importante: {clean_msg}")
 
         # Ejecutar descarga en thread pool
@@ -285,49 +358,80 @@ async def process_reel_creation(task_id: str, request: CreateReelRequest):
             raise Exception("Fallo en la descarga del video")
 
         print(f"[{task_id}] Video descargado: {filepath}")
-        transcriptions[task_id]["progress"] = 30
-        transcriptions[task_id]["status"] = "processing_upload"
-        
-        # 2. Subir al Backend (Supabase/Storage)
-        print(f"[{task_id}] Subiendo video al backend...")
-        upload_url = f"{GO_API_URL}/v1/upload?bucket=videos"
-        
-        public_url = await loop.run_in_executor(
-            None,
-            lambda: transcriber.upload_file_to_backend(filepath, upload_url)
+        await run_in_threadpool(
+            jobs.update,
+            task_id,
+            progress=REEL_DOWNLOAD_PROGRESS,
+            status="processing_upload_transcription",
+            branches={name: {"status": "pending", "progress": 0} for name in REEL_BRANCH_WEIGHTS}
         )
         
-        if not public_url:
-            raise Exception("Fallo en la subida del video")
+        # 2 y 3. Subida y transcripción en paralelo sobre el mismo archivo; se unen antes de enviar a Go
+        async def upload_branch():
+            # 2. Subir al Backend (Supabase/Storage): pura espera de red (más el remux opcional, sin recodificar)
+            print(f"[{task_id}] Subiendo video al backend...")
+            upload_url = f"{GO_API_URL}/v1/upload?bucket=videos"
             
-        print(f"[{task_id}] Video subido. URL pública: {public_url}")
-        transcriptions[task_id]["progress"] = 50
-        transcriptions[task_id]["status"] = "processing_transcription"
-        
-        # 3. Transcribir el archivo local
-        print(f"[{task_id}] Iniciando transcripción...")
-        output_file = f"transcription_{task_id}.json"
-        
-        # Usamos transcribe_audio_file pasando la ruta local
-        success = await loop.run_in_executor(
-            None, 
-            lambda: transcriber.transcribe_audio_file(filepath, output_file, optimize_for_ui=True)
-        )
-        
-        if not success:
-            raise Exception("La transcripción no se pudo completar")
+            def upload_progress(sent, total):
+                # Llamado desde los hilos de subida al confirmarse cada parte; el 100 lo pone run_branch
+                set_branch(task_id, "upload", "running", min(99, int(sent * 100 / total)) if total else 0)
             
-        transcriptions[task_id]["progress"] = 80
+            public_url = await loop.run_in_executor(
+                None,
+                lambda: transcriber.upload_video_to_backend(filepath, upload_url, progress_callback=upload_progress, sha256=info.get('content_sha256'))
+            )
+            
+            if not public_url:
+                raise Exception("Fallo en la subida del video")
+            
+            print(f"[{task_id}] Video subido. URL pública: {public_url}")
+            return public_url
         
-        # Leer el resultado
-        result_data = {}
-        if os.path.exists(output_file):
+        async def transcription_branch():
+            # 3. Transcribir el archivo local (ffmpeg extrae el audio en memoria)
+            print(f"[{task_id}] Iniciando transcripción...")
+            output_file = f"transcription_{task_id}.json"
+            
+            success = await loop.run_in_executor(
+                None, 
+                lambda: transcriber.transcribe_audio_file(filepath, output_file, optimize_for_ui=True, model_name=request.model, force=request.force)
+            )
+            
+            if not success:
+                raise Exception("La transcripción no se pudo completar")
+            
+            # Leer el resultado
+            if not os.path.exists(output_file):
+                raise Exception("No se generó el archivo de salida de transcripción")
             with open(output_file, 'r', encoding='utf-8') as f:
                 result_data = json.load(f)
             # Limpiar archivo JSON temporal
             os.remove(output_file)
-        else:
-             raise Exception("No se generó el archivo de salida de transcripción")
+            
+            return result_data
+        
+        async def run_branch(name, branch):
+            await run_in_threadpool(set_branch, task_id, name, "running")
+            try:
+                result = await branch()
+            except Exception:
+                await run_in_threadpool(set_branch, task_id, name, "error")
+                raise
+            await run_in_threadpool(set_branch, task_id, name, "completed", 100)
+            return result
+        
+        # Se espera a que terminen las dos ramas aunque una falle: el trabajo de un hilo del executor
+        # no se puede cancelar, y el estado final solo se fija cuando ninguna rama sigue escribiendo
+        outcomes = await asyncio.gather(
+            run_branch("upload", upload_branch),
+            run_branch("transcription", transcription_branch),
+            return_exceptions=True
+        )
+        errors = [outcome for outcome in outcomes if isinstance(outcome, BaseException)]
+        if errors:
+            raise errors[0]
+        public_url, result_data = outcomes
+        await run_in_threadpool(jobs.update, task_id, status="processing_send")
 
         # 4. Actualizar metadatos del JSON con la info real del video y la URL pública
         result_data['url'] = public_url
@@ -347,14 +451,14 @@ async def process_reel_creation(task_id: str, request: CreateReelRequest):
             result_data['category'] = "transcripción"
         result_data['author'] = info.get('uploader', result_data.get('author', 'Unknown Author'))
         
-        transcriptions[task_id]["result"] = result_data
+        await complete_pending_translations(result_data, task_id)
+        await run_in_threadpool(jobs.set_result, task_id, result_data)
         
         # 5. Enviar a Backend (Crear Reel)
         print(f"[{task_id}] Enviando Reel a API Go...")
         await send_to_go_api(result_data, task_id)
         
-        transcriptions[task_id]["status"] = "completed"
-        transcriptions[task_id]["progress"] = 100
+        await run_in_threadpool(jobs.update, task_id, status="completed", progress=100)
         print(f"[{task_id}] Proceso completado exitosamente")
 
         # Limpiar archivo de video descargado
@@ -366,10 +470,34 @@ async def process_reel_creation(task_id: str, request: CreateReelRequest):
                 print(f"No se pudo eliminar el archivo temporal: {e}")
 
     except Exception as e:
-        transcriptions[task_id]["status"] = "error"
-        transcriptions[task_id]["error"] = str(e)
+        await run_in_threadpool(jobs.update, task_id, status="error", error=str(e))
         print(f"Error en creación de reel {task_id}: {e}")
 
+def set_branch(task_id: str, branch: str, status: str, progress: int = None):
+    """Actualiza una rama del flujo de reels y recalcula el progreso global con sus pesos"""
+    def apply(task):
+        task["branches"][branch]["status"] = status
+        if progress is not None:
+            task["branches"][branch]["progress"] = progress
+        task["progress"] = REEL_DOWNLOAD_PROGRESS + int(sum(
+            REEL_BRANCH_WEIGHTS[name] * info["progress"] / 100
+            for name, info in task["branches"].items()
+        ))
+    jobs.modify(task_id, apply)
+
+async def complete_pending_translations(result_data: Dict[str, Any], task_id: str):
+    """
+    Último intento de completar las traducciones pendientes antes de crear el reel en Go,
+    que guarda los subtítulos tal cual llegan. Lo que siga pendiente queda marcado en la
+    caché de resultados para backfill_translations.py.
+    """
+    if not any(s.get("translationPending") for s in result_data.get("subtitles", [])):
+        return
+    loop = asyncio.get_running_loop()
+    filled = await loop.run_in_executor(None, lambda: transcriber.backfill_translations(result_data))
+    pending = sum(1 for s in result_data.get("subtitles", []) if s.get("translationPending"))
+    print(f"[{task_id}] Traducciones pendientes: {filled} completadas, {pending} subtítulos siguen pendientes")
+
 async def send_to_go_api(transcription_data: Dict[str, Any], task_id: str):
     """Envía los datos de transcripción a la API de Go"""
     try:
@@ -388,7 +516,9 @@ async def send_to_go_api(transcription_data: Dict[str, Any], task_id: str):
             "name": transcription_data.get("name", "Video Transcrito"),
             "url": transcription_data.get("url", ""), # This should now be the public_url
             "views": transcription_data.get("views", 0),
-            "subtitles": transcription_data.get("subtitles", []),
+            # 'translationPending' es interno del pipeline: el modelo de Go no lo conoce
+            "subtitles": [{k: v for k, v in subtitle.items() if k != "translationPending"}
+                          for subtitle in transcription_data.get("subtitles", [])],
             "duration": transcription_data.get("duration", ""),
             "visible": False,  # Por defecto no visible hasta que se publique
             "isPremium": False
@@ -402,7 +532,7 @@ async def send_to_go_api(transcription_data: Dict[str, Any], task_id: str):
                 print(f"✅ Transcripción enviada a API de Go: ID {result.get('id')}")
                 
                 # Guardar el ID del reel para referencia futura
-                transcriptions[task_id]["result"]["go_reel_id"] = result.get("id")
+                await run_in_threadpool(jobs.modify_result, task_id, lambda stored: dict(stored or {}, go_reel_id=result.get("id")))
                 
             else:
                 print(f"⚠️ Error enviando a API de Go: {response.status_code}")
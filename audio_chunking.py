@@ -0,0 +1,88 @@
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from audio_decoding import SAMPLE_RATE
+
+# Resolución de la detección de silencios
+FRAME_MS = 10
+
+
+def _last_silence(window: np.ndarray, min_silence_ms: int, silence_thresh: float) -> Optional[Tuple[int, int]]:
+    """Devuelve (inicio_ms, fin_ms) del último silencio de al menos min_silence_ms dentro de la ventana."""
+    frame = SAMPLE_RATE * FRAME_MS // 1000
+    count = len(window) // frame
+    if count == 0:
+        return None
+
+    # Energía RMS por bloques de FRAME_MS en dBFS (misma escala que pydub)
+    frames = window[:count * frame].reshape(count, frame)
+    rms = np.sqrt(np.mean(np.square(frames), axis=1))
+    silent = 20 * np.log10(np.maximum(rms, 1e-10)) < silence_thresh
+
+    # Rachas de bloques silenciosos: bordes donde cambia el estado
+    edges = np.flatnonzero(np.diff(np.concatenate(([False], silent, [False])).astype(np.int8)))
+    starts, ends = edges[0::2], edges[1::2]
+    long_enough = np.flatnonzero(ends - starts >= max(1, min_silence_ms // FRAME_MS))
+    if len(long_enough) == 0:
+        return None
+
+    last = long_enough[-1]
+    return int(starts[last]) * FRAME_MS, int(ends[last]) * FRAME_MS
+
+
+def duration_ms(audio: np.ndarray) -> int:
+    return len(audio) * 1000 // SAMPLE_RATE
+
+
+def slice_ms(audio: np.ndarray, start_ms: int, end_ms: int) -> np.ndarray:
+    """Tramo del array entre dos tiempos en ms (una vista, sin copiar muestras)."""
+    return audio[start_ms * SAMPLE_RATE // 1000:end_ms * SAMPLE_RATE // 1000]
+
+
+def plan_chunks(audio: np.ndarray, max_chunk_ms: int, min_silence_ms: int = 500,
+                silence_thresh: float = -40, search_ms: int = 15000) -> List[Tuple[int, int]]:
+    """
+    Divide el audio (float32 mono 16 kHz) en tramos (inicio_ms, fin_ms) de como máximo max_chunk_ms.
+    Cada corte se hace en el centro del último silencio encontrado en los
+    últimos search_ms del tramo; si no hay silencio se corta en el límite.
+    """
+    total_ms = duration_ms(audio)
+    cuts = [0]
+
+    while total_ms - cuts[-1] > max_chunk_ms:
+        start = cuts[-1]
+        limit = start + max_chunk_ms
+        # Buscar silencio solo cerca del límite: recorrer todo el audio sería muy lento
+        window_start = max(start + max_chunk_ms // 2, limit - search_ms)
+        silence = _last_silence(slice_ms(audio, window_start, limit), min_silence_ms, silence_thresh)
+        if silence:
+            silence_start, silence_end = silence
+            cuts.append(window_start + (silence_start + silence_end) // 2)
+        else:
+            cuts.append(limit)
+
+    cuts.append(total_ms)
+    return [(cuts[i], cuts[i + 1]) for i in range(len(cuts) - 1)]
+
+
+def stitch_segments(chunk_results: List[Tuple[int, int, int, List[Dict[str, Any]]]]) -> List[Dict[str, Any]]:
+    """
+    Une los segmentos de cada tramo en una sola línea de tiempo.
+    chunk_results: (offset_ms del audio enviado, inicio_ms y fin_ms del tramo propio, segmentos relativos).
+    Los tramos se transcriben con solapamiento; cada segmento se asigna al tramo
+    que contiene su punto medio, así lo repetido en los bordes aparece una sola vez.
+    """
+    stitched = []
+
+    for offset_ms, core_start_ms, core_end_ms, segments in chunk_results:
+        offset = offset_ms / 1000.0
+        for segment in segments:
+            start = segment['start'] + offset
+            end = segment['end'] + offset
+            midpoint_ms = (start + end) / 2 * 1000
+            if core_start_ms <= midpoint_ms < core_end_ms:
+                stitched.append({'start': start, 'end': end, 'text': segment['text']})
+
+    stitched.sort(key=lambda s: s['start'])
+    return stitched
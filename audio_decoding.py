@@ -0,0 +1,198 @@
+import subprocess
+import threading
+from typing import Iterable
+
+import numpy as np
+
+# Frecuencia de muestreo que esperan los motores de transcripción
+SAMPLE_RATE = 16000
+# Tamaño de lectura de la tubería de ffmpeg
+READ_SIZE = 1 << 20
+# Final de stderr de ffmpeg que se conserva para los mensajes de error
+STDERR_TAIL_BYTES = 4096
+
+
+class StderrTail:
+    """
+    Vacía el stderr de ffmpeg en un hilo mientras se lee stdout: si nadie lo lee, una entrada
+    corrupta que escribe más de lo que cabe en la tubería (~64 KB) bloquea a ffmpeg y al lector.
+    Solo se guardan los últimos STDERR_TAIL_BYTES.
+    """
+
+    def __init__(self, stream):
+        self._stream = stream
+        self._tail = b''
+        self._thread = threading.Thread(target=self._drain, daemon=True, name="ffmpeg-stderr")
+        self._thread.start()
+
+    def _drain(self):
+        while True:
+            chunk = self._stream.read1(READ_SIZE)
+            if not chunk:
+                break
+            self._tail = (self._tail + chunk)[-STDERR_TAIL_BYTES:]
+
+    def text(self) -> str:
+        """Final de stderr; esperar antes a que ffmpeg termine."""
+        self._thread.join(timeout=5)
+        return self._tail.decode(errors='ignore').strip()
+
+
+def decode_audio(source: str, sample_rate: int = SAMPLE_RATE) -> np.ndarray:
+    """
+    Decodifica cualquier audio/video con ffmpeg a float32 mono en memoria.
+    La salida de ffmpeg se lee por la tubería directamente a un buffer que
+    NumPy reutiliza sin copiar: sin WAV intermedios ni carga completa con pydub.
+    """
+    cmd = [
+        'ffmpeg', '-nostdin', '-loglevel', 'error', '-threads', '0',
+        '-i', source,
+        '-vn', '-f', 'f32le', '-ac', '1', '-ar', str(sample_rate),
+        'pipe:1'
+    ]
+    process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    stderr = StderrTail(process.stderr)
+
+    buffer = bytearray()
+    while True:
+        chunk = process.stdout.read(READ_SIZE)
+        if not chunk:
+            break
+        buffer += chunk
+
+    if process.wait() != 0:
+        raise RuntimeError(f"ffmpeg no pudo decodificar {source}: {stderr.text()}")
+
+    # Descartar bytes sueltos si ffmpeg cortó a mitad de muestra
+    usable = len(buffer) - len(buffer) % 4
+    return np.frombuffer(memoryview(buffer)[:usable], dtype=np.float32)
+
+
+def decode_audio_stream(chunks: Iterable[bytes], thumbnail_path: str = None, thumbnail_at: float = 1.0,
+                        sample_rate: int = SAMPLE_RATE) -> np.ndarray:
+    """
+    Como decode_audio, pero la entrada llega en bloques (p.ej. el cuerpo de una respuesta HTTP)
+    y se escribe en el stdin de ffmpeg mientras se decodifica: nada pasa por disco.
+    Con thumbnail_path, la misma ejecución de ffmpeg guarda además un fotograma del video.
+    Los contenedores que necesitan buscar en la entrada (MP4 con el índice al final) fallan
+    por tubería: el llamador debe tener un camino alternativo.
+    """
+    cmd = [
+        'ffmpeg', '-loglevel', 'error', '-threads', '0',
+        '-i', 'pipe:0',
+        '-map', '0:a:0', '-f', 'f32le', '-ac', '1', '-ar', str(sample_rate), 'pipe:1',
+    ]
+    if thumbnail_path:
+        cmd += ['-map', '0:v:0', '-ss', str(thumbnail_at), '-frames:v', '1', '-y', thumbnail_path]
+    process = subprocess.Popen(cmd, stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    stderr = StderrTail(process.stderr)
+
+    feed_error = []
+
+    def feed():
+        try:
+            for chunk in chunks:
+                if chunk:
+                    process.stdin.write(chunk)
+        except BrokenPipeError:
+            # ffmpeg terminó antes (error de formato): el código de salida lo explica
+            pass
+        except Exception as e:
+            feed_error.append(e)
+        finally:
+            try:
+                process.stdin.close()
+            except OSError:
+                pass
+
+    feeder = threading.Thread(target=feed, daemon=True, name="ffmpeg-feeder")
+    feeder.start()
+
+    buffer = bytearray()
+    while True:
+        chunk = process.stdout.read(READ_SIZE)
+        if not chunk:
+            break
+        buffer += chunk
+
+    code = process.wait()
+    feeder.join()
+    if feed_error:
+        raise feed_error[0]
+    if code != 0:
+        raise RuntimeError(f"ffmpeg no pudo decodificar el flujo: {stderr.text()}")
+
+    usable = len(buffer) - len(buffer) % 4
+    return np.frombuffer(memoryview(buffer)[:usable], dtype=np.float32)
+
+
+class ProgressiveDecoder:
+    """
+    Decodifica con ffmpeg en segundo plano a float32 mono 16 kHz.
+    La entrada puede ser una ruta/URL o una tubería (stdin, p.ej. la salida de yt-dlp):
+    las muestras quedan disponibles según llegan, sin esperar al final del archivo.
+    """
+
+    def __init__(self, source: str = 'pipe:0', stdin=None, sample_rate: int = SAMPLE_RATE):
+        cmd = [
+            'ffmpeg', '-nostdin', '-loglevel', 'error', '-threads', '0',
+            '-i', source,
+            '-vn', '-f', 'f32le', '-ac', '1', '-ar', str(sample_rate),
+            'pipe:1'
+        ]
+        if stdin is not None:
+            # -nostdin impediría leer la entrada por la tubería
+            cmd.remove('-nostdin')
+        self.source = source
+        self.finished = False
+        self.error = None
+        self._buffer = bytearray()
+        self._cond = threading.Condition()
+        self._process = subprocess.Popen(cmd, stdin=stdin, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        self._stderr = StderrTail(self._process.stderr)
+        self._thread = threading.Thread(target=self._read, daemon=True, name="ffmpeg-reader")
+        self._thread.start()
+
+    def _read(self):
+        while True:
+            chunk = self._process.stdout.read1(READ_SIZE)
+            if not chunk:
+                break
+            with self._cond:
+                self._buffer += chunk
+                self._cond.notify_all()
+
+        code = self._process.wait()
+        stderr = self._stderr.text()
+        with self._cond:
+            if code != 0:
+                self.error = f"ffmpeg no pudo decodificar {self.source}: {stderr}"
+            self.finished = True
+            self._cond.notify_all()
+
+    @property
+    def available(self) -> int:
+        """Muestras decodificadas hasta ahora."""
+        return len(self._buffer) // 4
+
+    def wait_for(self, samples: int, timeout: float = None) -> int:
+        """Espera a tener al menos `samples` muestras (o al final de la entrada) y devuelve las disponibles."""
+        with self._cond:
+            self._cond.wait_for(lambda: self.finished or len(self._buffer) // 4 >= samples, timeout)
+            return len(self._buffer) // 4
+
+    def read(self, start: int, end: int) -> np.ndarray:
+        """Copia de las muestras [start, end): el buffer sigue creciendo mientras se lee."""
+        with self._cond:
+            return np.frombuffer(bytes(self._buffer[start * 4:end * 4]), dtype=np.float32)
+
+    def audio(self) -> np.ndarray:
+        """Todo el audio decodificado (sin copiar); solo tiene sentido cuando finished es True."""
+        with self._cond:
+            usable = len(self._buffer) - len(self._buffer) % 4
+            return np.frombuffer(memoryview(self._buffer)[:usable], dtype=np.float32)
+
+    def close(self):
+        if self._process.poll() is None:
+            self._process.kill()
+        self._thread.join(timeout=5)
@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+"""
+Completa las traducciones pendientes ('translationPending') de resultados guardados.
+Uso: python backfill_translations.py                 (resultados pendientes de la caché de resultados)
+     python backfill_translations.py transcripcion1.json [transcripcion2.json ...]
+"""
+
+import json
+import sys
+
+from video_transcriber import VideoTranscriber
+
+# Resultados de la caché que se procesan por ejecución (los más usados primero)
+CACHE_BATCH = 100
+
+def backfill_files(transcriber, paths):
+    for path in paths:
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+
+        filled = transcriber.backfill_translations(data)
+        pending = sum(1 for s in data.get('subtitles', []) if s.get('translationPending'))
+
+        if filled:
+            with open(path, 'w', encoding='utf-8') as f:
+                json.dump(data, f, ensure_ascii=False, indent=2)
+
+        print(f"{path}: {filled} traducciones completadas, {pending} subtítulos aún pendientes")
+
+def backfill_cache(transcriber):
+    if not transcriber.result_cache:
+        print("La caché de resultados está desactivada (RESULT_CACHE_PATH vacío)")
+        sys.exit(1)
+
+    entries = transcriber.result_cache.pending_results(CACHE_BATCH)
+    for key, data in entries:
+        filled = transcriber.backfill_translations(data)
+        pending = sum(1 for s in data.get('subtitles', []) if s.get('translationPending'))
+
+        if filled:
+            transcriber.result_cache.put([key], data)
+
+        print(f"{key}: {filled} traducciones completadas, {pending} subtítulos aún pendientes")
+    print(f"{len(entries)} resultados con traducciones pendientes revisados")
+
+def main():
+    if len(sys.argv) > 1 and sys.argv[1] in ("-h", "--help"):
+        print(__doc__)
+        sys.exit(0)
+
+    transcriber = VideoTranscriber()
+
+    try:
+        if len(sys.argv) > 1:
+            backfill_files(transcriber, sys.argv[1:])
+        else:
+            backfill_cache(transcriber)
+    finally:
+        transcriber.cleanup()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+Compara los motores de transcripción sobre el mismo audio.
+Cada motor se ejecuta en su propio proceso para medir la memoria por separado.
+
+Uso: python benchmark_engines.py audio.mp3 [modelo] [motor1,motor2]
+Ejemplo: python benchmark_engines.py clase.wav tiny whisper,faster-whisper
+"""
+
+import multiprocessing
+import queue as queue_module
+import resource
+import sys
+import time
+
+from audio_decoding import SAMPLE_RATE, decode_audio
+from transcription_engines import create_engine
+
+def run_engine(engine_name, model_name, audio_path, queue):
+    """Carga el modelo, transcribe y devuelve las métricas por la cola."""
+    engine = create_engine(engine_name)
+
+    start = time.time()
+    model = engine.load(model_name)
+    load_seconds = time.time() - start
+
+    # Mismo camino que el servicio: audio decodificado en memoria
+    audio = decode_audio(audio_path)
+
+    start = time.time()
+    segments = engine.transcribe(model, audio, language="it")
+    transcribe_seconds = time.time() - start
+
+    # ru_maxrss está en KB en Linux
+    peak_rss_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+    queue.put({
+        'engine': engine_name,
+        'load_seconds': load_seconds,
+        'transcribe_seconds': transcribe_seconds,
+        'peak_rss_mb': peak_rss_mb,
+        'segments': len(segments),
+        'sample': " ".join(s['text'].strip() for s in segments[:3]),
+    })
+
+def wait_result(process, queue, poll_seconds=1.0):
+    """
+    Resultado del proceso hijo, o None si termina sin enviarlo.
+    Se lee la cola antes de join(): un hijo con un resultado mayor que el buffer de la tubería
+    no termina hasta que alguien lo lee, y join() esperaría para siempre.
+    """
+    while True:
+        try:
+            return queue.get(timeout=poll_seconds)
+        except queue_module.Empty:
+            if not process.is_alive():
+                # El hijo vacía la cola antes de salir: lo que haya enviado ya está en la tubería
+                try:
+                    return queue.get(timeout=poll_seconds)
+                except queue_module.Empty:
+                    return None
+
+def main():
+    if len(sys.argv) < 2:
+        print(__doc__)
+        sys.exit(1)
+
+    audio_path = sys.argv[1]
+    model_name = sys.argv[2] if len(sys.argv) > 2 else "tiny"
+    engines = sys.argv[3].split(",") if len(sys.argv) > 3 else ["whisper", "faster-whisper"]
+
+    audio_seconds = len(decode_audio(audio_path)) / SAMPLE_RATE
+    print(f"Audio: {audio_path} ({audio_seconds:.1f}s) | Modelo: {model_name}")
+    print("=" * 60)
+
+    ctx = multiprocessing.get_context("spawn")
+    results = []
+    for engine_name in engines:
+        queue = ctx.Queue()
+        process = ctx.Process(target=run_engine, args=(engine_name, model_name, audio_path, queue))
+        process.start()
+        result = wait_result(process, queue)
+        process.join()
+        if result is None:
+            print(f"❌ {engine_name}: falló (código {process.exitcode})")
+            continue
+        results.append(result)
+
+    for r in results:
+        speed = audio_seconds / r['transcribe_seconds'] if r['transcribe_seconds'] else 0
+        print(f"🔧 {r['engine']}")
+        print(f"   Carga del modelo: {r['load_seconds']:.1f}s")
+        print(f"   Transcripción:    {r['transcribe_seconds']:.1f}s ({speed:.1f}x tiempo real)")
+        print(f"   Memoria pico:     {r['peak_rss_mb']:.0f} MB")
+        print(f"   Segmentos:        {r['segments']}")
+        print(f"   Muestra:          {r['sample'][:120]}")
+        print()
+
+    if len(results) == 2:
+        a, b = results
+        print(f"📊 {b['engine']} vs {a['engine']}: "
+              f"{a['transcribe_seconds'] / b['transcribe_seconds']:.2f}x velocidad, "
+              f"{b['peak_rss_mb'] / a['peak_rss_mb']:.2f}x memoria")
+
+if __name__ == "__main__":
+    main()
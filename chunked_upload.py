@@ -0,0 +1,206 @@
+import json
+import math
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Optional, Set
+from urllib.parse import urlsplit, urlunsplit
+
+import requests
+
+from http_download import create_session
+
+
+class UploadError(Exception):
+    """La subida no se pudo completar."""
+
+
+class ChunkedUploadUnsupported(UploadError):
+    """El backend no implementa el protocolo de subida por partes."""
+
+
+class ChunkedUploader:
+    """
+    Subida por partes reanudable al backend. Protocolo (relativo al endpoint de subida, con su query):
+      HEAD {endpoint}/objects/{sha256}                200 + Location: URL pública si ya existe, 404 si no
+      POST {endpoint}/chunked                         {filename, size, content_type, part_size, sha256} -> {upload_id}
+      GET  {endpoint}/chunked/{upload_id}             -> {parts: [números de parte recibidos]}
+      PUT  {endpoint}/chunked/{upload_id}/parts/{n}   cuerpo = bytes de la parte -> {part, size}
+      POST {endpoint}/chunked/{upload_id}/complete    -> {url}
+    sha256 es el hash del contenido calculado al descargarlo (ver DownloadHasher); el backend lo guarda
+    con el objeto para responder al HEAD. Con él, el upload_id se guarda en state_dir (<sha256>.json):
+    si la subida se corta, la siguiente llamada con el mismo contenido (aunque sea otro archivo: nueva
+    descarga, enlace de la caché, remux en otro directorio) pregunta qué partes tiene el backend y envía
+    solo las que faltan. Sin sha256 la subida no se puede reanudar.
+    """
+
+    def __init__(self, session: requests.Session = None, part_size: int = 8 * 1024 * 1024,
+                 parallel: int = 4, timeout: float = 60, max_retries: int = 3, state_dir: str = 'upload_state'):
+        self.part_size = part_size
+        self.parallel = max(1, parallel)
+        self.session = session or create_session(self.parallel * 2)
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.state_dir = state_dir
+
+    @classmethod
+    def from_env(cls) -> "ChunkedUploader":
+        default_state_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'upload_state')
+        return cls(
+            part_size=int(os.getenv("UPLOAD_PART_BYTES", str(8 * 1024 * 1024))),
+            parallel=int(os.getenv("UPLOAD_PARALLEL_PARTS", "4")),
+            max_retries=int(os.getenv("UPLOAD_MAX_RETRIES", "3")),
+            state_dir=os.getenv("UPLOAD_STATE_DIR", default_state_dir),
+        )
+
+    def state_path(self, sha256: str) -> str:
+        """Archivo con el estado de la subida pendiente de ese contenido."""
+        return os.path.join(self.state_dir, f"{sha256}.json")
+
+    @staticmethod
+    def _url(upload_endpoint: str, *segments, resource: str = 'chunked') -> str:
+        """{endpoint}/{resource}/... conservando la query del endpoint (p.ej. ?bucket=videos)."""
+        parts = urlsplit(upload_endpoint)
+        path = "/".join([parts.path.rstrip('/'), resource] + [str(s) for s in segments])
+        return urlunsplit((parts.scheme, parts.netloc, path, parts.query, ''))
+
+    def existing_url(self, upload_endpoint: str, sha256: str) -> Optional[str]:
+        """URL pública si el backend ya tiene un objeto con ese contenido; None si no (o si no lo sabe decir)."""
+        try:
+            response = self.session.head(self._url(upload_endpoint, sha256, resource='objects'),
+                                         timeout=self.timeout, allow_redirects=False)
+        except requests.RequestException as e:
+            print(f"⚠️ No se pudo consultar si el objeto existe: {e}")
+            return None
+        if response.status_code == 200:
+            return response.headers.get('Location') or None
+        return None
+
+    def upload(self, filepath: str, upload_endpoint: str, content_type: str = 'video/mp4',
+               progress_callback: Callable[[int, int], None] = None, sha256: str = None) -> str:
+        """Sube el archivo por partes en paralelo y devuelve la URL pública (reanudable si se da sha256)."""
+        started = time.time()
+        size = os.path.getsize(filepath)
+        part_count = max(1, math.ceil(size / self.part_size))
+        state_path = self.state_path(sha256) if sha256 else None
+        state = {
+            'endpoint': upload_endpoint,
+            'size': size,
+            'sha256': sha256,
+            'part_size': self.part_size,
+        }
+
+        upload_id, received = self._resume(state_path, state, upload_endpoint) if state_path else (None, set())
+        if upload_id:
+            print(f"⏯️ Reanudando subida {upload_id}: {len(received)}/{part_count} partes ya en el backend")
+        else:
+            upload_id = self._create(upload_endpoint, filepath, size, content_type, sha256)
+            received = set()
+            if state_path:
+                self._save_state(state_path, dict(state, upload_id=upload_id))
+
+        pending = [n for n in range(part_count) if n not in received]
+        lock = threading.Lock()
+        sent = [sum(self._part_length(n, size) for n in received)]
+        if progress_callback:
+            progress_callback(sent[0], size)
+        print(f"⬆️ Subida en {part_count} partes de {self.part_size / 1e6:.1f} MB ({len(pending)} pendientes)")
+
+        def send(number):
+            attempt = 0
+            while True:
+                try:
+                    self._put_part(upload_endpoint, upload_id, filepath, number, size)
+                    break
+                except (requests.RequestException, UploadError) as e:
+                    attempt += 1
+                    if attempt > self.max_retries:
+                        raise
+                    print(f"⚠️ Parte {number} falló ({e}). Reintento {attempt}/{self.max_retries}...")
+                    time.sleep(min(2 ** attempt, 10))
+            with lock:
+                sent[0] += self._part_length(number, size)
+                if progress_callback:
+                    progress_callback(sent[0], size)
+
+        if pending:
+            with ThreadPoolExecutor(max_workers=min(self.parallel, len(pending)), thread_name_prefix="upload") as executor:
+                for future in [executor.submit(send, number) for number in pending]:
+                    future.result()
+
+        public_url = self._complete(upload_endpoint, upload_id)
+        if state_path and os.path.exists(state_path):
+            os.remove(state_path)
+        print(f"📤 {size / 1e6:.1f} MB subidos en {time.time() - started:.1f}s ({len(pending)} partes enviadas)")
+        return public_url
+
+    def _part_length(self, number: int, size: int) -> int:
+        return max(0, min(self.part_size, size - number * self.part_size))
+
+    def _resume(self, state_path: str, state: Dict, upload_endpoint: str) -> tuple:
+        """(upload_id, partes recibidas) de una subida anterior del mismo contenido, o (None, set())."""
+        try:
+            with open(state_path, 'r', encoding='utf-8') as f:
+                saved = json.load(f)
+        except (OSError, ValueError):
+            return None, set()
+        if any(saved.get(k) != v for k, v in state.items()) or not saved.get('upload_id'):
+            return None, set()
+        received = self._received_parts(upload_endpoint, saved['upload_id'])
+        if received is None:
+            return None, set()
+        return saved['upload_id'], received
+
+    def _save_state(self, state_path: str, state: Dict):
+        os.makedirs(self.state_dir, exist_ok=True)
+        tmp_path = f"{state_path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(state, f)
+        os.replace(tmp_path, state_path)
+
+    def _create(self, upload_endpoint: str, filepath: str, size: int, content_type: str, sha256: str = None) -> str:
+        response = self.session.post(self._url(upload_endpoint), json={
+            'filename': os.path.basename(filepath),
+            'size': size,
+            'content_type': content_type,
+            'part_size': self.part_size,
+            'sha256': sha256,
+        }, timeout=self.timeout)
+        if response.status_code in (404, 405, 501):
+            raise ChunkedUploadUnsupported(f"El backend no admite subida por partes (HTTP {response.status_code})")
+        if response.status_code not in (200, 201):
+            raise UploadError(f"No se pudo iniciar la subida: {response.text}")
+        return response.json()['upload_id']
+
+    def _received_parts(self, upload_endpoint: str, upload_id: str) -> Optional[Set[int]]:
+        """Partes que el backend ya confirmó; None si la sesión ya no existe."""
+        try:
+            response = self.session.get(self._url(upload_endpoint, upload_id), timeout=self.timeout)
+        except requests.RequestException:
+            return None
+        if response.status_code != 200:
+            return None
+        return set(response.json().get('parts', []))
+
+    def _put_part(self, upload_endpoint: str, upload_id: str, filepath: str, number: int, size: int):
+        length = self._part_length(number, size)
+        with open(filepath, 'rb') as f:
+            f.seek(number * self.part_size)
+            data = f.read(length)
+        response = self.session.put(
+            self._url(upload_endpoint, upload_id, 'parts', number),
+            data=data,
+            headers={'Content-Type': 'application/octet-stream'},
+            timeout=self.timeout,
+        )
+        if response.status_code not in (200, 201):
+            raise UploadError(f"HTTP {response.status_code}: {response.text[:200]}")
+        if response.json().get('size') != length:
+            raise UploadError(f"El backend confirmó {response.json().get('size')} bytes de {length}")
+
+    def _complete(self, upload_endpoint: str, upload_id: str) -> str:
+        response = self.session.post(self._url(upload_endpoint, upload_id, 'complete'), timeout=self.timeout)
+        if response.status_code != 200:
+            raise UploadError(f"No se pudo completar la subida: {response.text}")
+        return response.json().get('url')
@@ -0,0 +1,76 @@
+import threading
+import time
+
+
+class CircuitOpenError(Exception):
+    """El circuito está abierto: la llamada se rechaza sin intentarla."""
+
+
+class CircuitBreaker:
+    """
+    Circuit breaker seguro entre hilos.
+    - closed: las llamadas pasan; tras `failure_threshold` fallos consecutivos se abre.
+    - open: las llamadas fallan al instante durante `cooldown` segundos.
+    - half_open: pasado el enfriamiento se permite una sola llamada de prueba;
+      si funciona se cierra, si falla se vuelve a abrir.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, name: str, failure_threshold: int = 5, cooldown: float = 60.0):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._probing = False
+        self._lock = threading.Lock()
+
+    def _before_call(self):
+        with self._lock:
+            if self.state == self.OPEN:
+                if time.monotonic() - self.opened_at < self.cooldown:
+                    raise CircuitOpenError(f"Circuito '{self.name}' abierto")
+                self.state = self.HALF_OPEN
+                self._probing = False
+
+            if self.state == self.HALF_OPEN:
+                if self._probing:
+                    raise CircuitOpenError(f"Circuito '{self.name}' en prueba")
+                self._probing = True
+
+    def _on_success(self):
+        with self._lock:
+            if self.state != self.CLOSED:
+                print(f"✅ Circuito '{self.name}' cerrado de nuevo")
+            self.state = self.CLOSED
+            self.failures = 0
+            self._probing = False
+
+    def _on_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                if self.state != self.OPEN:
+                    print(f"⚡ Circuito '{self.name}' abierto tras {self.failures} fallos. Enfriamiento: {self.cooldown}s")
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+                self._probing = False
+
+    def call(self, func):
+        """Ejecuta func() a través del circuito."""
+        self._before_call()
+        try:
+            result = func()
+        except Exception:
+            self._on_failure()
+            raise
+        self._on_success()
+        return result
+
+    def status(self) -> dict:
+        with self._lock:
+            return {'name': self.name, 'state': self.state, 'failures': self.failures}
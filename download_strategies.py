@@ -0,0 +1,195 @@
+import atexit
+import copy
+import os
+import tempfile
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+# Clientes del reproductor de YouTube que se prueban como estrategias individuales
+DEFAULT_PLAYER_CLIENTS = ['web', 'android', 'ios', 'mweb']
+
+_cookiefile = None
+_cookiefile_resolved = False
+_cookiefile_lock = threading.Lock()
+
+
+def _remove_temp_cookiefile(path: str):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+def resolve_cookiefile() -> Optional[str]:
+    """
+    Busca el archivo de cookies una sola vez por proceso.
+    Orden: cookies.txt junto al script, en el CWD, Secret Files de Render y
+    variable YOUTUBE_COOKIES (se escribe a un temporal que se borra al salir).
+    """
+    global _cookiefile, _cookiefile_resolved
+    with _cookiefile_lock:
+        if _cookiefile_resolved:
+            return _cookiefile
+        _cookiefile = _find_cookiefile()
+        _cookiefile_resolved = True
+        return _cookiefile
+
+
+def _find_cookiefile() -> Optional[str]:
+    # 1. Buscar en el mismo directorio que el script
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    local_cookies = os.path.join(script_dir, 'cookies.txt')
+    if os.path.exists(local_cookies):
+        print(f"✅ Usando cookies locales: {local_cookies}")
+        return local_cookies
+
+    # 1b. También buscar en el directorio actual (por si acaso)
+    cwd_cookies = os.path.join(os.getcwd(), 'cookies.txt')
+    if os.path.exists(cwd_cookies) and cwd_cookies != local_cookies:
+        print(f"✅ Usando cookies del CWD: {cwd_cookies}")
+        return cwd_cookies
+
+    # 2. Buscar en secrets de Render (/etc/secrets/cookies.txt)
+    render_secret_cookies = '/etc/secrets/cookies.txt'
+    if os.path.exists(render_secret_cookies):
+        print(f"✅ Usando cookies desde Secret Files (Render): {render_secret_cookies}")
+        return render_secret_cookies
+
+    # 3. Buscar en variable de entorno
+    cookies_content = os.environ.get('YOUTUBE_COOKIES')
+    if cookies_content:
+        try:
+            fd, path = tempfile.mkstemp(suffix='.txt', text=True)
+            with os.fdopen(fd, 'w') as tmp:
+                tmp.write(cookies_content)
+            atexit.register(_remove_temp_cookiefile, path)
+            print(f"✅ Usando cookies desde variable de entorno. Longitud: {len(cookies_content)}")
+            print(f"📂 Archivo temporal de cookies creado en: {path}")
+            return path
+        except Exception as e:
+            print(f"Error creando archivo de cookies temporal: {e}")
+
+    print("⚠️ No se encontraron cookies (cookies.txt o YOUTUBE_COOKIES). La descarga podría fallar por bot detection.")
+    return None
+
+
+class DownloadStrategy:
+    """Una forma de pedir el video a YouTube: con o sin cookies y con qué clientes del reproductor."""
+
+    def __init__(self, use_cookies: bool, player_clients: List[str]):
+        self.use_cookies = use_cookies
+        self.player_clients = player_clients
+        # Varios clientes a la vez = el comportamiento histórico de yt-dlp con la lista completa
+        clients = 'all' if len(player_clients) > 1 else player_clients[0]
+        self.name = f"{'cookies' if use_cookies else 'anon'}:{clients}"
+
+    def apply(self, ydl_opts: Dict[str, Any], cookiefile: Optional[str]) -> Dict[str, Any]:
+        """Copia de las opciones de yt-dlp con la autenticación y los clientes de esta estrategia."""
+        opts = dict(ydl_opts)
+        opts.pop('cookiefile', None)
+        opts.pop('cookiesfrombrowser', None)
+        if self.use_cookies:
+            opts['cookiefile'] = cookiefile
+
+        extractor_args = copy.deepcopy(opts.get('extractor_args', {}))
+        extractor_args.setdefault('youtube', {})['player_client'] = list(self.player_clients)
+        opts['extractor_args'] = extractor_args
+        return opts
+
+
+class DownloadStrategyManager:
+    """
+    Recuerda qué estrategias de descarga funcionan en este proceso.
+    Por cada estrategia guarda la tasa de éxito y la latencia recientes
+    (medias exponenciales) y ordena los intentos para probar primero la mejor.
+    Cada `explore_every` descargas adelanta la estrategia que lleva más tiempo
+    sin probarse, para detectar si una que fallaba vuelve a funcionar.
+    """
+
+    def __init__(self, strategies: List[DownloadStrategy], explore_every: int = 10,
+                 max_attempts: int = 3, alpha: float = 0.2, latency_scale: float = 60.0):
+        self.strategies = strategies
+        self.explore_every = explore_every
+        self.max_attempts = max_attempts
+        self.alpha = alpha
+        self.latency_scale = latency_scale
+        self._plans = 0
+        self._lock = threading.Lock()
+        # Las estrategias con todos los clientes arrancan algo por delante: es el comportamiento histórico
+        self._stats = {
+            s.name: {
+                'success_rate': 0.6 if len(s.player_clients) > 1 else 0.5,
+                'latency': None,
+                'attempts': 0,
+                'successes': 0,
+                'last_tried': 0.0,
+            }
+            for s in strategies
+        }
+
+    def _score(self, name: str) -> float:
+        """Tasa de éxito penalizada por la latencia (sin latencia propia se usa la media de las demás)"""
+        stats = self._stats[name]
+        latency = stats['latency']
+        if latency is None:
+            known = [s['latency'] for s in self._stats.values() if s['latency'] is not None]
+            latency = sum(known) / len(known) if known else 0.0
+        return stats['success_rate'] / (1.0 + latency / self.latency_scale)
+
+    def plan(self) -> List[DownloadStrategy]:
+        """Estrategias a intentar en orden (como máximo max_attempts)."""
+        with self._lock:
+            self._plans += 1
+            # sorted es estable: a igual puntuación se respeta el orden de configuración
+            ordered = sorted(self.strategies, key=lambda s: -self._score(s.name))
+            if self.explore_every and self._plans % self.explore_every == 0 and len(ordered) > 1:
+                stalest = min(ordered[1:], key=lambda s: self._stats[s.name]['last_tried'])
+                ordered.remove(stalest)
+                ordered.insert(0, stalest)
+                print(f"🧭 Explorando estrategia de descarga: {stalest.name}")
+        return ordered[:self.max_attempts]
+
+    def record(self, name: str, success: bool, seconds: float):
+        """Registra el resultado de un intento."""
+        with self._lock:
+            stats = self._stats[name]
+            stats['attempts'] += 1
+            stats['last_tried'] = time.monotonic()
+            stats['success_rate'] += self.alpha * ((1.0 if success else 0.0) - stats['success_rate'])
+            if success:
+                stats['successes'] += 1
+                if stats['latency'] is None:
+                    stats['latency'] = seconds
+                else:
+                    stats['latency'] += self.alpha * (seconds - stats['latency'])
+
+    def status(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                name: {
+                    'success_rate': round(stats['success_rate'], 3),
+                    'latency_seconds': round(stats['latency'], 2) if stats['latency'] is not None else None,
+                    'attempts': stats['attempts'],
+                    'successes': stats['successes'],
+                    'score': round(self._score(name), 3),
+                }
+                for name, stats in self._stats.items()
+            }
+
+
+def create_strategy_manager(has_cookies: bool) -> DownloadStrategyManager:
+    """Estrategias configuradas por entorno: cookies (si las hay) y anónimo, con todos los clientes y cada uno por separado."""
+    clients = [c.strip() for c in os.getenv("YTDLP_PLAYER_CLIENTS", ",".join(DEFAULT_PLAYER_CLIENTS)).split(",") if c.strip()]
+    auth_modes = [True, False] if has_cookies else [False]
+
+    strategies = [DownloadStrategy(use_cookies, clients) for use_cookies in auth_modes]
+    if len(clients) > 1:
+        for use_cookies in auth_modes:
+            strategies.extend(DownloadStrategy(use_cookies, [client]) for client in clients)
+
+    return DownloadStrategyManager(
+        strategies,
+        explore_every=int(os.getenv("YTDLP_EXPLORE_EVERY", "10")),
+        max_attempts=int(os.getenv("YTDLP_MAX_ATTEMPTS", "3")),
+    )
@@ -0,0 +1,294 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+# Progreso de cada segmento guardado junto al archivo parcial cada tantos bytes
+STATE_SAVE_EVERY = 8 * 1024 * 1024
+# Tamaño de lectura al añadir al hash lo que otros segmentos ya escribieron
+HASH_READ_SIZE = 1 << 20
+
+
+def create_session(pool_size: int = 16) -> requests.Session:
+    """Session con pool de conexiones reutilizables (keep-alive) para descargas en paralelo."""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+
+class DownloadError(Exception):
+    """La descarga no se pudo completar o no tiene la longitud esperada."""
+
+
+class SegmentHasher:
+    """
+    SHA-256 de un archivo que se escribe por segmentos en paralelo, calculado según llegan los bytes:
+    el bloque que continúa lo ya añadido entra directamente desde memoria; lo que otros segmentos
+    escribieron por delante se lee del archivo parcial (recién escrito) cuando el frente lo alcanza.
+    segments es la lista [inicio, fin, hechos] de la descarga, protegida por lock.
+    """
+
+    def __init__(self, part_path: str, segments: List[List[int]], lock: threading.Lock):
+        self.offset = 0
+        self._digest = hashlib.sha256()
+        self._part_path = part_path
+        self._segments = segments
+        self._lock = lock
+        self._hash_lock = threading.Lock()
+
+    def feed(self, position: int, chunk: bytes):
+        """Avisa de un bloque ya escrito (y contado en su segmento) en position."""
+        with self._hash_lock:
+            if position == self.offset:
+                self._digest.update(chunk)
+                self.offset += len(chunk)
+            self._catch_up()
+
+    def hexdigest(self) -> str:
+        with self._hash_lock:
+            self._catch_up()
+            return self._digest.hexdigest()
+
+    def _written_end(self) -> int:
+        """Fin del prefijo del archivo ya escrito sin huecos."""
+        end = 0
+        with self._lock:
+            for start, last, done in self._segments:
+                end = start + done
+                if end <= last:
+                    break
+        return end
+
+    def _catch_up(self):
+        end = self._written_end()
+        if end <= self.offset:
+            return
+        with open(self._part_path, 'rb') as f:
+            f.seek(self.offset)
+            while self.offset < end:
+                data = f.read(min(HASH_READ_SIZE, end - self.offset))
+                if not data:
+                    break
+                self._digest.update(data)
+                self.offset += len(data)
+
+
+class RangedDownloader:
+    """
+    Descarga HTTP con peticiones Range en N segmentos paralelos cuando el servidor las admite.
+    - Escribe en <destino>.part y guarda el progreso de cada segmento en <destino>.part.json:
+      si la descarga se corta, la siguiente llamada con la misma URL continúa desde donde quedó.
+    - Las descargas al mismo destino dentro del proceso se hacen de una en una.
+    - Reintenta cada segmento desde su último byte ante errores de conexión.
+    - Verifica que el tamaño final coincide con el anunciado antes de publicar el archivo.
+    - Calcula el SHA-256 del contenido mientras descarga (ver SegmentHasher).
+    Si el servidor no admite Range se hace una única descarga en streaming.
+    """
+
+    def __init__(self, session: requests.Session = None, segments: int = 4, chunk_size: int = 1024 * 1024,
+                 min_segment_bytes: int = 8 * 1024 * 1024, timeout: float = 60, max_retries: int = 3):
+        self.segments = max(1, segments)
+        self.session = session or create_session(self.segments * 2)
+        self.chunk_size = chunk_size
+        self.min_segment_bytes = min_segment_bytes
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self._path_locks = {}
+        self._path_locks_lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls) -> "RangedDownloader":
+        return cls(
+            segments=int(os.getenv("DOWNLOAD_SEGMENTS", "4")),
+            chunk_size=int(os.getenv("DOWNLOAD_CHUNK_BYTES", str(1024 * 1024))),
+            min_segment_bytes=int(os.getenv("DOWNLOAD_MIN_SEGMENT_BYTES", str(8 * 1024 * 1024))),
+        )
+
+    def probe(self, url: str, headers: Dict[str, str] = None) -> Dict[str, Any]:
+        """
+        Pide el primer byte para saber si hay soporte de Range, el tamaño total,
+        el content-type y la URL final tras redirecciones (Drive, Dropbox...).
+        """
+        headers = dict(headers or {}, Range='bytes=0-0')
+        headers['Accept-Encoding'] = 'identity'
+        response = self.session.get(url, headers=headers, stream=True, timeout=self.timeout, allow_redirects=True)
+        try:
+            response.raise_for_status()
+            total = None
+            ranged = False
+            content_range = response.headers.get('Content-Range', '')
+            if response.status_code == 206 and '/' in content_range:
+                size = content_range.rsplit('/', 1)[1]
+                if size.isdigit():
+                    total = int(size)
+                    ranged = True
+            elif response.headers.get('Content-Length', '').isdigit():
+                total = int(response.headers['Content-Length'])
+            return {
+                'url': response.url,
+                'total': total,
+                'ranged': ranged,
+                'content_type': response.headers.get('content-type', '').lower(),
+                'validator': response.headers.get('ETag') or response.headers.get('Last-Modified') or '',
+            }
+        finally:
+            response.close()
+
+    def download(self, url: str, path: str, headers: Dict[str, str] = None, remote: Dict[str, Any] = None) -> Dict[str, Any]:
+        """Descarga url en path. Devuelve estadísticas (bytes, segmentos, bytes reanudados, sha256, segundos)."""
+        with self._path_lock(path):
+            started = time.time()
+            remote = remote or self.probe(url, headers)
+            headers = dict(headers or {})
+            headers['Accept-Encoding'] = 'identity'
+            part_path = f"{path}.part"
+            state_path = f"{path}.part.json"
+
+            if remote['ranged'] and remote['total']:
+                resumed, segments, sha256 = self._download_ranged(url, remote, part_path, state_path, headers)
+            else:
+                resumed = 0
+                segments = 1
+                sha256 = self._download_single(remote, part_path, headers)
+
+            size = os.path.getsize(part_path)
+            if remote['total'] is not None and size != remote['total']:
+                raise DownloadError(f"Tamaño incorrecto: {size} bytes de {remote['total']}")
+
+            os.replace(part_path, path)
+            if os.path.exists(state_path):
+                os.remove(state_path)
+        return {
+            'bytes': size,
+            'segments': segments,
+            'resumed_bytes': resumed,
+            'sha256': sha256,
+            'seconds': time.time() - started,
+        }
+
+    def _path_lock(self, path: str) -> threading.Lock:
+        with self._path_locks_lock:
+            return self._path_locks.setdefault(os.path.abspath(path), threading.Lock())
+
+    def _plan_segments(self, total: int) -> List[List[int]]:
+        """[inicio, fin (inclusive), bytes hechos] de cada segmento."""
+        count = max(1, min(self.segments, total // self.min_segment_bytes))
+        size = -(-total // count)
+        return [[start, min(start + size, total) - 1, 0] for start in range(0, total, size)]
+
+    def _load_state(self, state_path: str, url: str, remote: Dict[str, Any]) -> Optional[List[List[int]]]:
+        try:
+            with open(state_path, 'r', encoding='utf-8') as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            return None
+        # Solo se reanuda si es el mismo archivo remoto: misma URL, tamaño y ETag / Last-Modified
+        # (sin validador el tamaño no basta: dos archivos distintos pueden medir lo mismo)
+        if (state.get('url') != url or state.get('total') != remote['total']
+                or state.get('validator') != remote['validator']):
+            return None
+        return state['segments']
+
+    def _save_state(self, state_path: str, url: str, remote: Dict[str, Any], segments: List[List[int]]):
+        tmp_path = f"{state_path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'url': url, 'total': remote['total'], 'validator': remote['validator'], 'segments': segments}, f)
+        os.replace(tmp_path, state_path)
+
+    def _download_ranged(self, url: str, remote: Dict[str, Any], part_path: str, state_path: str, headers: Dict[str, str]) -> tuple:
+        """Descarga los segmentos pendientes. Devuelve (bytes reanudados, número de segmentos, sha256)."""
+        segments = self._load_state(state_path, url, remote) if os.path.exists(part_path) else None
+        resumed = 0
+        if segments:
+            resumed = sum(done for _, _, done in segments)
+            print(f"⏯️ Reanudando descarga: {resumed / 1e6:.1f} MB ya descargados")
+        else:
+            segments = self._plan_segments(remote['total'])
+            # Reservar el tamaño final: cada segmento escribe en su posición
+            with open(part_path, 'wb') as f:
+                f.truncate(remote['total'])
+            self._save_state(state_path, url, remote, segments)
+
+        lock = threading.Lock()
+        # Al reanudar, lo ya descargado se añade al hash desde el archivo parcial
+        hasher = SegmentHasher(part_path, segments, lock)
+        pending = [segment for segment in segments if segment[0] + segment[2] <= segment[1]]
+        print(f"⬇️ Descarga en {len(segments)} segmentos ({len(pending)} pendientes), {remote['total'] / 1e6:.1f} MB")
+
+        def fetch(segment):
+            attempt = 0
+            while True:
+                try:
+                    self._fetch_segment(remote['url'], headers, part_path, segment, lock,
+                                        lambda: self._save_state(state_path, url, remote, segments), hasher)
+                    return
+                except (requests.RequestException, DownloadError) as e:
+                    attempt += 1
+                    if attempt > self.max_retries:
+                        raise
+                    print(f"⚠️ Segmento {segment[0]}-{segment[1]} interrumpido ({e}). Reintento {attempt}/{self.max_retries}...")
+                    time.sleep(min(2 ** attempt, 10))
+
+        try:
+            if pending:
+                with ThreadPoolExecutor(max_workers=len(pending), thread_name_prefix="range") as executor:
+                    for future in [executor.submit(fetch, segment) for segment in pending]:
+                        future.result()
+        finally:
+            with lock:
+                self._save_state(state_path, url, remote, segments)
+
+        return resumed, len(segments), hasher.hexdigest()
+
+    def _fetch_segment(self, url, headers, part_path, segment, lock, save_state, hasher):
+        start, end, done = segment
+        if start + done > end:
+            return
+        range_headers = dict(headers, Range=f"bytes={start + done}-{end}")
+        with self.session.get(url, headers=range_headers, stream=True, timeout=self.timeout) as response:
+            response.raise_for_status()
+            if response.status_code != 206:
+                raise DownloadError(f"El servidor ignoró el Range (HTTP {response.status_code})")
+            unsaved = 0
+            with open(part_path, 'r+b') as f:
+                f.seek(start + done)
+                for chunk in response.iter_content(chunk_size=self.chunk_size):
+                    if not chunk:
+                        continue
+                    chunk = chunk[:end + 1 - (start + segment[2])]
+                    position = start + segment[2]
+                    f.write(chunk)
+                    # Vaciar antes de contar el bloque: el estado nunca adelanta a los datos escritos
+                    f.flush()
+                    unsaved += len(chunk)
+                    with lock:
+                        segment[2] += len(chunk)
+                        if unsaved >= STATE_SAVE_EVERY:
+                            save_state()
+                            unsaved = 0
+                    hasher.feed(position, chunk)
+                    if start + segment[2] > end:
+                        break
+        if start + segment[2] <= end:
+            raise DownloadError(f"Segmento incompleto: {segment[2]} de {end - start + 1} bytes")
+
+    def _download_single(self, remote: Dict[str, Any], part_path: str, headers: Dict[str, str]):
+        """Sin Range: una sola descarga en streaming (no se puede reanudar). Devuelve el sha256."""
+        print("⬇️ El servidor no admite Range: descarga en un solo flujo")
+        with self.session.get(remote['url'], headers=headers, stream=True, timeout=self.timeout) as response:
+            response.raise_for_status()
+            digest = hashlib.sha256()
+            with open(part_path, 'wb') as f:
+                for chunk in response.iter_content(chunk_size=self.chunk_size):
+                    if chunk:
+                        f.write(chunk)
+                        digest.update(chunk)
+        return digest.hexdigest()
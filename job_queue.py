@@ -0,0 +1,125 @@
+import asyncio
+import heapq
+import math
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+
+class QueueFullError(Exception):
+    """La cola de trabajos está llena; retry_after = segundos estimados hasta que haya hueco."""
+
+    def __init__(self, retry_after: int):
+        super().__init__(f"Cola de trabajos llena. Reintentar en {retry_after}s")
+        self.retry_after = retry_after
+
+
+class JobQueue:
+    """
+    Cola acotada de trabajos con un número fijo de workers en el loop de asyncio.
+    - submit rechaza con QueueFullError cuando hay max_depth trabajos esperando.
+    - La duración de los trabajos se estima con una media exponencial (EWMA) de los terminados;
+      con ella se calcula cuándo empezará cada trabajo en espera.
+    - on_change(esperando) recibe [(job_id, posición 1..n, segundos hasta empezar)] cada vez que la cola cambia.
+    Es por proceso: con varios workers de uvicorn cada uno tiene su cola y sus límites.
+    """
+
+    def __init__(self, workers: int = 2, max_depth: int = 20, alpha: float = 0.2,
+                 initial_duration: float = 120.0,
+                 on_change: Callable[[List[Tuple[str, int, float]]], None] = None):
+        self.workers = max(1, workers)
+        self.max_depth = max_depth
+        self.alpha = alpha
+        self.avg_duration = initial_duration
+        self.on_change = on_change
+        self.completed = 0
+        self.rejected = 0
+        self._waiting: "deque[Tuple[str, Callable[[], Awaitable[Any]]]]" = deque()
+        self._running: Dict[str, float] = {}
+        self._wakeup: Optional[asyncio.Event] = None
+        self._tasks: List[asyncio.Task] = []
+
+    def start(self):
+        """Arranca los workers en el loop actual (llamar desde el evento startup)."""
+        if self._tasks:
+            return
+        self._wakeup = asyncio.Event()
+        self._tasks = [asyncio.create_task(self._worker(n)) for n in range(self.workers)]
+        print(f"🧵 Cola de trabajos: {self.workers} workers, máximo {self.max_depth} en espera")
+
+    def submit(self, job_id: str, job: Callable[[], Awaitable[Any]]) -> int:
+        """Encola el trabajo (job() devuelve la corrutina a ejecutar). Devuelve su posición (1 = el siguiente)."""
+        if self.is_full():
+            self.rejected += 1
+            raise QueueFullError(self.retry_after())
+        self._waiting.append((job_id, job))
+        if self._wakeup is not None:
+            self._wakeup.set()
+        self._notify()
+        return len(self._waiting)
+
+    def is_full(self) -> bool:
+        return len(self._waiting) >= self.max_depth
+
+    def _start_times(self, count: int) -> List[float]:
+        """Segundos hasta que empiecen los `count` primeros trabajos en espera (simulación con la EWMA)."""
+        now = time.monotonic()
+        # Momento (relativo) en que queda libre cada worker
+        free_at = [max(0.0, self.avg_duration - (now - started)) for started in self._running.values()]
+        free_at += [0.0] * (self.workers - len(free_at))
+        heapq.heapify(free_at)
+        starts = []
+        for _ in range(count):
+            start = heapq.heappop(free_at)
+            starts.append(start)
+            heapq.heappush(free_at, start + self.avg_duration)
+        return starts
+
+    def waiting(self) -> List[Tuple[str, int, float]]:
+        """[(job_id, posición, segundos estimados hasta empezar)] de los trabajos en espera."""
+        starts = self._start_times(len(self._waiting))
+        return [(job_id, position, starts[position - 1])
+                for position, (job_id, _) in enumerate(self._waiting, start=1)]
+
+    def retry_after(self) -> int:
+        """Segundos estimados hasta que empiece el primer trabajo en espera (y quede un hueco)."""
+        starts = self._start_times(1)
+        return max(1, math.ceil(starts[0]))
+
+    def _notify(self):
+        if self.on_change:
+            try:
+                self.on_change(self.waiting())
+            except Exception as e:
+                print(f"⚠️ Error publicando el estado de la cola: {e}")
+
+    async def _worker(self, number: int):
+        while True:
+            while not self._waiting:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+            job_id, job = self._waiting.popleft()
+            started = time.monotonic()
+            self._running[job_id] = started
+            self._notify()
+            try:
+                await job()
+            except Exception as e:
+                # Los trabajos registran sus propios errores en el almacén; esto es la última red
+                print(f"Error no controlado en el trabajo {job_id}: {e}")
+            finally:
+                del self._running[job_id]
+                self.avg_duration += self.alpha * ((time.monotonic() - started) - self.avg_duration)
+                self.completed += 1
+                self._notify()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'workers': self.workers,
+            'running': len(self._running),
+            'waiting': len(self._waiting),
+            'max_depth': self.max_depth,
+            'avg_duration_seconds': round(self.avg_duration, 1),
+            'completed': self.completed,
+            'rejected': self.rejected,
+        }
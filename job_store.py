@@ -0,0 +1,419 @@
+import copy
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Any, Callable, Dict, Optional
+
+try:
+    import fcntl
+except ImportError:
+    # Windows: sin bloqueos de archivo, cualquier trabajo de otro proceso se da por interrumpido
+    fcntl = None
+
+# Campos de estado de un trabajo (lo que consulta /status con frecuencia); el resultado va aparte
+JOB_FIELDS = ('status', 'progress', 'error', 'message', 'branches', 'queue_position', 'estimated_start')
+# Columnas añadidas después de la primera versión de la tabla jobs (se agregan al abrir bases antiguas)
+ADDED_COLUMNS = {'queue_position': 'INTEGER', 'estimated_start': 'REAL', 'owner': 'TEXT'}
+# Estados finales: a partir de ellos empieza a contar el TTL
+FINISHED_STATUSES = ('completed', 'error')
+# Cada cuánto (segundos) se buscan trabajos caducados como mucho
+EVICT_INTERVAL = 60
+# Error de los trabajos que quedaron a medias al morir el proceso que los ejecutaba
+INTERRUPTED_ERROR = "Interrumpido por un reinicio del servidor"
+
+
+class JobStore:
+    """
+    Interfaz del almacén de trabajos de la API.
+    Los campos de estado (JOB_FIELDS) se guardan separados del resultado, que puede ser grande.
+    Los trabajos terminados caducan ttl segundos después de terminar.
+    """
+    name = "base"
+
+    def __init__(self, ttl: float = 86400):
+        self.ttl = ttl
+        self._last_evict = 0.0
+
+    def create(self, job_id: str):
+        raise NotImplementedError
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Campos de estado del trabajo (sin el resultado), o None si no existe."""
+        raise NotImplementedError
+
+    def update(self, job_id: str, **fields):
+        """Actualiza campos de estado."""
+        raise NotImplementedError
+
+    def modify(self, job_id: str, fn: Callable[[Dict[str, Any]], None]):
+        """Lee, modifica (fn muta el dict de estado) y guarda de forma atómica."""
+        raise NotImplementedError
+
+    def update_many(self, updates: Dict[str, Dict[str, Any]]):
+        """Actualiza campos de estado de varios trabajos ({job_id: campos}) de una vez."""
+        raise NotImplementedError
+
+    def delete(self, job_id: str):
+        """Borra el trabajo y su resultado (p.ej. si la cola lo rechaza al crearlo)."""
+        raise NotImplementedError
+
+    def get_result_json(self, job_id: str) -> Optional[str]:
+        """Resultado como texto JSON, sin deserializarlo."""
+        raise NotImplementedError
+
+    def set_result(self, job_id: str, result: Dict[str, Any]):
+        raise NotImplementedError
+
+    def modify_result(self, job_id: str, fn: Callable[[Optional[Dict[str, Any]]], Dict[str, Any]]):
+        """Lee el resultado, fn devuelve el nuevo y se guarda de forma atómica."""
+        raise NotImplementedError
+
+    def evict_expired(self) -> int:
+        """Borra los trabajos terminados hace más de ttl segundos; devuelve cuántos."""
+        raise NotImplementedError
+
+    def recover_interrupted(self) -> int:
+        """
+        Marca como error los trabajos sin terminar de procesos que ya no existen (llamar al arrancar):
+        si no, quedarían en curso para siempre, sin caducar, y los clientes seguirían consultándolos.
+        Devuelve cuántos. En memoria no hay nada que recuperar: se pierden con el proceso.
+        """
+        return 0
+
+    def stats(self) -> Dict[str, Any]:
+        raise NotImplementedError
+
+    def get_result(self, job_id: str) -> Optional[Dict[str, Any]]:
+        raw = self.get_result_json(job_id)
+        return json.loads(raw) if raw else None
+
+    def _maybe_evict(self):
+        """Limpieza oportunista al crear trabajos (sin hilo aparte)."""
+        now = time.time()
+        if self.ttl > 0 and now - self._last_evict >= EVICT_INTERVAL:
+            self._last_evict = now
+            evicted = self.evict_expired()
+            if evicted:
+                print(f"🧹 {evicted} trabajos caducados eliminados del almacén")
+
+
+class MemoryJobStore(JobStore):
+    """En memoria del proceso: se pierde al reiniciar y no se comparte entre workers de uvicorn."""
+    name = "memory"
+
+    def __init__(self, ttl: float = 86400):
+        super().__init__(ttl)
+        self._jobs: Dict[str, Dict[str, Any]] = {}
+        self._results: Dict[str, Dict[str, Any]] = {}
+        self._finished_at: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def create(self, job_id):
+        self._maybe_evict()
+        with self._lock:
+            self._jobs[job_id] = dict({field: None for field in JOB_FIELDS}, id=job_id, status='pending', progress=0)
+
+    def get(self, job_id):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return copy.deepcopy(job) if job else None
+
+    def update(self, job_id, **fields):
+        self.modify(job_id, lambda job: job.update(fields))
+
+    def modify(self, job_id, fn):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return
+            fn(job)
+            if job['status'] in FINISHED_STATUSES:
+                self._finished_at.setdefault(job_id, time.time())
+
+    def update_many(self, updates):
+        for job_id, fields in updates.items():
+            self.update(job_id, **fields)
+
+    def delete(self, job_id):
+        with self._lock:
+            self._jobs.pop(job_id, None)
+            self._results.pop(job_id, None)
+            self._finished_at.pop(job_id, None)
+
+    def get_result_json(self, job_id):
+        with self._lock:
+            result = self._results.get(job_id)
+            return json.dumps(result, ensure_ascii=False) if result is not None else None
+
+    def set_result(self, job_id, result):
+        with self._lock:
+            if job_id in self._jobs:
+                self._results[job_id] = result
+
+    def modify_result(self, job_id, fn):
+        with self._lock:
+            if job_id in self._jobs:
+                self._results[job_id] = fn(self._results.get(job_id))
+
+    def evict_expired(self):
+        limit = time.time() - self.ttl
+        with self._lock:
+            expired = [job_id for job_id, finished in self._finished_at.items() if finished < limit]
+            for job_id in expired:
+                self._jobs.pop(job_id, None)
+                self._results.pop(job_id, None)
+                self._finished_at.pop(job_id, None)
+        return len(expired)
+
+    def stats(self):
+        with self._lock:
+            by_status = {}
+            for job in self._jobs.values():
+                by_status[job['status']] = by_status.get(job['status'], 0) + 1
+            return {'store': self.name, 'jobs': len(self._jobs), 'by_status': by_status, 'ttl_seconds': self.ttl}
+
+
+class SQLiteJobStore(JobStore):
+    """
+    En SQLite (WAL): sobrevive a reinicios y lo comparten varios workers de uvicorn.
+    Tabla jobs con los campos de estado y tabla job_results con el JSON del resultado,
+    así /status no lee ni deserializa el resultado salvo que se pida.
+    Las modificaciones leer-cambiar-guardar usan BEGIN IMMEDIATE: atómicas también entre procesos.
+    Cada trabajo guarda qué proceso lo creó (owner); el proceso mantiene bloqueado su archivo
+    <path>.owners/<owner>.lock mientras vive, así al arrancar se distinguen los trabajos de otros
+    workers vivos de los que quedaron huérfanos tras un reinicio.
+    """
+    name = "sqlite"
+
+    def __init__(self, path: str, ttl: float = 86400):
+        super().__init__(ttl)
+        self.path = path
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+
+        self.owner = uuid.uuid4().hex
+        self._owners_dir = f"{path}.owners"
+        os.makedirs(self._owners_dir, exist_ok=True)
+        self._owner_file = open(self._owner_path(self.owner), 'w')
+        if fcntl:
+            fcntl.flock(self._owner_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+
+        # isolation_level=None: las transacciones se abren explícitamente
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("PRAGMA foreign_keys=ON")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS jobs (
+                id TEXT PRIMARY KEY,
+                status TEXT NOT NULL,
+                progress INTEGER NOT NULL,
+                error TEXT,
+                message TEXT,
+                branches TEXT,
+                queue_position INTEGER,
+                estimated_start REAL,
+                owner TEXT,
+                created_at REAL NOT NULL,
+                updated_at REAL NOT NULL,
+                finished_at REAL
+            )
+        """)
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(jobs)")}
+        for column, column_type in ADDED_COLUMNS.items():
+            if column not in columns:
+                self._conn.execute(f"ALTER TABLE jobs ADD COLUMN {column} {column_type}")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_finished_at ON jobs (finished_at)")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS job_results (
+                job_id TEXT PRIMARY KEY REFERENCES jobs (id) ON DELETE CASCADE,
+                result TEXT NOT NULL
+            )
+        """)
+
+    def _row_to_job(self, row) -> Dict[str, Any]:
+        job = dict(zip(('id',) + JOB_FIELDS, row))
+        job['branches'] = json.loads(job['branches']) if job['branches'] else None
+        return job
+
+    def _read(self, job_id):
+        row = self._conn.execute(
+            f"SELECT id, {', '.join(JOB_FIELDS)} FROM jobs WHERE id = ?", (job_id,)
+        ).fetchone()
+        return self._row_to_job(row) if row else None
+
+    def _write(self, job):
+        now = time.time()
+        self._conn.execute(
+            "UPDATE jobs SET status = ?, progress = ?, error = ?, message = ?, branches = ?, "
+            "queue_position = ?, estimated_start = ?, updated_at = ?, "
+            "finished_at = CASE WHEN ? IN ({}) THEN COALESCE(finished_at, ?) ELSE finished_at END "
+            "WHERE id = ?".format(", ".join("?" * len(FINISHED_STATUSES))),
+            (job['status'], job['progress'], job['error'], job['message'],
+             json.dumps(job['branches']) if job['branches'] is not None else None,
+             job['queue_position'], job['estimated_start'],
+             now, job['status'], *FINISHED_STATUSES, now, job['id'])
+        )
+
+    def create(self, job_id):
+        self._maybe_evict()
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO jobs (id, status, progress, owner, created_at, updated_at) "
+                "VALUES (?, 'pending', 0, ?, ?, ?)",
+                (job_id, self.owner, now, now)
+            )
+
+    def get(self, job_id):
+        with self._lock:
+            return self._read(job_id)
+
+    def update(self, job_id, **fields):
+        self.modify(job_id, lambda job: job.update(fields))
+
+    def modify(self, job_id, fn):
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                job = self._read(job_id)
+                if job is not None:
+                    fn(job)
+                    self._write(job)
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def update_many(self, updates):
+        # Una sola transacción para todos: una escritura (y un fsync del WAL) en vez de una por trabajo
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                for job_id, fields in updates.items():
+                    job = self._read(job_id)
+                    if job is not None:
+                        job.update(fields)
+                        self._write(job)
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def delete(self, job_id):
+        with self._lock:
+            # El resultado se borra en cascada
+            self._conn.execute("DELETE FROM jobs WHERE id = ?", (job_id,))
+
+    def get_result_json(self, job_id):
+        with self._lock:
+            row = self._conn.execute("SELECT result FROM job_results WHERE job_id = ?", (job_id,)).fetchone()
+            return row[0] if row else None
+
+    def set_result(self, job_id, result):
+        payload = json.dumps(result, ensure_ascii=False)
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO job_results (job_id, result) SELECT id, ? FROM jobs WHERE id = ?",
+                (payload, job_id)
+            )
+
+    def modify_result(self, job_id, fn):
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._conn.execute("SELECT result FROM job_results WHERE job_id = ?", (job_id,)).fetchone()
+                result = fn(json.loads(row[0]) if row else None)
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO job_results (job_id, result) SELECT id, ? FROM jobs WHERE id = ?",
+                    (json.dumps(result, ensure_ascii=False), job_id)
+                )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def evict_expired(self):
+        with self._lock:
+            cursor = self._conn.execute(
+                "DELETE FROM jobs WHERE finished_at IS NOT NULL AND finished_at < ?", (time.time() - self.ttl,)
+            )
+            return cursor.rowcount
+
+    def _owner_path(self, owner: str) -> str:
+        return os.path.join(self._owners_dir, f"{owner}.lock")
+
+    def _owner_alive(self, owner: Optional[str]) -> bool:
+        """True si el proceso dueño sigue vivo (mantiene bloqueado su archivo)."""
+        if not owner or fcntl is None:
+            return False
+        try:
+            with open(self._owner_path(owner), 'r') as f:
+                fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                # Se pudo bloquear: nadie lo tenía, el proceso ya no existe
+                return False
+        except BlockingIOError:
+            return True
+        except OSError:
+            return False
+
+    def recover_interrupted(self):
+        with self._lock:
+            owners = [row[0] for row in self._conn.execute(
+                "SELECT DISTINCT owner FROM jobs WHERE finished_at IS NULL AND (owner IS NULL OR owner != ?)",
+                (self.owner,)
+            )]
+            dead = [owner for owner in owners if not self._owner_alive(owner)]
+            now = time.time()
+            recovered = 0
+            for owner in dead:
+                cursor = self._conn.execute(
+                    "UPDATE jobs SET status = 'error', error = ?, queue_position = NULL, estimated_start = NULL, "
+                    "updated_at = ?, finished_at = ? WHERE finished_at IS NULL AND owner IS ?",
+                    (INTERRUPTED_ERROR, now, now, owner)
+                )
+                recovered += cursor.rowcount
+                if owner:
+                    try:
+                        os.remove(self._owner_path(owner))
+                    except OSError:
+                        pass
+        if recovered:
+            print(f"♻️ {recovered} trabajos interrumpidos por un reinicio marcados como error")
+        return recovered
+
+    def stats(self):
+        with self._lock:
+            rows = self._conn.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall()
+            return {
+                'store': self.name,
+                'jobs': sum(count for _, count in rows),
+                'by_status': dict(rows),
+                'ttl_seconds': self.ttl,
+            }
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+            self._owner_file.close()
+            try:
+                os.remove(self._owner_path(self.owner))
+            except OSError:
+                pass
+
+
+def create_job_store(name: str = None) -> JobStore:
+    """Crea el almacén indicado (por defecto JOB_STORE o 'sqlite') con el TTL de JOB_TTL_SECONDS."""
+    name = (name or os.getenv("JOB_STORE", "sqlite")).lower()
+    ttl = float(os.getenv("JOB_TTL_SECONDS", "86400"))
+    if name == "memory":
+        return MemoryJobStore(ttl=ttl)
+    if name == "sqlite":
+        default_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'jobs.db')
+        return SQLiteJobStore(os.getenv("JOB_STORE_PATH", default_path), ttl=ttl)
+    raise ValueError(f"Almacén de trabajos desconocido: {name}. Opciones: memory, sqlite")
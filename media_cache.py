@@ -0,0 +1,202 @@
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+from typing import Any, Dict, Optional, Tuple
+
+# Campos de la info de yt-dlp que se guardan junto al archivo (lo que usan los llamadores)
+METADATA_FIELDS = (
+    'id', 'extractor_key', 'title', 'thumbnail', 'channel_url', 'uploader_url',
+    'uploader', 'duration', 'categories', 'format_id', 'ext', 'content_sha256',
+)
+
+
+def media_key(extractor: str, video_id: str, profile: str) -> str:
+    return f"{extractor}:{video_id}:{profile}"
+
+
+def url_media_id(url: str) -> Optional[Tuple[str, str]]:
+    """
+    (extractor, id) de un URL sin tocar la red, con el extractor de yt-dlp que lo reconoce.
+    None si solo lo reconoce el extractor genérico (el id sale después de extraer).
+    """
+    from yt_dlp.extractor import gen_extractor_classes
+    for ie in gen_extractor_classes():
+        if ie.ie_key() == 'Generic':
+            continue
+        if ie.suitable(url):
+            video_id = ie.get_temp_id(url)
+            return (ie.ie_key(), video_id) if video_id else None
+    return None
+
+
+def info_media_id(info: Dict[str, Any]) -> Optional[Tuple[str, str]]:
+    """(extractor, id) de un resultado de extracción de yt-dlp."""
+    extractor = info.get('extractor_key') or info.get('ie_key')
+    if not extractor or not info.get('id'):
+        return None
+    return extractor, str(info['id'])
+
+
+class MediaCache:
+    """
+    Caché en disco de medios descargados, direccionada por extractor + id del video + perfil.
+    Cada entrada es el archivo (<sha1>.<ext>) y sus metadatos (<sha1>.json).
+    - Escrituras atómicas: se copia a un temporal del mismo directorio y se publica con os.replace.
+    - LRU por mtime: cada acierto lo actualiza; al superar max_bytes se borran las más antiguas.
+    - Los aciertos se entregan como hardlink (o copia) en el directorio del trabajo,
+      así el trabajo puede borrar su archivo sin tocar la caché.
+    """
+
+    def __init__(self, directory: str, max_bytes: int):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    @classmethod
+    def from_env(cls) -> Optional["MediaCache"]:
+        """Crea la caché según MEDIA_CACHE_DIR / MEDIA_CACHE_MAX_BYTES (vacío = desactivada)."""
+        default_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'media_cache')
+        directory = os.getenv("MEDIA_CACHE_DIR", default_dir)
+        if not directory:
+            return None
+        max_bytes = int(os.getenv("MEDIA_CACHE_MAX_BYTES", str(2 * 1024 ** 3)))
+        try:
+            return cls(directory, max_bytes)
+        except Exception as e:
+            print(f"⚠️ No se pudo abrir la caché de medios ({directory}): {e}")
+            return None
+
+    def _paths(self, key: str) -> Tuple[str, str]:
+        digest = hashlib.sha1(key.encode('utf-8')).hexdigest()
+        return os.path.join(self.directory, digest), os.path.join(self.directory, f"{digest}.json")
+
+    def get(self, key: str, destination: str) -> Optional[Tuple[str, Dict[str, Any]]]:
+        """
+        Si la clave está en caché, entrega el archivo en destination (sin extensión:
+        se añade la del medio) y devuelve (ruta, metadatos). None si no está.
+        """
+        base, meta_path = self._paths(key)
+        with self._lock:
+            try:
+                with open(meta_path, 'r', encoding='utf-8') as f:
+                    entry = json.load(f)
+                media_path = f"{base}.{entry['ext']}"
+                target = f"{destination}.{entry['ext']}"
+                if os.path.exists(target):
+                    os.remove(target)
+                try:
+                    os.link(media_path, target)
+                except OSError:
+                    # Distinto sistema de archivos (o sin hardlinks): copiar
+                    shutil.copyfile(media_path, target)
+                now = time.time()
+                os.utime(media_path, (now, now))
+                os.utime(meta_path, (now, now))
+            except (OSError, ValueError, KeyError):
+                self.misses += 1
+                return None
+            self.hits += 1
+        return target, entry['metadata']
+
+    def put(self, key: str, source: str, info: Dict[str, Any]):
+        """Guarda una copia del archivo descargado y sus metadatos."""
+        ext = os.path.splitext(source)[1].lstrip('.') or 'bin'
+        base, meta_path = self._paths(key)
+        media_path = f"{base}.{ext}"
+        entry = {
+            'key': key,
+            'ext': ext,
+            'size': os.path.getsize(source),
+            'metadata': {field: info.get(field) for field in METADATA_FIELDS if field in info},
+        }
+        if entry['size'] > self.max_bytes:
+            return
+
+        fd, tmp_media = tempfile.mkstemp(dir=self.directory, prefix='.tmp-')
+        os.close(fd)
+        fd, tmp_meta = tempfile.mkstemp(dir=self.directory, prefix='.tmp-')
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(entry, f, ensure_ascii=False)
+            try:
+                os.remove(tmp_media)
+                os.link(source, tmp_media)
+            except OSError:
+                shutil.copyfile(source, tmp_media)
+            with self._lock:
+                self._remove_entry(meta_path)
+                # Primero el medio y después los metadatos: una entrada sin .json no existe para get
+                os.replace(tmp_media, media_path)
+                os.replace(tmp_meta, meta_path)
+                now = time.time()
+                os.utime(media_path, (now, now))
+                self._evict()
+        finally:
+            for path in (tmp_media, tmp_meta):
+                if os.path.exists(path):
+                    os.remove(path)
+
+    def _remove_entry(self, meta_path: str):
+        """Borra una entrada existente (por si el medio nuevo tiene otra extensión)."""
+        try:
+            with open(meta_path, 'r', encoding='utf-8') as f:
+                ext = json.load(f)['ext']
+        except (OSError, ValueError, KeyError):
+            return
+        for path in (meta_path, f"{meta_path[:-len('.json')]}.{ext}"):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def _entries(self):
+        """[(mtime, tamaño, ruta del medio, ruta de metadatos)] de todas las entradas completas."""
+        entries = []
+        for name in os.listdir(self.directory):
+            if not name.endswith('.json') or name.startswith('.tmp-'):
+                continue
+            meta_path = os.path.join(self.directory, name)
+            try:
+                with open(meta_path, 'r', encoding='utf-8') as f:
+                    entry = json.load(f)
+                media_path = os.path.join(self.directory, f"{name[:-len('.json')]}.{entry['ext']}")
+                stat = os.stat(media_path)
+                entries.append((stat.st_mtime, stat.st_size, media_path, meta_path))
+            except (OSError, ValueError, KeyError):
+                continue
+        return entries
+
+    def _evict(self):
+        """Borra las entradas usadas hace más tiempo hasta quedar dentro del presupuesto."""
+        entries = sorted(self._entries())
+        total = sum(size for _, size, _, _ in entries)
+        for _, size, media_path, meta_path in entries:
+            if total <= self.max_bytes:
+                break
+            for path in (meta_path, media_path):
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+            total -= size
+            self.evictions += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            entries = self._entries()
+            return {
+                'entries': len(entries),
+                'bytes': sum(size for _, size, _, _ in entries),
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+            }
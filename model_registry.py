@@ -0,0 +1,103 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional
+
+
+class ModelRegistry:
+    """
+    Registro de modelos cargados en memoria, compartido por todo el proceso.
+    - Carga cada modelo una sola vez aunque lo pidan varios hilos a la vez.
+    - Mantiene como máximo `max_resident` modelos y descarga el menos usado (LRU).
+    - Puede precargar y calentar modelos en segundo plano al arrancar.
+    """
+
+    def __init__(self, loader: Callable, max_resident: int = 1, warmup: Optional[Callable] = None):
+        self.loader = loader
+        self.max_resident = max(1, max_resident)
+        self.warmup = warmup
+        self._models: "OrderedDict[str, object]" = OrderedDict()
+        self._load_locks: Dict[str, threading.Lock] = {}
+        self._loading = set()
+        self._errors: Dict[str, str] = {}
+        self._load_times: Dict[str, float] = {}
+        self._lock = threading.Lock()
+        self._preload_thread = None
+
+    def get(self, name: str):
+        """Devuelve el modelo `name`, cargándolo si hace falta."""
+        with self._lock:
+            if name in self._models:
+                self._models.move_to_end(name)
+                return self._models[name]
+            load_lock = self._load_locks.setdefault(name, threading.Lock())
+
+        # Solo un hilo carga cada modelo; el resto espera y lo reutiliza
+        with load_lock:
+            with self._lock:
+                if name in self._models:
+                    self._models.move_to_end(name)
+                    return self._models[name]
+                self._loading.add(name)
+
+            try:
+                print(f"Cargando modelo '{name}' (esto puede tardar un poco la primera vez)...")
+                start = time.time()
+                model = self.loader(name)
+                if self.warmup:
+                    self.warmup(model)
+                self._load_times[name] = time.time() - start
+                print(f"✅ Modelo '{name}' listo en {self._load_times[name]:.1f}s")
+            except Exception as e:
+                with self._lock:
+                    self._errors[name] = str(e)
+                    self._loading.discard(name)
+                raise
+
+            with self._lock:
+                self._loading.discard(name)
+                self._errors.pop(name, None)
+                self._models[name] = model
+                self._evict()
+            return model
+
+    def _evict(self):
+        """Descarga los modelos menos usados por encima del límite (requiere self._lock)."""
+        while len(self._models) > self.max_resident:
+            evicted, _ = self._models.popitem(last=False)
+            print(f"♻️ Modelo '{evicted}' descargado de memoria (LRU)")
+
+    def preload(self, names: List[str]) -> threading.Thread:
+        """Precarga y calienta los modelos indicados en un hilo en segundo plano."""
+        if len(names) > self.max_resident:
+            print(f"⚠️ Solo se precargan {self.max_resident} de {len(names)} modelos (límite de residentes)")
+        names = names[:self.max_resident]
+
+        def _run():
+            for name in names:
+                try:
+                    self.get(name)
+                except Exception as e:
+                    print(f"⚠️ No se pudo precargar el modelo '{name}': {e}")
+                finally:
+                    with self._lock:
+                        self._loading.discard(name)
+
+        # Marcar como en carga desde ya para que /health no informe "listo" antes de tiempo
+        with self._lock:
+            self._loading.update(names)
+        self._preload_thread = threading.Thread(target=_run, name="model-preload", daemon=True)
+        self._preload_thread.start()
+        return self._preload_thread
+
+    def status(self) -> Dict[str, object]:
+        """Estado para /health: modelos residentes, en carga y errores."""
+        with self._lock:
+            return {
+                'ready': bool(self._models) and not self._loading,
+                'resident': list(self._models),
+                'loading': sorted(self._loading),
+                'errors': dict(self._errors),
+                'load_seconds': {name: round(t, 1) for name, t in self._load_times.items()},
+                'max_resident': self.max_resident,
+            }
@@ -0,0 +1,63 @@
+import random
+import threading
+import time
+
+
+class TokenBucket:
+    """
+    Limitador token-bucket seguro entre hilos.
+    Permite ráfagas de hasta `capacity` peticiones y un ritmo sostenido de `rate` por segundo.
+    """
+
+    def __init__(self, rate: float, capacity: float = None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(1.0, rate)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self, tokens: float = 1.0):
+        """Bloquea hasta que haya `tokens` disponibles (rate <= 0 desactiva el límite)."""
+        if self.rate <= 0:
+            return
+        while True:
+            with self._lock:
+                self._refill()
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return
+                wait = (tokens - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+class RetryPolicy:
+    """Reintentos con backoff exponencial y jitter."""
+
+    def __init__(self, max_retries: int = 3, backoff_base: float = 0.5, backoff_max: float = 8.0):
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+
+    def delay(self, attempt: int) -> float:
+        """Espera antes del reintento número `attempt` (empezando en 1)."""
+        delay = min(self.backoff_max, self.backoff_base * (2 ** (attempt - 1)))
+        return delay * random.uniform(0.5, 1.0)
+
+    def call(self, func, limiter: TokenBucket = None):
+        """Ejecuta func() reintentando ante excepciones; cada intento consume un token del limitador."""
+        attempt = 0
+        while True:
+            if limiter is not None:
+                limiter.acquire()
+            try:
+                return func()
+            except Exception:
+                attempt += 1
+                if attempt > self.max_retries:
+                    raise
+                time.sleep(self.delay(attempt))
@@ -0,0 +1,142 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+# Subir si cambia el formato de los subtítulos: invalida todas las entradas anteriores
+RESULT_CACHE_VERSION = 1
+
+
+def result_key(kind: str, identifier: str, params: Dict[str, Any]) -> str:
+    """
+    Clave de un resultado: tipo ('video' o 'audio'), identificador (extractor:id o hash
+    del audio decodificado) y parámetros que cambian la salida (motor, modelo, optimización...).
+    """
+    params = dict(params, version=RESULT_CACHE_VERSION)
+    return f"{kind}:{identifier}|{json.dumps(params, sort_keys=True)}"
+
+
+def has_pending_translations(result: Dict[str, Any]) -> bool:
+    """True si algún subtítulo del resultado quedó con traducciones pendientes."""
+    return any(s.get('translationPending') for s in result.get('subtitles', []))
+
+
+class ResultCache:
+    """
+    Caché persistente de transcripciones terminadas en SQLite.
+    Guarda el JSON final completo (subtítulos traducidos y metadatos) por clave.
+    Expulsa las entradas menos usadas (LRU) cuando supera max_entries.
+    Los resultados con traducciones pendientes ('translationPending') se marcan con pending=1
+    para que backfill_translations.py los complete más tarde (ver pending_results).
+    """
+
+    def __init__(self, path: str, max_entries: int = 5000):
+        self.path = path
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+
+        # Una sola conexión compartida entre hilos, serializada con el lock
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS results (
+                cache_key TEXT PRIMARY KEY,
+                result TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                last_used REAL NOT NULL,
+                pending INTEGER NOT NULL DEFAULT 0
+            )
+        """)
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(results)")}
+        if 'pending' not in columns:
+            self._conn.execute("ALTER TABLE results ADD COLUMN pending INTEGER NOT NULL DEFAULT 0")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_results_last_used ON results (last_used)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_results_pending ON results (pending)")
+        self._conn.commit()
+
+    @classmethod
+    def from_env(cls) -> Optional["ResultCache"]:
+        """Crea la caché según RESULT_CACHE_PATH / RESULT_CACHE_MAX_ENTRIES (vacío = desactivada)."""
+        default_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'result_cache.db')
+        path = os.getenv("RESULT_CACHE_PATH", default_path)
+        if not path:
+            return None
+        max_entries = int(os.getenv("RESULT_CACHE_MAX_ENTRIES", "5000"))
+        try:
+            return cls(path, max_entries=max_entries)
+        except Exception as e:
+            print(f"⚠️ No se pudo abrir la caché de resultados ({path}): {e}")
+            return None
+
+    def get(self, keys: List[str]) -> Optional[Dict[str, Any]]:
+        """Devuelve el primer resultado guardado con alguna de las claves (None si ninguna está)."""
+        now = time.time()
+        with self._lock:
+            for key in keys:
+                row = self._conn.execute("SELECT result FROM results WHERE cache_key = ?", (key,)).fetchone()
+                if row:
+                    self._conn.execute("UPDATE results SET last_used = ? WHERE cache_key = ?", (now, key))
+                    self._conn.commit()
+                    self.hits += 1
+                    return json.loads(row[0])
+            self.misses += 1
+        return None
+
+    def put(self, keys: List[str], result: Dict[str, Any]):
+        """Guarda el mismo resultado bajo todas las claves y aplica la expulsión LRU."""
+        if not keys:
+            return
+        now = time.time()
+        payload = json.dumps(result, ensure_ascii=False)
+        pending = int(has_pending_translations(result))
+
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO results (cache_key, result, created_at, last_used, pending) VALUES (?, ?, ?, ?, ?)",
+                [(key, payload, now, now, pending) for key in keys]
+            )
+            self._evict()
+            self._conn.commit()
+
+    def pending_results(self, limit: int = 100) -> List[Tuple[str, Dict[str, Any]]]:
+        """[(clave, resultado)] de las entradas con traducciones pendientes, las más usadas primero."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT cache_key, result FROM results WHERE pending = 1 ORDER BY last_used DESC LIMIT ?", (limit,)
+            ).fetchall()
+        return [(key, json.loads(result)) for key, result in rows]
+
+    def _evict(self):
+        """Elimina las entradas menos usadas recientemente si se supera el límite."""
+        count = self._conn.execute("SELECT COUNT(*) FROM results").fetchone()[0]
+        excess = count - self.max_entries
+        if excess > 0:
+            self._conn.execute(
+                "DELETE FROM results WHERE rowid IN "
+                "(SELECT rowid FROM results ORDER BY last_used ASC LIMIT ?)",
+                (excess,)
+            )
+
+    def stats(self) -> Dict[str, int]:
+        """Contadores de aciertos/fallos y número de entradas."""
+        with self._lock:
+            entries, pending = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(pending), 0) FROM results").fetchone()
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'entries': entries,
+                'pending_translations': pending,
+                'max_entries': self.max_entries,
+            }
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,179 @@
+import importlib.util
+import os
+import threading
+from typing import Dict, List, Optional
+
+from deep_translator import GoogleTranslator
+
+from circuit_breaker import CircuitBreaker
+from rate_limiter import TokenBucket, RetryPolicy
+
+# Límite de caracteres por petición del proveedor de traducción (GoogleTranslator)
+TRANSLATION_MAX_CHARS = 5000
+# Separador usado para empaquetar varios segmentos en una sola petición
+TRANSLATION_SEPARATOR = "\n"
+
+TRANSLATION_RATE_PER_SEC = float(os.getenv("TRANSLATION_RATE_PER_SEC", "5"))
+TRANSLATION_BURST = float(os.getenv("TRANSLATION_BURST", "10"))
+TRANSLATION_MAX_RETRIES = int(os.getenv("TRANSLATION_MAX_RETRIES", "3"))
+TRANSLATION_BREAKER_THRESHOLD = int(os.getenv("TRANSLATION_BREAKER_THRESHOLD", "5"))
+TRANSLATION_BREAKER_COOLDOWN = float(os.getenv("TRANSLATION_BREAKER_COOLDOWN", "60"))
+
+# Compartidos por todos los trabajos del proceso: más trabajos simultáneos
+# no significan más peticiones por segundo al proveedor
+_translation_limiter = TokenBucket(TRANSLATION_RATE_PER_SEC, TRANSLATION_BURST)
+_translation_retry = RetryPolicy(max_retries=TRANSLATION_MAX_RETRIES)
+# Un circuit breaker por motor, también compartido por todo el proceso
+_breakers: Dict[str, CircuitBreaker] = {}
+_breakers_lock = threading.Lock()
+
+
+def get_breaker(backend_name: str) -> CircuitBreaker:
+    """Devuelve el circuit breaker del motor indicado."""
+    with _breakers_lock:
+        if backend_name not in _breakers:
+            _breakers[backend_name] = CircuitBreaker(
+                f"traducción:{backend_name}",
+                failure_threshold=TRANSLATION_BREAKER_THRESHOLD,
+                cooldown=TRANSLATION_BREAKER_COOLDOWN
+            )
+        return _breakers[backend_name]
+
+
+class TranslationBackend:
+    """
+    Interfaz de los motores de traducción.
+    translate_batch recibe un paquete ya dimensionado (max_batch_chars / max_batch_items)
+    y devuelve una traducción por texto, o None en los textos que no pudo traducir.
+    Si falla el paquete completo lanza una excepción.
+    """
+    name = "base"
+    max_batch_chars = TRANSLATION_MAX_CHARS
+    max_batch_items = 1000
+
+    def translate_batch(self, texts: List[str], source_lang: str, target_lang: str) -> List[Optional[str]]:
+        raise NotImplementedError
+
+
+class GoogleBackend(TranslationBackend):
+    """Google Translate vía deep-translator: empaqueta textos separados por saltos de línea."""
+    name = "google"
+
+    def __init__(self, translator_factory=GoogleTranslator):
+        self.translator_factory = translator_factory
+
+    def translate_batch(self, texts, source_lang, target_lang):
+        # Un traductor por paquete: las instancias no son seguras entre hilos
+        translator = self.translator_factory(source=source_lang, target=target_lang)
+
+        if len(texts) == 1:
+            return [self._request(translator, texts[0]) or None]
+
+        translated = self._request(translator, TRANSLATION_SEPARATOR.join(texts)) or ""
+
+        lines = [line.strip() for line in translated.split(TRANSLATION_SEPARATOR)]
+        if len(lines) != len(texts):
+            # El proveedor puede añadir líneas vacías; descartarlas antes de rendirse
+            lines = [line for line in lines if line]
+
+        if len(lines) == len(texts):
+            return lines
+
+        # El proveedor alteró los separadores: traducir uno a uno para no desalinear.
+        # Un error aquí se propaga (ya agotó los reintentos): el circuit breaker debe contarlo como fallo
+        print(f"⚠️ Paquete a {target_lang} desalineado ({len(lines)}/{len(texts)}). Traduciendo por segmento...")
+        return [self._request(translator, text) or None for text in texts]
+
+    def _request(self, translator, text):
+        """Una petición al proveedor, con limitador de ritmo y reintentos compartidos."""
+        return _translation_retry.call(lambda: translator.translate(text), _translation_limiter)
+
+
+class MarianBackend(TranslationBackend):
+    """
+    Motor local MarianMT (transformers) en CPU.
+    Cada modelo se carga una vez por proceso y traduce los paquetes por lotes.
+    """
+    name = "marian"
+    max_batch_items = 32
+
+    # Modelo por par de idiomas; el prefijo opcional indica el idioma destino
+    # en modelos multilingües (p.ej. ">>por<<")
+    DEFAULT_MODELS = {
+        ('it', 'en'): ('Helsinki-NLP/opus-mt-it-en', ''),
+        ('it', 'es'): ('Helsinki-NLP/opus-mt-it-es', ''),
+        ('it', 'pt'): ('Helsinki-NLP/opus-mt-itc-itc', '>>por<< '),
+    }
+
+    _models: Dict[str, tuple] = {}
+    _models_lock = threading.Lock()
+
+    # Dependencias opcionales (bloque comentado de requirements_api.txt)
+    REQUIRED_MODULES = ('transformers', 'sentencepiece', 'torch')
+
+    def __init__(self, batch_size: int = None):
+        # Fallar al crear el motor (al arrancar) y no en la primera traducción
+        missing = [module for module in self.REQUIRED_MODULES if importlib.util.find_spec(module) is None]
+        if missing:
+            raise RuntimeError(f"TRANSLATION_BACKEND=marian requiere {', '.join(missing)}: "
+                               f"pip install transformers sentencepiece torch")
+        self.batch_size = batch_size or int(os.getenv("MARIAN_BATCH_SIZE", "16"))
+
+    def _load(self, model_name):
+        """Carga (una vez por proceso) el tokenizer y el modelo."""
+        with self._models_lock:
+            if model_name not in self._models:
+                from transformers import MarianMTModel, MarianTokenizer
+                print(f"Cargando modelo de traducción local {model_name}...")
+                tokenizer = MarianTokenizer.from_pretrained(model_name)
+                model = MarianMTModel.from_pretrained(model_name)
+                model.eval()
+                # Un lock por modelo: evita competir por los hilos de torch
+                self._models[model_name] = (tokenizer, model, threading.Lock())
+            return self._models[model_name]
+
+    def translate_batch(self, texts, source_lang, target_lang):
+        import torch
+
+        if (source_lang, target_lang) not in self.DEFAULT_MODELS:
+            raise ValueError(f"Sin modelo MarianMT para {source_lang}->{target_lang}")
+        model_name, prefix = self.DEFAULT_MODELS[(source_lang, target_lang)]
+        tokenizer, model, lock = self._load(model_name)
+
+        results = []
+        for start in range(0, len(texts), self.batch_size):
+            batch = [prefix + text for text in texts[start:start + self.batch_size]]
+            with lock, torch.no_grad():
+                inputs = tokenizer(batch, return_tensors="pt", padding=True, truncation=True)
+                outputs = model.generate(**inputs)
+            results.extend(tokenizer.batch_decode(outputs, skip_special_tokens=True))
+        return results
+
+
+class FakeBackend(TranslationBackend):
+    """Motor determinista para pruebas: devuelve '[destino] texto' sin red."""
+    name = "fake"
+
+    def __init__(self):
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def translate_batch(self, texts, source_lang, target_lang):
+        with self._lock:
+            self.calls += 1
+        return [f"[{target_lang}] {text}" for text in texts]
+
+
+BACKENDS = {
+    'google': GoogleBackend,
+    'marian': MarianBackend,
+    'fake': FakeBackend,
+}
+
+
+def create_backend(name: str = None) -> TranslationBackend:
+    """Crea el motor indicado (por defecto TRANSLATION_BACKEND o 'google')."""
+    name = (name or os.getenv("TRANSLATION_BACKEND", "google")).lower()
+    if name not in BACKENDS:
+        raise ValueError(f"Motor de traducción desconocido: {name}. Opciones: {', '.join(BACKENDS)}")
+    return BACKENDS[name]()
@@ -0,0 +1,136 @@
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+
+class TranslationCache:
+    """
+    Caché persistente de traducciones en SQLite.
+    Clave: (texto original, idioma origen, idioma destino, backend).
+    Expulsa las entradas menos usadas (LRU) en cuanto supera max_entries. El número de filas se cuenta
+    una vez al abrir (COUNT(*) recorre toda la tabla) y después se lleva en memoria con lo que este
+    proceso inserta y borra: las filas que añadan otros procesos sobre el mismo archivo no se ven.
+    """
+
+    def __init__(self, path: str, max_entries: int = 200000):
+        self.path = path
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+
+        # Una sola conexión compartida entre hilos, serializada con el lock
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS translations (
+                source_text TEXT NOT NULL,
+                source_lang TEXT NOT NULL,
+                target_lang TEXT NOT NULL,
+                backend TEXT NOT NULL,
+                translation TEXT NOT NULL,
+                last_used REAL NOT NULL,
+                PRIMARY KEY (source_text, source_lang, target_lang, backend)
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_translations_last_used ON translations (last_used)")
+        self._conn.commit()
+        self._entries = self._conn.execute("SELECT COUNT(*) FROM translations").fetchone()[0]
+
+    @classmethod
+    def from_env(cls) -> Optional["TranslationCache"]:
+        """Crea la caché según TRANSLATION_CACHE_PATH / TRANSLATION_CACHE_MAX_ENTRIES (vacío = desactivada)."""
+        default_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'translation_cache.db')
+        path = os.getenv("TRANSLATION_CACHE_PATH", default_path)
+        if not path:
+            return None
+        max_entries = int(os.getenv("TRANSLATION_CACHE_MAX_ENTRIES", "200000"))
+        try:
+            return cls(path, max_entries=max_entries)
+        except Exception as e:
+            print(f"⚠️ No se pudo abrir la caché de traducciones ({path}): {e}")
+            return None
+
+    def get_many(self, texts: List[str], source_lang: str, target_lang: str, backend: str) -> Dict[str, str]:
+        """Devuelve {texto: traducción} para los textos presentes en caché."""
+        found = {}
+        unique_texts = list(dict.fromkeys(texts))
+        now = time.time()
+
+        with self._lock:
+            # SQLite limita el número de parámetros por consulta
+            for start in range(0, len(unique_texts), 500):
+                batch = unique_texts[start:start + 500]
+                placeholders = ",".join("?" * len(batch))
+                rows = self._conn.execute(
+                    f"SELECT source_text, translation FROM translations "
+                    f"WHERE source_lang = ? AND target_lang = ? AND backend = ? AND source_text IN ({placeholders})",
+                    [source_lang, target_lang, backend, *batch]
+                ).fetchall()
+                found.update(rows)
+
+            if found:
+                self._conn.executemany(
+                    "UPDATE translations SET last_used = ? "
+                    "WHERE source_text = ? AND source_lang = ? AND target_lang = ? AND backend = ?",
+                    [(now, text, source_lang, target_lang, backend) for text in found]
+                )
+                self._conn.commit()
+
+            self.hits += len(found)
+            self.misses += len(unique_texts) - len(found)
+
+        return found
+
+    def put_many(self, pairs: List[Tuple[str, str]], source_lang: str, target_lang: str, backend: str):
+        """Guarda pares (texto, traducción) y aplica la expulsión LRU."""
+        if not pairs:
+            return
+        now = time.time()
+
+        with self._lock:
+            # Primero las que ya existen y después las nuevas: rowcount de la inserción = filas añadidas
+            self._conn.executemany(
+                "UPDATE translations SET translation = ?, last_used = ? "
+                "WHERE source_text = ? AND source_lang = ? AND target_lang = ? AND backend = ?",
+                [(translation, now, text, source_lang, target_lang, backend) for text, translation in pairs]
+            )
+            inserted = self._conn.executemany(
+                "INSERT OR IGNORE INTO translations "
+                "(source_text, source_lang, target_lang, backend, translation, last_used) VALUES (?, ?, ?, ?, ?, ?)",
+                [(text, source_lang, target_lang, backend, translation, now) for text, translation in pairs]
+            ).rowcount
+            self._entries += inserted
+            self._evict()
+            self._conn.commit()
+
+    def _evict(self):
+        """Elimina las entradas menos usadas recientemente si se supera el límite."""
+        excess = self._entries - self.max_entries
+        if excess > 0:
+            deleted = self._conn.execute(
+                "DELETE FROM translations WHERE rowid IN "
+                "(SELECT rowid FROM translations ORDER BY last_used ASC LIMIT ?)",
+                (excess,)
+            ).rowcount
+            self._entries -= deleted
+
+    def stats(self) -> Dict[str, int]:
+        """Contadores de aciertos/fallos y número de entradas."""
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'entries': self._entries,
+                'max_entries': self.max_entries,
+            }
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
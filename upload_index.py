@@ -0,0 +1,152 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, Optional
+
+# Tamaño de lectura al añadir al hash los bytes nuevos de una descarga
+HASH_READ_SIZE = 1 << 20
+
+
+class DownloadHasher:
+    """
+    SHA-256 de lo que descarga yt-dlp, calculado mientras descarga: es un progress hook que en cada
+    aviso añade solo los bytes nuevos del archivo parcial (recién escritos, aún en la caché de páginas).
+    Con un solo archivo es el SHA-256 de ese archivo; con formatos que se unen (video + audio) es el
+    SHA-256 de los hashes de cada archivo en orden de descarga. Lo que no se puede seguir (un archivo
+    que ya existía, una descarga que vuelve a empezar desde un punto no visto) lo invalida: hexdigest()
+    devuelve None y la subida no se deduplica, en vez de volver a leer el archivo.
+    """
+
+    def __init__(self):
+        self._digests = []
+        self._current = None
+        self._offset = 0
+        self._valid = True
+
+    def __call__(self, d: Dict):
+        if not self._valid:
+            return
+        status = d.get('status')
+        if status == 'downloading':
+            path = d.get('tmpfilename') or d.get('filename')
+            if path != self._current:
+                self._start(path)
+            self._feed(path, d.get('downloaded_bytes'))
+        elif status == 'finished':
+            # El hook de fin llega con el archivo ya renombrado: se lee lo que falte hasta el final
+            if self._current is None:
+                self._valid = False
+                return
+            self._feed(d.get('filename'), None)
+            self._current = None
+
+    def _start(self, path: str):
+        self._digests.append(hashlib.sha256())
+        self._current = path
+        self._offset = 0
+
+    def _feed(self, path: str, upto: Optional[int]):
+        if upto is not None and upto < self._offset:
+            # La descarga volvió a empezar (reintento sin Range): sus primeros bytes ya no están en el hash
+            self._valid = False
+            return
+        try:
+            with open(path, 'rb') as f:
+                f.seek(self._offset)
+                while upto is None or self._offset < upto:
+                    chunk = f.read(HASH_READ_SIZE if upto is None else min(HASH_READ_SIZE, upto - self._offset))
+                    if not chunk:
+                        break
+                    self._digests[-1].update(chunk)
+                    self._offset += len(chunk)
+        except OSError:
+            self._valid = False
+
+    def hexdigest(self) -> Optional[str]:
+        if not self._valid or not self._digests or self._current is not None:
+            return None
+        if len(self._digests) == 1:
+            return self._digests[0].hexdigest()
+        return hashlib.sha256(''.join(d.hexdigest() for d in self._digests).encode()).hexdigest()
+
+
+class UploadIndex:
+    """
+    Índice local en SQLite de archivos ya subidos: (sha256 del contenido, endpoint) -> URL pública.
+    Evita volver a subir (y volver a preguntar al backend) el mismo video.
+    Las entradas más antiguas que max_age se ignoran: el backend podría haber borrado el objeto.
+    """
+
+    def __init__(self, path: str, max_age: float = 30 * 86400):
+        self.path = path
+        self.max_age = max_age
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS uploads (
+                sha256 TEXT NOT NULL,
+                endpoint TEXT NOT NULL,
+                url TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                PRIMARY KEY (sha256, endpoint)
+            )
+        """)
+        self._conn.commit()
+
+    @classmethod
+    def from_env(cls) -> Optional["UploadIndex"]:
+        """Crea el índice según UPLOAD_INDEX_PATH / UPLOAD_INDEX_MAX_AGE_DAYS (vacío = desactivado)."""
+        default_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'upload_index.db')
+        path = os.getenv("UPLOAD_INDEX_PATH", default_path)
+        if not path:
+            return None
+        max_age = float(os.getenv("UPLOAD_INDEX_MAX_AGE_DAYS", "30")) * 86400
+        try:
+            return cls(path, max_age=max_age)
+        except Exception as e:
+            print(f"⚠️ No se pudo abrir el índice de subidas ({path}): {e}")
+            return None
+
+    def get(self, sha256: str, endpoint: str) -> Optional[str]:
+        """URL pública de un contenido ya subido a ese endpoint (None si no está o es demasiado antigua)."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT url, created_at FROM uploads WHERE sha256 = ? AND endpoint = ?",
+                (sha256, endpoint)
+            ).fetchone()
+            if row and time.time() - row[1] <= self.max_age:
+                self.hits += 1
+                return row[0]
+            self.misses += 1
+        return None
+
+    def put(self, sha256: str, endpoint: str, url: str):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO uploads (sha256, endpoint, url, created_at) VALUES (?, ?, ?, ?)",
+                (sha256, endpoint, url, time.time())
+            )
+            self._conn.commit()
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM uploads").fetchone()[0]
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'entries': entries,
+            }
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
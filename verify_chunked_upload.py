@@ -0,0 +1,217 @@
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit
+
+from chunked_upload import ChunkedUploader, ChunkedUploadUnsupported, UploadError
+from upload_index import DownloadHasher, UploadIndex
+
+
+class ChunkServer(ThreadingHTTPServer):
+    """Sustituto local del backend con el protocolo de subida por partes de ChunkedUploader."""
+
+    def __init__(self):
+        super().__init__(('127.0.0.1', 0), ChunkHandler)
+        self.sessions = {}
+        self.completed = {}
+        # sha256 -> URL pública de los objetos terminados (para HEAD /objects/<sha256>)
+        self.objects = {}
+        # Partes que responden 500 (simulan una conexión que falla a mitad de la subida)
+        self.failing_parts = set()
+        self.part_requests = 0
+        self.lock = threading.Lock()
+
+    def handle_error(self, request, client_address):
+        pass
+
+
+class ChunkHandler(BaseHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+    def _json(self, status, data):
+        body = json.dumps(data).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _body(self):
+        return self.rfile.read(int(self.headers.get('Content-Length', 0)))
+
+    def _route(self):
+        path = urlsplit(self.path).path.strip('/').split('/')
+        # v1/upload/chunked[/<id>[/parts/<n> | /complete]]
+        if path[:3] != ['v1', 'upload', 'chunked']:
+            return None
+        return path[3:]
+
+    def do_POST(self):
+        route = self._route()
+        server = self.server
+        if route is None:
+            return self._json(404, {'error': 'not found'})
+        if not route:
+            meta = json.loads(self._body())
+            upload_id = uuid.uuid4().hex
+            with server.lock:
+                server.sessions[upload_id] = dict(meta, parts={})
+            return self._json(201, {'upload_id': upload_id})
+        if len(route) == 2 and route[1] == 'complete':
+            session = server.sessions.get(route[0])
+            if session is None:
+                return self._json(404, {'error': 'unknown upload'})
+            with server.lock:
+                data = b''.join(session['parts'][n] for n in sorted(session['parts']))
+            if len(data) != session['size']:
+                return self._json(409, {'error': f'incomplete: {len(data)} of {session["size"]}'})
+            digest = hashlib.sha256(data).hexdigest()
+            url = f"http://cdn.local/videos/{route[0]}/{session['filename']}"
+            server.completed[route[0]] = digest
+            # El objeto queda indexado por el hash que envía el cliente (calculado al descargar)
+            if session.get('sha256'):
+                server.objects[session['sha256']] = url
+            return self._json(200, {'url': url})
+        return self._json(404, {'error': 'not found'})
+
+    def do_HEAD(self):
+        path = urlsplit(self.path).path.strip('/').split('/')
+        url = self.server.objects.get(path[-1]) if path[:3] == ['v1', 'upload', 'objects'] else None
+        self.send_response(200 if url else 404)
+        if url:
+            self.send_header('Location', url)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    def do_GET(self):
+        route = self._route()
+        if route is None or len(route) != 1 or route[0] not in self.server.sessions:
+            return self._json(404, {'error': 'unknown upload'})
+        with self.server.lock:
+            parts = sorted(self.server.sessions[route[0]]['parts'])
+        return self._json(200, {'parts': parts})
+
+    def do_PUT(self):
+        route = self._route()
+        server = self.server
+        if route is None or len(route) != 3 or route[1] != 'parts' or route[0] not in server.sessions:
+            return self._json(404, {'error': 'unknown upload'})
+        number = int(route[2])
+        data = self._body()
+        with server.lock:
+            server.part_requests += 1
+            if number in server.failing_parts:
+                return self._json(500, {'error': 'simulated failure'})
+            server.sessions[route[0]]['parts'][number] = data
+        return self._json(200, {'part': number, 'size': len(data)})
+
+
+def verify():
+    server = ChunkServer()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    endpoint = f"http://127.0.0.1:{server.server_port}/v1/upload?bucket=videos"
+    work_dir = tempfile.mkdtemp()
+    passed = True
+
+    def check(name, condition, detail=""):
+        nonlocal passed
+        print(f"{'✅' if condition else '❌'} {name} {detail}")
+        passed = passed and condition
+
+    try:
+        path = os.path.join(work_dir, 'reel.mp4')
+        with open(path, 'wb') as f:
+            f.write(os.urandom(10 * 1024 * 1024 + 12345))
+        with open(path, 'rb') as f:
+            expected = hashlib.sha256(f.read()).hexdigest()
+
+        state_dir = os.path.join(work_dir, 'upload_state')
+        uploader = ChunkedUploader(part_size=1024 * 1024, parallel=4, max_retries=0, state_dir=state_dir)
+
+        # 1. Subida completa en paralelo con progreso
+        progress = []
+        url = uploader.upload(path, endpoint, progress_callback=lambda sent, total: progress.append((sent, total)),
+                              sha256=expected)
+        upload_id = url.split('/')[-2]
+        check("Subida por partes", server.completed.get(upload_id) == expected, url)
+        check("Progreso hasta el total", progress[-1][0] == progress[-1][1] == os.path.getsize(path),
+              f"({len(progress)} avisos)")
+        check("Sin estado pendiente", not os.path.exists(uploader.state_path(expected)))
+
+        # 2. Fallo a mitad: queda el estado con el upload_id
+        server.failing_parts = {7}
+        try:
+            uploader.upload(path, endpoint, sha256=expected)
+            check("Fallo detectado", False)
+        except UploadError as e:
+            check("Fallo detectado", True, f"({e})")
+        check("Estado guardado", os.path.exists(uploader.state_path(expected)))
+
+        # 3. Reanudación desde otro archivo con el mismo contenido (como una nueva descarga del trabajo
+        #    reintentado): el estado va por hash, así que solo se envían las partes que faltan
+        server.failing_parts = set()
+        copy_path = os.path.join(work_dir, 'copia', 'reel.mp4')
+        os.makedirs(os.path.dirname(copy_path))
+        shutil.copyfile(path, copy_path)
+        before = server.part_requests
+        url = uploader.upload(copy_path, endpoint, sha256=expected)
+        upload_id = url.split('/')[-2]
+        resent = server.part_requests - before
+        check("Reanudación", server.completed.get(upload_id) == expected and resent < 11, f"({resent} partes reenviadas)")
+
+        # 4. Reintentos por parte
+        server.failing_parts = {3}
+        retrying = ChunkedUploader(part_size=1024 * 1024, parallel=4, max_retries=2, state_dir=state_dir)
+        threading.Timer(1.0, lambda: server.failing_parts.clear()).start()
+        url = retrying.upload(path, endpoint, sha256=expected)
+        check("Reintentos por parte", server.completed.get(url.split('/')[-2]) == expected)
+
+        # 5. Hash durante la descarga: avisos de progreso como los de yt-dlp mientras crece el archivo parcial
+        hasher = DownloadHasher()
+        part_path = os.path.join(work_dir, 'descarga.mp4.part')
+        with open(path, 'rb') as source, open(part_path, 'wb') as part:
+            while True:
+                chunk = source.read(700 * 1024)
+                if not chunk:
+                    break
+                part.write(chunk)
+                part.flush()
+                hasher({'status': 'downloading', 'tmpfilename': part_path, 'downloaded_bytes': part.tell()})
+        os.replace(part_path, part_path[:-len('.part')])
+        hasher({'status': 'finished', 'filename': part_path[:-len('.part')]})
+        check("Hash durante la descarga", hasher.hexdigest() == expected)
+        existing = DownloadHasher()
+        existing({'status': 'finished', 'filename': path})
+        check("Sin hash si no se vio la descarga", existing.hexdigest() is None)
+
+        # 6. Deduplicación: el backend reconoce el contenido por su hash y el índice local lo recuerda
+        digest = hasher.hexdigest()
+        check("Objeto desconocido", uploader.existing_url(endpoint, hashlib.sha256(b'otro').hexdigest()) is None)
+        url = uploader.upload(path, endpoint, sha256=digest)
+        check("HEAD del objeto subido", uploader.existing_url(endpoint, digest) == url, url)
+        index = UploadIndex(os.path.join(work_dir, 'upload_index.db'))
+        index.put(digest, endpoint, url)
+        check("Índice local", index.get(digest, endpoint) == url and index.get(digest, "otro") is None)
+        index.close()
+
+        # 7. Backend sin protocolo por partes
+        try:
+            uploader.upload(path, f"http://127.0.0.1:{server.server_port}/v2/upload", sha256=expected)
+            check("Backend sin soporte", False)
+        except ChunkedUploadUnsupported:
+            check("Backend sin soporte", True)
+    finally:
+        server.shutdown()
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    print("✅ Verification PASSED" if passed else "❌ Verification FAILED")
+
+
+if __name__ == "__main__":
+    verify()
@@ -0,0 +1,131 @@
+import hashlib
+import os
+import shutil
+import tempfile
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from http_download import RangedDownloader
+
+# 40 MB pseudoaleatorios: así cada segmento tiene contenido distinto y se nota si se mezclan
+PAYLOAD = hashlib.sha256(b"dante").digest() * (40 * 1024 * 1024 // 32)
+
+
+class RangeHandler(BaseHTTPRequestHandler):
+    """Servidor local que imita un storage con soporte de Range (o sin él con ?norange)."""
+    # Si > 0, cada respuesta se corta tras enviar este número de bytes (simula caídas de conexión)
+    cut_after = 0
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        total = len(PAYLOAD)
+        range_header = self.headers.get('Range')
+        if range_header and 'norange' not in self.path:
+            start, end = range_header.split('=', 1)[1].split('-')
+            start = int(start)
+            end = int(end) if end else total - 1
+            self.send_response(206)
+            self.send_header('Content-Range', f'bytes {start}-{end}/{total}')
+        else:
+            start, end = 0, total - 1
+            self.send_response(200)
+        body = PAYLOAD[start:end + 1]
+        self.send_header('Content-Type', 'audio/mpeg')
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('ETag', '"dante-v1"')
+        self.end_headers()
+        if self.cut_after and len(body) > self.cut_after:
+            self.wfile.write(body[:self.cut_after])
+            self.close_connection = True
+            return
+        self.wfile.write(body)
+
+
+class QuietServer(ThreadingHTTPServer):
+    def handle_error(self, request, client_address):
+        # El cliente cierra conexiones a propósito (sondeo del primer byte, cortes simulados)
+        pass
+
+
+def verify():
+    server = QuietServer(('127.0.0.1', 0), RangeHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_port}/audio.mp3"
+    work_dir = tempfile.mkdtemp()
+    expected = hashlib.sha256(PAYLOAD).hexdigest()
+    passed = True
+
+    def check(name, condition, detail=""):
+        nonlocal passed
+        print(f"{'✅' if condition else '❌'} {name} {detail}")
+        passed = passed and condition
+
+    try:
+        downloader = RangedDownloader(segments=4, min_segment_bytes=4 * 1024 * 1024, max_retries=0)
+
+        # 1. Descarga en paralelo
+        path = os.path.join(work_dir, 'parallel.mp3')
+        stats = downloader.download(url, path)
+        with open(path, 'rb') as f:
+            digest = hashlib.sha256(f.read()).hexdigest()
+        check("Descarga en paralelo", digest == expected and stats['segments'] == 4, str(stats))
+        check("Hash durante la descarga", stats['sha256'] == expected)
+        check("Sin archivos parciales", not os.path.exists(f"{path}.part") and not os.path.exists(f"{path}.part.json"))
+
+        # 2. Corte de conexión: falla sin reintentos pero deja el estado para reanudar
+        path = os.path.join(work_dir, 'resume.mp3')
+        RangeHandler.cut_after = 3 * 1024 * 1024
+        try:
+            downloader.download(url, path)
+            check("Corte detectado", False)
+        except Exception as e:
+            check("Corte detectado", True, f"({type(e).__name__})")
+        check("Estado guardado", os.path.exists(f"{path}.part.json"))
+
+        # 3. Reanudación: solo se piden los bytes que faltan
+        RangeHandler.cut_after = 0
+        stats = downloader.download(url, path)
+        with open(path, 'rb') as f:
+            digest = hashlib.sha256(f.read()).hexdigest()
+        check("Reanudación", digest == expected and stats['resumed_bytes'] > 0 and stats['sha256'] == expected, str(stats))
+
+        # 4. Reintentos: con cortes en cada respuesta, cada reintento avanza desde su último byte
+        path = os.path.join(work_dir, 'retry.mp3')
+        RangeHandler.cut_after = 4 * 1024 * 1024
+        retrying = RangedDownloader(segments=4, min_segment_bytes=4 * 1024 * 1024, max_retries=5)
+        try:
+            stats = retrying.download(url, path)
+        finally:
+            RangeHandler.cut_after = 0
+        with open(path, 'rb') as f:
+            digest = hashlib.sha256(f.read()).hexdigest()
+        check("Reintentos por segmento", digest == expected, str(stats))
+
+        # 5. Servidor sin Range: descarga en un solo flujo
+        path = os.path.join(work_dir, 'single.mp3')
+        stats = downloader.download(f"{url}?norange", path)
+        with open(path, 'rb') as f:
+            digest = hashlib.sha256(f.read()).hexdigest()
+        check("Servidor sin Range", digest == expected and stats['segments'] == 1 and stats['sha256'] == expected, str(stats))
+
+        # 6. Otra URL con el mismo destino, tamaño y validador: no reanuda sobre el .part ajeno
+        path = os.path.join(work_dir, 'shared.mp3')
+        RangeHandler.cut_after = 3 * 1024 * 1024
+        try:
+            downloader.download(url, path)
+        except Exception:
+            pass
+        RangeHandler.cut_after = 0
+        stats = downloader.download(f"{url}?otro", path)
+        check("Sin reanudar otra URL", stats['resumed_bytes'] == 0 and stats['sha256'] == expected, str(stats))
+    finally:
+        server.shutdown()
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    print("✅ Verification PASSED" if passed else "❌ Verification FAILED")
+
+
+if __name__ == "__main__":
+    verify()
@@ -0,0 +1,119 @@
+import os
+import random
+
+# Sin red ni cachés persistentes: motor falso y sin esperas del limitador ni reintentos
+os.environ["TRANSLATION_BACKEND"] = "fake"
+os.environ["TRANSLATION_CACHE_PATH"] = ""
+os.environ["RESULT_CACHE_PATH"] = ""
+os.environ.setdefault("TRANSLATION_RATE_PER_SEC", "1000")
+os.environ.setdefault("TRANSLATION_BURST", "1000")
+os.environ.setdefault("TRANSLATION_MAX_RETRIES", "0")
+
+from translation_backends import TRANSLATION_MAX_CHARS, TRANSLATION_SEPARATOR, FakeBackend, GoogleBackend
+from video_transcriber import VideoTranscriber
+
+
+class FakeTranslator:
+    """
+    Sustituto de GoogleTranslator para GoogleBackend: traduce línea a línea como '[destino] texto'.
+    mode: 'ok', 'blank' (añade líneas vacías), 'merge' (une las dos primeras líneas de cada paquete)
+    o 'down' (los paquetes se traducen, las peticiones de un solo texto fallan).
+    """
+    requests = []
+
+    def __init__(self, source, target, mode='ok'):
+        self.target = target
+        self.mode = mode
+
+    def translate(self, text):
+        FakeTranslator.requests.append(text)
+        lines = [f"[{self.target}] {line}" for line in text.split(TRANSLATION_SEPARATOR)]
+        if len(lines) == 1:
+            if self.mode == 'down':
+                raise RuntimeError("proveedor caído")
+            return lines[0]
+        if self.mode == 'blank':
+            lines.insert(1, "")
+            lines.append("")
+        elif self.mode in ('merge', 'down'):
+            lines[0:2] = [lines[0] + " " + lines[1]]
+        return TRANSLATION_SEPARATOR.join(lines)
+
+
+def sample_texts(count, seed=7):
+    """Textos de longitud variada (algunos casi del límite del proveedor), con repeticiones y vacíos."""
+    rng = random.Random(seed)
+    texts = []
+    for i in range(count):
+        length = rng.choice([12, 40, 80, 250, 900, TRANSLATION_MAX_CHARS - 10])
+        texts.append(" ".join([f"frase {i}"] + ["parola"] * (length // 7)))
+    texts[10] = texts[3]
+    texts[20] = ""
+    return texts
+
+
+def verify():
+    transcriber = VideoTranscriber()
+    passed = True
+
+    def check(name, condition, detail=""):
+        nonlocal passed
+        print(f"{'✅' if condition else '❌'} {name} {detail}")
+        passed = passed and condition
+
+    try:
+        texts = sample_texts(300)
+        # translate_many empaqueta cada texto distinto una sola vez
+        non_empty = list(dict.fromkeys(text for text in texts if text))
+
+        # 1. Empaquetado: orden conservado y ningún paquete supera el límite de caracteres ni de textos
+        chunks = transcriber._pack_for_translation(non_empty, TRANSLATION_MAX_CHARS, FakeBackend.max_batch_items)
+        joined = [len(TRANSLATION_SEPARATOR.join(chunk)) for chunk in chunks]
+        check("Orden en los paquetes", [text for chunk in chunks for text in chunk] == non_empty)
+        check(f"Paquetes <= {TRANSLATION_MAX_CHARS} caracteres", max(joined) <= TRANSLATION_MAX_CHARS,
+              f"({len(chunks)} paquetes, el mayor de {max(joined)})")
+        few = transcriber._pack_for_translation(non_empty, TRANSLATION_MAX_CHARS, 5)
+        check("Paquetes <= max_items textos", max(len(chunk) for chunk in few) <= 5)
+
+        # 2. translate_many con FakeBackend: cada texto vuelve a su posición, en todos los idiomas
+        backend = FakeBackend()
+        transcriber.translation_backend = backend
+        untranslated = {}
+        results = transcriber.translate_many(texts, ['es', 'pt', 'en'], untranslated=untranslated)
+        expected = {lang: [f"[{lang}] {text}" if text else "" for text in texts] for lang in ('es', 'pt', 'en')}
+        check("Traducciones alineadas", results == expected)
+        check("Sin pendientes", all(not pending for pending in untranslated.values()))
+        check("Un paquete por petición", backend.calls == 3 * len(chunks), f"({backend.calls} peticiones)")
+
+        # 3. Separado de vuelta con GoogleBackend: líneas vacías añadidas por el proveedor
+        small = [f"riga {i}" for i in range(8)]
+        google = GoogleBackend(lambda source, target: FakeTranslator(source, target, 'blank'))
+        check("Líneas vacías descartadas", google.translate_batch(small, 'it', 'en') == [f"[en] {t}" for t in small])
+
+        # 4. Desalineado (el proveedor unió dos líneas): se traduce segmento a segmento
+        FakeTranslator.requests = []
+        google = GoogleBackend(lambda source, target: FakeTranslator(source, target, 'merge'))
+        translated = google.translate_batch(small, 'it', 'en')
+        check("Recuperación por segmento", translated == [f"[en] {t}" for t in small],
+              f"({len(FakeTranslator.requests)} peticiones)")
+
+        # 5. Si el proveedor también falla por segmento, el error se propaga (lo cuenta el circuit breaker)
+        #    y translate_many deja el original marcado como pendiente
+        google = GoogleBackend(lambda source, target: FakeTranslator(source, target, 'down'))
+        try:
+            google.translate_batch(small, 'it', 'en')
+            check("Error propagado", False)
+        except RuntimeError:
+            check("Error propagado", True)
+        transcriber.translation_backend = google
+        untranslated = {}
+        results = transcriber.translate_many(small, ['en'], untranslated=untranslated)
+        check("Original y pendientes", results['en'] == small and untranslated['en'] == set(range(len(small))))
+    finally:
+        transcriber.cleanup()
+
+    print("✅ Verification PASSED" if passed else "❌ Verification FAILED")
+
+
+if __name__ == "__main__":
+    verify()
@@ -0,0 +1,76 @@
+import os
+import re
+import subprocess
+from typing import Callable, Dict, List
+
+# Contenedores que admiten faststart (índice moov al principio)
+FASTSTART_EXTENSIONS = ('.mp4', '.m4v', '.mov')
+PLAYLIST_NAME = 'index.m3u8'
+
+
+def _run_ffmpeg(args: List[str]):
+    cmd = ['ffmpeg', '-nostdin', '-loglevel', 'error', '-y'] + args
+    result = subprocess.run(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+    if result.returncode != 0:
+        raise RuntimeError(f"ffmpeg falló: {result.stderr.decode(errors='ignore').strip()}")
+
+
+def faststart(source: str, destination: str) -> str:
+    """
+    Remux sin recodificar (-c copy) con el índice moov al principio del archivo:
+    el reproductor puede empezar en cuanto recibe los primeros KB.
+    """
+    _run_ffmpeg(['-i', source, '-map', '0', '-c', 'copy', '-movflags', '+faststart', destination])
+    return destination
+
+
+def segment_hls(source: str, output_dir: str, segment_seconds: int = 4) -> Dict[str, object]:
+    """
+    Segmenta en HLS sin recodificar, con segmentos fMP4 (admiten H.264/AAC y también VP9/Opus).
+    Los cortes caen en keyframes, así que la duración de los segmentos es aproximada.
+    Devuelve {'playlist': ruta del .m3u8, 'files': [init y segmentos en orden]}.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    playlist = os.path.join(output_dir, PLAYLIST_NAME)
+    _run_ffmpeg([
+        '-i', source,
+        '-map', '0:v:0?', '-map', '0:a:0?', '-c', 'copy',
+        '-f', 'hls',
+        '-hls_time', str(segment_seconds),
+        '-hls_playlist_type', 'vod',
+        '-hls_segment_type', 'fmp4',
+        '-hls_fmp4_init_filename', 'init.mp4',
+        '-hls_segment_filename', os.path.join(output_dir, 'seg_%05d.m4s'),
+        playlist,
+    ])
+    return {'playlist': playlist, 'files': playlist_files(playlist)}
+
+
+def playlist_files(playlist: str) -> List[str]:
+    """Rutas locales del init y de los segmentos referenciados por una playlist, en orden."""
+    directory = os.path.dirname(playlist)
+    files = []
+    with open(playlist, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            init = re.search(r'#EXT-X-MAP:URI="([^"]+)"', line)
+            if init:
+                files.append(os.path.join(directory, init.group(1)))
+            elif line and not line.startswith('#'):
+                files.append(os.path.join(directory, line))
+    return files
+
+
+def rewrite_playlist(playlist: str, url_for: Callable[[str], str]):
+    """Sustituye los nombres locales de init y segmentos por sus URLs públicas."""
+    lines = []
+    with open(playlist, 'r', encoding='utf-8') as f:
+        for line in f:
+            stripped = line.strip()
+            if stripped.startswith('#EXT-X-MAP:'):
+                line = re.sub(r'URI="([^"]+)"', lambda m: f'URI="{url_for(m.group(1))}"', line)
+            elif stripped and not stripped.startswith('#'):
+                line = url_for(stripped) + '\n'
+            lines.append(line)
+    with open(playlist, 'w', encoding='utf-8') as f:
+        f.writelines(lines)
@@ -2,18 +2,161 @@
 import yt_dlp
 import json
 import os
-from pydub import AudioSegment
-from pydub.silence import split_on_silence
-from deep_translator import GoogleTranslator
 import re
 import math
 import tempfile
+import threading
 from typing import List, Dict, Any
 import time
+import hashlib
 import subprocess
+import sys
 import requests
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
 
-import whisper
+from audio_chunking import duration_ms, plan_chunks, slice_ms, stitch_segments
+from audio_decoding import SAMPLE_RATE, ProgressiveDecoder, decode_audio, decode_audio_stream
+from model_registry import ModelRegistry
+from transcription_engines import create_engine
+from whisper_workers import WhisperProcessPool
+from chunked_upload import ChunkedUploader, ChunkedUploadUnsupported
+from circuit_breaker import CircuitOpenError
+from http_download import RangedDownloader
+from info_cache import InfoCache
+from media_cache import MediaCache, info_media_id, media_key, url_media_id
+from result_cache import ResultCache, has_pending_translations, result_key
+from download_strategies import create_strategy_manager, resolve_cookiefile
+from translation_backends import create_backend, get_breaker
+from translation_cache import TranslationCache
+from upload_index import DownloadHasher, UploadIndex
+from video_packaging import FASTSTART_EXTENSIONS, faststart, rewrite_playlist, segment_hls
+
+# Hilos de la etapa de traducción, compartidos por todos los trabajos del proceso
+TRANSLATION_CONCURRENCY = int(os.getenv("TRANSLATION_CONCURRENCY", "4"))
+_translation_executor = ThreadPoolExecutor(max_workers=TRANSLATION_CONCURRENCY, thread_name_prefix="translate")
+
+# Motor de transcripción: 'whisper' (openai-whisper) o 'faster-whisper' (CTranslate2 int8)
+TRANSCRIPTION_ENGINE = os.getenv("TRANSCRIPTION_ENGINE", "whisper")
+# Modelos Whisper: por defecto, permitidos, precargados al arrancar y máximo residentes
+WHISPER_MODEL = os.getenv("WHISPER_MODEL", "tiny")
+WHISPER_ALLOWED_MODELS = [m.strip() for m in os.getenv("WHISPER_ALLOWED_MODELS", "tiny,base,small,medium").split(",") if m.strip()]
+WHISPER_PRELOAD_MODELS = [m.strip() for m in os.getenv("WHISPER_PRELOAD_MODELS", WHISPER_MODEL).split(",") if m.strip()]
+WHISPER_MAX_RESIDENT_MODELS = int(os.getenv("WHISPER_MAX_RESIDENT_MODELS", "1"))
+# Ejecución de Whisper: 'thread' (modelo compartido en este proceso) o 'process' (pool de workers)
+WHISPER_EXECUTION = os.getenv("WHISPER_EXECUTION", "thread")
+WHISPER_WORKERS = int(os.getenv("WHISPER_WORKERS", str(os.cpu_count() or 1)))
+WHISPER_THREADS_PER_WORKER = int(os.getenv("WHISPER_THREADS_PER_WORKER", "0")) or None
+
+# Transcripción por tramos: cortes en silencios, duración máxima, solapamiento y paralelismo
+TRANSCRIPTION_CHUNKED = os.getenv("TRANSCRIPTION_CHUNKED", "false").lower() in ("1", "true", "yes")
+CHUNK_MAX_SECONDS = int(os.getenv("CHUNK_MAX_SECONDS", "90"))
+CHUNK_OVERLAP_SECONDS = float(os.getenv("CHUNK_OVERLAP_SECONDS", "1.0"))
+CHUNK_MIN_SILENCE_MS = int(os.getenv("CHUNK_MIN_SILENCE_MS", "500"))
+CHUNK_SILENCE_THRESH = float(os.getenv("CHUNK_SILENCE_THRESH", "-40"))
+CHUNK_WORKERS = int(os.getenv("CHUNK_WORKERS", str(os.cpu_count() or 1)))
+
+# Ingesta en streaming: transcribir ventanas fijas mientras yt-dlp sigue descargando
+TRANSCRIPTION_STREAMING = os.getenv("TRANSCRIPTION_STREAMING", "false").lower() in ("1", "true", "yes")
+STREAM_WINDOW_SECONDS = int(os.getenv("STREAM_WINDOW_SECONDS", "30"))
+
+# Perfil de descarga para transcribir: 'audio' (solo la pista de audio más ligera adecuada) o 'video' (480p completo)
+DOWNLOAD_PROFILE = os.getenv("DOWNLOAD_PROFILE", "audio")
+# Bitrate mínimo (kbps) de la pista de audio: Whisper trabaja a 16 kHz mono, más calidad no mejora la transcripción
+DOWNLOAD_AUDIO_MIN_ABR = int(os.getenv("DOWNLOAD_AUDIO_MIN_ABR", "48"))
+DOWNLOAD_PROFILES = {
+    # Con '+abr' el "mejor" formato es el de menor bitrate: el audio más pequeño que supere el mínimo
+    'audio': {
+        'format': f'bestaudio[abr>={DOWNLOAD_AUDIO_MIN_ABR}]/bestaudio/worst',
+        'format_sort': ['+abr'],
+    },
+    'video': {
+        'format': 'bestvideo[height<=480]+bestaudio/best[height<=480]/bestvideo+bestaudio/best',
+    },
+    # Reels con VIDEO_PACKAGING: H.264 + AAC unidos en MP4 (en YouTube el mejor suele ser VP9/AV1 + Opus en webm,
+    # que faststart no admite); si no hay, lo mismo que 'video' pero unido en MP4
+    'video_mp4': {
+        'format': 'bestvideo[height<=480][vcodec^=avc1]+bestaudio[ext=m4a]/best[height<=480][ext=mp4]/'
+                  'bestvideo[height<=480]+bestaudio/best[height<=480]/bestvideo+bestaudio/best',
+        'merge_output_format': 'mp4',
+    },
+}
+
+# Resultados de extracción de yt-dlp reutilizables durante unos minutos (0 = desactivado)
+YTDLP_INFO_CACHE_TTL = float(os.getenv("YTDLP_INFO_CACHE_TTL", "300"))
+_info_cache = InfoCache(ttl=YTDLP_INFO_CACHE_TTL)
+# Máximo de resultados 'url' encadenados que se siguen al extraer (evita bucles entre extractores)
+MAX_URL_REDIRECTS = 5
+# Medios ya descargados en disco por extractor + id + perfil (MEDIA_CACHE_DIR vacío = desactivada)
+_media_cache = MediaCache.from_env()
+# Descargas HTTP directas (Drive, Dropbox, storage...): segmentos Range en paralelo con reanudación
+_http_downloader = RangedDownloader.from_env()
+# Headers para simular un navegador en las descargas por URL directa
+BROWSER_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
+    'Accept': 'audio/*, */*',
+    'Accept-Language': 'es-ES,es;q=0.9,en;q=0.8',
+    'Accept-Encoding': 'gzip, deflate, br',
+    'Referer': 'https://www.google.com/',
+    'Connection': 'keep-alive',
+    'Upgrade-Insecure-Requests': '1'
+}
+# URLs directas: decodificar el cuerpo HTTP en ffmpeg según llega, sin archivo temporal
+# (si el contenedor no admite tubería, p.ej. MP4 con el índice al final, se descarga completo)
+AUDIO_URL_STREAMING = os.getenv("AUDIO_URL_STREAMING", "false").lower() in ("1", "true", "yes")
+VIDEO_EXTENSIONS = ('.mp4', '.mov', '.avi', '.mkv', '.webm')
+
+# Subida al backend: 'single' (un POST multipart) o 'chunked' (partes en paralelo, reanudable)
+UPLOAD_MODE = os.getenv("UPLOAD_MODE", "single")
+UPLOAD_TIMEOUT = float(os.getenv("UPLOAD_TIMEOUT", "600"))
+_uploader = ChunkedUploader.from_env()
+# Deduplicación de subidas por hash del contenido: índice local hash -> URL pública y consulta HEAD al backend
+# (desactivada por defecto: requiere que el backend implemente HEAD {endpoint}/objects/<sha256>)
+UPLOAD_DEDUP = os.getenv("UPLOAD_DEDUP", "false").lower() in ("1", "true", "yes")
+_upload_index = UploadIndex.from_env() if UPLOAD_DEDUP else None
+# Empaquetado de reels antes de subir: 'none', 'faststart' (remux sin recodificar, moov al principio)
+# o 'hls' (playlist + segmentos fMP4; la URL pública es la de la playlist)
+VIDEO_PACKAGING = os.getenv("VIDEO_PACKAGING", "none")
+HLS_SEGMENT_SECONDS = int(os.getenv("HLS_SEGMENT_SECONDS", "4"))
+
+# Compartido por todo el proceso: un modelo cargado sirve a todos los trabajos
+_engine = create_engine(TRANSCRIPTION_ENGINE)
+_model_registry = ModelRegistry(_engine.load, max_resident=WHISPER_MAX_RESIDENT_MODELS, warmup=_engine.warmup)
+_process_pool = None
+_process_pool_lock = threading.Lock()
+_strategy_manager = None
+_strategy_manager_lock = threading.Lock()
+
+
+def _get_process_pool() -> WhisperProcessPool:
+    """Crea (una vez) el pool de procesos Whisper"""
+    global _process_pool
+    with _process_pool_lock:
+        if _process_pool is None:
+            print(f"Iniciando pool de {WHISPER_WORKERS} procesos Whisper ({TRANSCRIPTION_ENGINE})...")
+            _process_pool = WhisperProcessPool(
+                WHISPER_WORKERS,
+                WHISPER_MODEL,
+                engine_name=TRANSCRIPTION_ENGINE,
+                threads_per_worker=WHISPER_THREADS_PER_WORKER,
+                max_resident=WHISPER_MAX_RESIDENT_MODELS
+            )
+        return _process_pool
+
+def _get_strategy_manager():
+    """Crea (una vez) el gestor de estrategias de descarga según haya cookies o no"""
+    global _strategy_manager
+    with _strategy_manager_lock:
+        if _strategy_manager is None:
+            _strategy_manager = create_strategy_manager(has_cookies=resolve_cookiefile() is not None)
+        return _strategy_manager
+
+# Campo de cada subtítulo donde va la traducción de cada idioma
+SUBTITLE_TRANSLATION_FIELDS = {
+    'es': 'translation',
+    'pt': 'translationPR',
+    'en': 'translationEN',
+}
 
 class YtDlpLogger:
     def __init__(self, callback=None):
@@ -44,61 +187,67 @@ class YtDlpLogger:
 
 class VideoTranscriber:
     def __init__(self):
-        self.model = None
         self.temp_dir = tempfile.mkdtemp()
-        self.cookie_temp_file = None
+        # Motor de traducción (TRANSLATION_BACKEND; FakeBackend para pruebas sin red)
+        self.translation_backend = create_backend()
+        # Caché persistente de traducciones (None si está desactivada)
+        self.translation_cache = TranslationCache.from_env()
+        # Caché de transcripciones terminadas por id de video y por hash del audio (None si está desactivada)
+        self.result_cache = ResultCache.from_env()
 
     def _get_cookiefile(self):
-        """Obtiene el archivo de cookies."""
-        # 1. Buscar en el mismo directorio que el script
-        script_dir = os.path.dirname(os.path.abspath(__file__))
-        local_cookies = os.path.join(script_dir, 'cookies.txt')
-        if os.path.exists(local_cookies):
-            print(f"✅ Usando cookies locales: {local_cookies}")
-            return local_cookies
-            
-        # 1b. También buscar en el directorio actual (por si acaso)
-        cwd_cookies = os.path.join(os.getcwd(), 'cookies.txt')
-        if os.path.exists(cwd_cookies) and cwd_cookies != local_cookies:
-            print(f"✅ Usando cookies del CWD: {cwd_cookies}")
-            return cwd_cookies
-            
-        # 2. Buscar en secrets de Render (/etc/secrets/cookies.txt)
-        render_secret_cookies = '/etc/secrets/cookies.txt'
-        if os.path.exists(render_secret_cookies):
-             print(f"✅ Usando cookies desde Secret Files (Render): {render_secret_cookies}")
-             return render_secret_cookies
-        
-        # 2. Buscar en variable de entorno
-        cookies_content = os.environ.get('YOUTUBE_COOKIES')
-        if cookies_content:
-            try:
-                # Crear archivo temporal
-                fd, path = tempfile.mkstemp(suffix='.txt', text=True)
-                with os.fdopen(fd, 'w') as tmp:
-                    tmp.write(cookies_content)
-                self.cookie_temp_file = path
-                print(f"✅ Usando cookies desde variable de entorno. Longitud: {len(cookies_content)}")
-                print(f"📄 Inicio del contenido de cookies: {cookies_content[:50]}...")
-                print(f"📂 Archivo temporal de cookies creado en: {path}")
-                return path
-            except Exception as e:
-                print(f"Error creando archivo de cookies temporal: {e}")
-        
-        print("⚠️ No se encontraron cookies (cookies.txt o YOUTUBE_COOKIES). La descarga podría fallar por bot detection.")
-        return None
+        """Obtiene el archivo de cookies (resuelto una sola vez por proceso)."""
+        return resolve_cookiefile()
+
+    def _get_model(self, model_name: str = None):
+        """Devuelve el modelo Whisper indicado (o el por defecto) desde el registro compartido"""
+        model_name = model_name or WHISPER_MODEL
+        if model_name not in WHISPER_ALLOWED_MODELS:
+            raise ValueError(f"Modelo Whisper no permitido: {model_name}. Opciones: {', '.join(WHISPER_ALLOWED_MODELS)}")
+        return _model_registry.get(model_name)
+
+    def preload_models(self, model_names: List[str] = None):
+        """Precarga y calienta los modelos configurados en segundo plano"""
+        if WHISPER_EXECUTION == "process":
+            # Cada worker carga el modelo por defecto al arrancar
+            _get_process_pool().warm_up()
+            return None
+        return _model_registry.preload(model_names or WHISPER_PRELOAD_MODELS)
 
-    def _get_model(self):
-        """Carga el modelo Whisper bajo demanda si no está cargado"""
-        if self.model is None:
-            print("Cargando modelo Whisper (esto puede tardar un poco la primera vez)...")
-            self.model = whisper.load_model("tiny")
-        return self.model
+    def models_status(self) -> Dict[str, Any]:
+        """Estado de los modelos (para /health)"""
+        if WHISPER_EXECUTION == "process":
+            status = _get_process_pool().status()
+        else:
+            status = _model_registry.status()
+        status['execution'] = WHISPER_EXECUTION
+        status['engine'] = TRANSCRIPTION_ENGINE
+        status['default'] = WHISPER_MODEL
+        status['allowed'] = WHISPER_ALLOWED_MODELS
+        return status
         
+    def downloads_status(self) -> Dict[str, Any]:
+        """Estado de las estrategias de descarga, de las caches de extracciones y medios y del índice de subidas"""
+        return {
+            'strategies': _get_strategy_manager().status(),
+            'info_cache': _info_cache.stats(),
+            'media_cache': _media_cache.stats() if _media_cache else None,
+            'upload_index': _upload_index.stats() if _upload_index else None,
+        }
+
+    def translation_status(self) -> Dict[str, Any]:
+        """Motor de traducción, estado de su circuit breaker (abierto = las traducciones quedan pendientes) y caché"""
+        return {
+            'backend': self.translation_backend.name,
+            'breaker': get_breaker(self.translation_backend.name).status(),
+            'cache': self.translation_cache.stats() if self.translation_cache else None,
+        }
+
     def _split_long_segment(self, segment, max_chars=80):
         """
         Divide un segmento largo en partes más pequeñas y legibles.
         Respetando los tiempos originales y dividiendo en puntos naturales.
+        Las partes se devuelven sin traducir.
         """
         text = segment['text']
         start_time = segment['startTime']
@@ -139,18 +288,13 @@ class VideoTranscriber:
                 
                 group_end = group_start + group_duration
                 
-                # Re-traducir cada segmento dividido
-                translation_en = self.translate_text(group_text, 'en')
-                translation_pt = self.translate_text(group_text, 'pt')
-                translation_es = self.translate_text(group_text, 'es')
-                
                 segments.append({
                     'text': group_text,
                     'startTime': self._milliseconds_to_time(group_start),
                     'endTime': self._milliseconds_to_time(group_end),
-                    'translation': translation_es,      # Traducción del texto de este segmento
-                    'translationPR': translation_pt,   # Traducción del texto de este segmento
-                    'translationEN': translation_en,   # Traducción del texto de este segmento
+                    'translation': "",      # Se traduce en la etapa de traducción
+                    'translationPR': "",
+                    'translationEN': "",
                     'isWordKey': segment['isWordKey']
                 })
             
@@ -180,18 +324,13 @@ class VideoTranscriber:
                 if i == len(sentences) - 1:
                     sentence_end = end_ms
                 
-                # Re-traducir cada frase dividida
-                translation_en = self.translate_text(sentence, 'en')
-                translation_pt = self.translate_text(sentence, 'pt')
-                translation_es = self.translate_text(sentence, 'es')
-                
                 segments.append({
                     'text': sentence,
                     'startTime': self._milliseconds_to_time(current_start),
                     'endTime': self._milliseconds_to_time(sentence_end),
-                    'translation': translation_es,      # Traducción del texto de esta frase
-                    'translationPR': translation_pt,   # Traducción del texto de esta frase
-                    'translationEN': translation_en,   # Traducción del texto de esta frase
+                    'translation': "",      # Se traduce en la etapa de traducción
+                    'translationPR': "",
+                    'translationEN': "",
                     'isWordKey': segment['isWordKey']
                 })
                 
@@ -256,34 +395,103 @@ class VideoTranscriber:
         
         return f"{hours:02d}:{minutes:02d}:{seconds:02d}.{milliseconds:03d}"
     
-    def _optimize_subtitles_for_ui(self, subtitles, max_chars=80):
+    def _optimize_subtitles_for_ui(self, subtitles, max_chars=80, translate=True):
         """
         Optimiza los subtítulos para mejor legibilidad en la UI.
         Divide segmentos largos en partes más pequeñas.
+        Con translate=True traduce las partes nuevas; el pipeline usa
+        translate=False y traduce todos los subtítulos finales una sola vez.
         """
         optimized_subtitles = []
+        split_parts = []
         
         for subtitle in subtitles:
             # Dividir segmentos largos
             split_segments = self._split_long_segment(subtitle, max_chars)
             optimized_subtitles.extend(split_segments)
+            if len(split_segments) > 1:
+                split_parts.extend(split_segments)
+        
+        if translate and split_parts:
+            self._translate_subtitles(split_parts)
         
         return optimized_subtitles
 
-    def download_youtube_video(self, url: str, output_path: str = None, status_callback=None) -> tuple:
-        """Descarga un video de YouTube y extrae el audio, retorna también metadatos"""
-        if output_path is None:
-            output_path = os.path.join(self.temp_dir, "audio.wav")
+    def _translate_subtitles(self, subtitles):
+        """
+        Rellena las traducciones (es/pt/en) de los subtítulos, en paralelo por paquete e idioma.
+        Los subtítulos que quedan sin traducir se marcan con 'translationPending'; el resultado se guarda
+        igualmente en la caché de resultados, donde backfill_translations.py (o el siguiente acierto) los completa.
+        """
+        texts = [subtitle['text'] for subtitle in subtitles]
+        untranslated = {}
+        translations = self.translate_many(texts, list(SUBTITLE_TRANSLATION_FIELDS), untranslated=untranslated)
+        
+        for lang, field in SUBTITLE_TRANSLATION_FIELDS.items():
+            for i, subtitle in enumerate(subtitles):
+                subtitle[field] = translations[lang][i]
+                if i in untranslated[lang]:
+                    subtitle.setdefault('translationPending', []).append(lang)
+        
+        return subtitles
+
+    def backfill_translations(self, result_data: Dict[str, Any]) -> int:
+        """
+        Re-traduce los subtítulos marcados con 'translationPending' de un resultado guardado.
+        Devuelve cuántas traducciones se completaron.
+        """
+        subtitles = result_data.get('subtitles', [])
+        filled = 0
+        
+        for lang, field in SUBTITLE_TRANSLATION_FIELDS.items():
+            pending = [s for s in subtitles if lang in s.get('translationPending', [])]
+            if not pending:
+                continue
             
-        # Selector robusto: busca 480p, de lo contrario lo mejor disponible
+            untranslated = {}
+            translations = self.translate_many([s['text'] for s in pending], [lang], untranslated=untranslated)
+            for i, subtitle in enumerate(pending):
+                if i in untranslated[lang]:
+                    continue
+                subtitle[field] = translations[lang][i]
+                subtitle['translationPending'].remove(lang)
+                filled += 1
+        
+        for subtitle in subtitles:
+            if 'translationPending' in subtitle and not subtitle['translationPending']:
+                del subtitle['translationPending']
+        
+        return filled
+
+    def download_youtube_video(self, url: str, output_path: str = None, status_callback=None, profile: str = None, stats: Dict[str, Any] = None) -> tuple:
+        """
+        Descarga un video de YouTube en su contenedor original, retorna también metadatos.
+        El audio se decodifica después directamente en memoria a 16 kHz mono (sin convertir a WAV).
+        profile: 'audio' (solo pista de audio) o 'video' (ver DOWNLOAD_PROFILES).
+        stats: dict opcional que se rellena con bytes descargados, formato y segundos.
+        """
+        if output_path is None:
+            output_path = os.path.join(self.temp_dir, "audio.%(ext)s")
+        elif output_path.endswith('.wav'):
+            output_path = output_path[:-len('.wav')] + '.%(ext)s'
+        
+        profile = profile or DOWNLOAD_PROFILE
+        if profile not in DOWNLOAD_PROFILES:
+            raise ValueError(f"Perfil de descarga desconocido: {profile}. Opciones: {', '.join(DOWNLOAD_PROFILES)}")
+        if stats is None:
+            stats = {}
+        stats.update({'profile': profile, 'bytes_downloaded': 0, 'format_id': None, 'cache_hit': False, 'seconds': 0.0})
+        started = time.time()
+        
+        def count_bytes(d):
+            # Se llama una vez por archivo terminado (audio y video por separado si se unen)
+            if d.get('status') == 'finished':
+                stats['bytes_downloaded'] += d.get('downloaded_bytes') or d.get('total_bytes') or 0
+        
         ydl_opts = {
-            'format': 'bestvideo[height<=480]+bestaudio/best[height<=480]/bestvideo+bestaudio/best',
-            'postprocessors': [{
-                'key': 'FFmpegExtractAudio',
-                'preferredcodec': 'wav',
-                'preferredquality': '192',
-            }],
-            'outtmpl': output_path.replace('.wav', ''),
+            **DOWNLOAD_PROFILES[profile],
+            'outtmpl': output_path,
+            'progress_hooks': [count_bytes],
             'nocheckcertificate': True,
             'ignoreerrors': False,
             'no_warnings': False,
@@ -303,93 +511,319 @@ class VideoTranscriber:
             'logger': YtDlpLogger(status_callback)
         }
 
-        # Configurar cookies
-        cookie_file = self._get_cookiefile()
+        try:
+            info, filename = self._run_download_strategies(url, ydl_opts, cache_profile=profile)
+        except Exception as e:
+            print(f"La descarga falló con todas las estrategias: {e}")
+            return None, None, None, None, 0, "transcripción"
+        
+        stats['format_id'] = info.get('format_id')
+        stats['cache_hit'] = bool(info.get('media_cache_hit'))
+        stats['seconds'] = time.time() - started
+        return (filename, *self._info_metadata(info))
+
+    def _run_download_strategies(self, url: str, ydl_opts: Dict[str, Any], download: bool = True, require_video: bool = False, cache_profile: str = None, used: Dict[str, Any] = None, content_hash: bool = False) -> tuple:
+        """
+        Intenta la descarga con las estrategias (cookies/anónimo, clientes del reproductor)
+        en el orden que indica el gestor según sus éxitos y latencias recientes.
+        Devuelve (info, ruta descargada o None); si todas fallan relanza el último error.
+        Un fallo solo cuenta contra la estrategia si otra funciona después con la misma URL:
+        si fallan todas, el problema es del video (privado, borrado...) y no de la estrategia.
+        Con cache_profile se consulta la caché de medios antes de extraer (si el URL da el id)
+        y después de extraer, y lo descargado se guarda en ella.
+        used: dict opcional donde se deja la estrategia que funcionó.
+        content_hash: calcular durante la descarga el SHA-256 de lo descargado (info['content_sha256'],
+        ver DownloadHasher), que se guarda con los metadatos de la caché de medios para los aciertos.
+        """
+        use_media_cache = download and cache_profile and _media_cache is not None
+        checked_id = None
+        if use_media_cache:
+            checked_id = url_media_id(url)
+            hit = checked_id and self._media_cache_get(checked_id, cache_profile, ydl_opts)
+            if hit:
+                return hit
         
-        # Intentar con cookies primero (si están disponibles)
-        if cookie_file:
-            print(f"DEBUG: Intentando descarga con cookies: {cookie_file}")
-            ydl_opts['cookiefile'] = cookie_file
+        cookiefile = self._get_cookiefile()
+        manager = _get_strategy_manager()
+        failed = []
+        last_error = None
+        
+        for strategy in manager.plan():
+            print(f"DEBUG: Intentando con la estrategia '{strategy.name}'...")
+            started = time.time()
+            opts = strategy.apply(ydl_opts, cookiefile)
+            hasher = None
+            if download and content_hash:
+                hasher = DownloadHasher()
+                opts['progress_hooks'] = list(opts.get('progress_hooks', [])) + [hasher]
             try:
-                with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                    info = ydl.extract_info(url, download=False)
+                with yt_dlp.YoutubeDL(opts) as ydl:
+                    info = self._extract_info(ydl, url, strategy.name)
                     # Verificar si realmente hay formatos de video/audio (no solo imágenes)
-                    formats = info.get('formats', [])
-                    if any(f.get('vcodec') != 'none' or f.get('acodec') != 'none' for f in formats):
-                        video_title = info.get('title', 'Video de YouTube')
-                        thumbnail_url = info.get('thumbnail', '')
-                        channel_url = info.get('channel_url') or info.get('uploader_url') or ""
-                        duration = info.get('duration', 0)
-                        categories = info.get('categories', [])
-                        category = categories[0] if categories else "transcripción"
-                        
-                        ydl.download([url])
-                        
-                        if not duration or duration == 0:
-                            try:
-                                audio = AudioSegment.from_file(output_path)
-                                duration = len(audio) / 1000.0
-                            except: pass
-                            
-                        return output_path, video_title, thumbnail_url, channel_url, duration, category
-                    else:
-                        print("⚠️ La descarga con cookies solo encontró imágenes. Intentando sin cookies...")
+                    if not self._has_media_formats(info, require_video):
+                        raise yt_dlp.utils.DownloadError("Solo se encontraron imágenes, sin formatos de video/audio")
+                    
+                    hit = None
+                    media_id = info_media_id(info)
+                    if use_media_cache and media_id and media_id != checked_id:
+                        hit = self._media_cache_get(media_id, cache_profile, ydl_opts)
+                    
+                    filename = None
+                    if hit:
+                        info, filename = hit
+                    elif download:
+                        # Descargar con el mismo resultado de extracción (sin volver a resolver el reproductor)
+                        info = ydl.process_ie_result(info, download=True)
+                        filename = self._find_downloaded_file(self._downloaded_filepath(ydl, info))
+                        if not self._verify_downloaded_file(filename):
+                            raise yt_dlp.utils.DownloadError(f"No se encontró el archivo descargado: {filename}")
+                        if hasher and hasher.hexdigest():
+                            info['content_sha256'] = hasher.hexdigest()
+                        if use_media_cache and media_id:
+                            self._media_cache_put(media_id, cache_profile, filename, info)
+                
+                for failed_name, failed_seconds in failed:
+                    manager.record(failed_name, False, failed_seconds)
+                manager.record(strategy.name, True, time.time() - started)
+                if used is not None:
+                    used['strategy'] = strategy
+                return info, filename
             except Exception as e:
-                print(f"⚠️ El intento con cookies falló: {e}. Intentando sin cookies...")
+                failed.append((strategy.name, time.time() - started))
+                print(f"⚠️ La estrategia '{strategy.name}' falló: {e}")
+                last_error = e
+        
+        raise last_error or RuntimeError("No hay estrategias de descarga configuradas")
 
-        # Intentar sin cookies (o como fallback)
-        print("DEBUG: Intentando descarga anónima (sin cookies)...")
-        ydl_opts.pop('cookiefile', None)
-        ydl_opts.pop('cookiesfrombrowser', None)
+    def _extract_info(self, ydl, url: str, auth: str) -> Dict[str, Any]:
+        """
+        Extrae la información del video sin procesar formatos ni descargar.
+        El resultado se guarda en la cache con TTL por (url, modo de autenticación):
+        cualquier perfil de descarga lo procesa después con ydl.process_ie_result.
+        """
+        key = (url, auth)
+        info = _info_cache.get(key)
+        if info is not None:
+            print(f"♻️ Metadatos de yt-dlp reutilizados de la cache ({auth})")
+            return info
         
+        info = self._resolve_url_results(ydl, ydl.extract_info(url, download=False, process=False))
+        _info_cache.put(key, info)
+        return info
+
+    def _resolve_url_results(self, ydl, info: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Sigue los resultados de tipo 'url' / 'url_transparent' (páginas genéricas con un video embebido,
+        redirecciones entre extractores) hasta el resultado con formatos, como haría una extracción procesada.
+        En 'url_transparent' los campos del resultado exterior tienen prioridad, igual que en yt-dlp.
+        """
+        for _ in range(MAX_URL_REDIRECTS):
+            result_type = info.get('_type')
+            if result_type not in ('url', 'url_transparent'):
+                break
+            resolved = ydl.extract_info(info['url'], download=False, ie_key=info.get('ie_key'), process=False)
+            if result_type == 'url_transparent':
+                resolved = dict(resolved, **{
+                    k: v for k, v in info.items()
+                    if v is not None and k not in ('_type', 'url', 'id', 'extractor', 'extractor_key', 'ie_key')
+                })
+                if resolved.get('_type') == 'url':
+                    resolved['_type'] = 'url_transparent'
+            info = resolved
+        return info
+
+    def _media_cache_get(self, media_id: tuple, profile: str, ydl_opts: Dict[str, Any]):
+        """(info, ruta) desde la caché de medios, entregado junto a donde lo habría dejado yt-dlp; None si no está"""
+        extractor, video_id = media_id
+        destination = ydl_opts['outtmpl'].replace('%(id)s', video_id).replace('.%(ext)s', '')
+        hit = _media_cache.get(media_key(extractor, video_id, profile), destination)
+        if not hit:
+            return None
+        filename, info = hit
+        print(f"♻️ Medio servido desde la caché ({extractor} {video_id}, {profile}): {filename}")
+        info = dict(info, media_cache_hit=True)
+        return info, filename
+
+    def _media_cache_put(self, media_id: tuple, profile: str, filename: str, info: Dict[str, Any]):
         try:
-            with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                info = ydl.extract_info(url, download=False)
-                video_title = info.get('title', 'Video de YouTube')
-                thumbnail_url = info.get('thumbnail', '')
-                channel_url = info.get('channel_url') or info.get('uploader_url') or ""
-                duration = info.get('duration', 0)
-                categories = info.get('categories', [])
-                category = categories[0] if categories else "transcripción"
-                
-                ydl.download([url])
-                
-                if not duration or duration == 0:
-                    try:
-                        audio = AudioSegment.from_file(output_path)
-                        duration = len(audio) / 1000.0
-                    except: pass
-                
-                return output_path, video_title, thumbnail_url, channel_url, duration, category
+            _media_cache.put(media_key(*media_id, profile), filename, info)
         except Exception as e:
-            print(f"La descarga anónima también falló: {e}")
-            return None, None, None, None, 0, "transcripción"
-    
+            # La caché es una optimización: un fallo no debe romper la descarga
+            print(f"⚠️ No se pudo guardar en la caché de medios: {e}")
+
+    def _has_media_formats(self, info: Dict[str, Any], require_video: bool = False) -> bool:
+        """True si hay formatos de video/audio (no solo imágenes); con require_video, solo de video"""
+        formats = info.get('formats', [])
+        if require_video:
+            return any(f.get('vcodec') != 'none' for f in formats)
+        return any(f.get('vcodec') != 'none' or f.get('acodec') != 'none' for f in formats)
+
+    def _downloaded_filepath(self, ydl, info: Dict[str, Any]) -> str:
+        """Ruta final de la descarga según yt-dlp (incluye la extensión tras unir formatos)"""
+        downloads = info.get('requested_downloads') or []
+        if downloads and downloads[0].get('filepath'):
+            return downloads[0]['filepath']
+        return ydl.prepare_filename(info)
+
+    def _info_metadata(self, info: Dict[str, Any]) -> tuple:
+        """(título, thumbnail, canal, duración, categoría) de un resultado de yt-dlp"""
+        video_title = info.get('title', 'Video de YouTube')
+        thumbnail_url = info.get('thumbnail', '')
+        channel_url = info.get('channel_url') or info.get('uploader_url') or ""
+        duration = info.get('duration', 0)
+        categories = info.get('categories', [])
+        category = categories[0] if categories else "transcripción"
+        return video_title, thumbnail_url, channel_url, duration, category
+
+    def get_video_metadata(self, url: str) -> Dict[str, Any]:
+        """
+        Vista previa de un video sin descargarlo. La extracción queda en la cache,
+        así que un trabajo lanzado poco después sobre la misma URL no vuelve a extraer.
+        """
+        ydl_opts = {
+            'quiet': True,
+            'no_warnings': True,
+            'nocheckcertificate': True,
+            'geo_bypass': True,
+            'source_address': '0.0.0.0',
+            'extractor_args': {
+                'youtube': {
+                    'player_client': ['web', 'android', 'ios', 'mweb'],
+                }
+            },
+        }
+        
+        info, _ = self._run_download_strategies(url, ydl_opts, download=False)
+        
+        video_title, thumbnail_url, channel_url, duration, category = self._info_metadata(info)
+        return {
+            'title': video_title,
+            'thumbnail': thumbnail_url,
+            'author': channel_url,
+            'duration': self.format_video_duration(duration),
+            'duration_seconds': duration or 0,
+            'category': category,
+        }
+
     # Methods split_audio_into_chunks and transcribe_audio_chunk removed (legacy code)
     
 
     
     def translate_text(self, text: str, target_lang: str) -> str:
         """Traduce texto al idioma objetivo"""
-        if not text.strip():
-            return ""
-        
+        return self.translate_batch([text], target_lang)[0]
+
+    def translate_batch(self, texts: List[str], target_lang: str) -> List[str]:
+        """Traduce una lista de textos a un idioma con el mínimo de peticiones."""
+        return self.translate_many(texts, [target_lang])[target_lang]
+
+    def translate_many(self, texts: List[str], target_langs: List[str], source_lang: str = 'it', untranslated: Dict[str, set] = None) -> Dict[str, List[str]]:
+        """
+        Traduce una lista de textos a varios idiomas.
+        Los textos se empaquetan según los límites del motor y los paquetes
+        (paquete x idioma) se traducen en paralelo en el pool compartido.
+        Si algo falla se devuelve el original; si se pasa `untranslated`, se rellena
+        con los índices que quedaron sin traducir por idioma.
+        """
+        if untranslated is None:
+            untranslated = {}
+        for lang in target_langs:
+            untranslated[lang] = set()
+        results = {lang: ["" for _ in texts] for lang in target_langs}
+        # Normalizar espacios: el separador no puede aparecer dentro de un texto
+        normalized = [" ".join(text.split()) if text else "" for text in texts]
+        # Traducir cada texto distinto una sola vez (frases repetidas, estribillos...)
+        unique_texts = list(dict.fromkeys(text for text in normalized if text))
+        if not unique_texts:
+            return results
+
+        backend = self.translation_backend
+        translated = {}
+        jobs = []
+        for lang in target_langs:
+            lang_code = self._translation_lang_code(lang)
+            translated[lang] = {}
+            if self.translation_cache:
+                translated[lang] = self.translation_cache.get_many(unique_texts, source_lang, lang_code, backend.name)
+            missing = [text for text in unique_texts if text not in translated[lang]]
+
+            for chunk in self._pack_for_translation(missing, backend.max_batch_chars, backend.max_batch_items):
+                jobs.append((lang, chunk, _translation_executor.submit(self._translate_chunk, chunk, source_lang, lang)))
+
+        new_pairs = {lang: [] for lang in target_langs}
+        for lang, chunk, future in jobs:
+            for text, translation in zip(chunk, future.result()):
+                # None indica fallo: no se guarda en caché
+                if translation is not None:
+                    translated[lang][text] = translation
+                    new_pairs[lang].append((text, translation))
+
+        for lang in target_langs:
+            if self.translation_cache and new_pairs[lang]:
+                self.translation_cache.put_many(new_pairs[lang], source_lang, self._translation_lang_code(lang), backend.name)
+
+            failed = sum(1 for text in unique_texts if text not in translated[lang])
+            if failed:
+                print(f"⚠️ {failed}/{len(unique_texts)} textos quedaron sin traducir a {lang} ({backend.name})")
+
+            for i, text in enumerate(normalized):
+                if not text:
+                    continue
+                if text in translated[lang]:
+                    results[lang][i] = translated[lang][text]
+                else:
+                    results[lang][i] = text
+                    untranslated[lang].add(i)
+
+        return results
+
+    def _translation_lang_code(self, target_lang: str) -> str:
+        """Mapea códigos de idioma para deep-translator"""
+        lang_map = {
+            'en': 'en',
+            'es': 'es', 
+            'pt': 'pt',
+            'it': 'it'
+        }
+        return lang_map.get(target_lang, target_lang)
+
+    def _pack_for_translation(self, texts, max_chars, max_items):
+        """Agrupa textos en paquetes que no excedan max_chars una vez unidos ni max_items textos."""
+        chunks = []
+        current = []
+        current_length = 0
+
+        for text in texts:
+            text_length = len(text) + 1  # +1 por el separador
+
+            if current and (current_length + text_length > max_chars or len(current) >= max_items):
+                chunks.append(current)
+                current = []
+                current_length = 0
+
+            current.append(text)
+            current_length += text_length
+
+        if current:
+            chunks.append(current)
+
+        return chunks
+
+    def _translate_chunk(self, texts, source_lang, target_lang):
+        """
+        Traduce un paquete de textos con el motor configurado.
+        Devuelve None en la posición de cada texto que no se pudo traducir.
+        """
+        backend = self.translation_backend
+        target_code = self._translation_lang_code(target_lang)
         try:
-            # Mapear códigos de idioma para deep-translator
-            lang_map = {
-                'en': 'en',
-                'es': 'es', 
-                'pt': 'pt',
-                'it': 'it'
-            }
-            
-            target_lang_code = lang_map.get(target_lang, target_lang)
-            translator = GoogleTranslator(source='it', target=target_lang_code)
-            translation = translator.translate(text)
-            return translation
+            # Con el proveedor degradado el circuito se abre y se falla al instante
+            return get_breaker(backend.name).call(lambda: backend.translate_batch(texts, source_lang, target_code))
+        except CircuitOpenError:
+            return [None] * len(texts)
         except Exception as e:
-            print(f"Error traduciendo a {target_lang}: {e}")
-            return text
+            print(f"Error traduciendo paquete a {target_lang}: {e}")
+            return [None] * len(texts)
     
     def format_duration(self, seconds: float) -> str:
         """Convierte segundos a formato HH:MM:SS.mmm"""
@@ -400,32 +834,7 @@ class VideoTranscriber:
         
         return f"{hours:02d}:{minutes:02d}:{secs:02d}.{milliseconds:03d}"
     
-    def convert_audio_to_wav(self, audio_file_path: str) -> str:
-        """Convierte cualquier formato de audio a WAV"""
-        try:
-            # Si ya es WAV, no convertir
-            if audio_file_path.lower().endswith('.wav'):
-                return audio_file_path
-            
-            print(f"Convirtiendo {audio_file_path} a formato WAV...")
-            
-            # Cargar el archivo de audio
-            audio = AudioSegment.from_file(audio_file_path)
-            
-            # Crear archivo WAV temporal
-            wav_path = os.path.join(self.temp_dir, "converted_audio.wav")
-            
-            # Exportar como WAV
-            audio.export(wav_path, format="wav")
-            
-            print("✅ Conversión completada")
-            return wav_path
-            
-        except Exception as e:
-            print(f"Error convirtiendo audio: {e}")
-            return None
-    
-    def transcribe_audio_file(self, audio_file_path: str, output_json_path: str = "transcription.json", optimize_for_ui: bool = True) -> bool:
+    def transcribe_audio_file(self, audio_file_path: str, output_json_path: str = "transcription.json", optimize_for_ui: bool = True, model_name: str = None, force: bool = False) -> bool:
         """Transcribe un archivo de audio local"""
         print(f"Procesando archivo de audio: {audio_file_path}")
         
@@ -433,19 +842,19 @@ class VideoTranscriber:
             print(f"Error: El archivo {audio_file_path} no existe")
             return False
         
-        # Convertir a WAV si es necesario
-        audio_path = self.convert_audio_to_wav(audio_file_path)
-        
-        if not audio_path:
-            print("Error: No se pudo convertir el archivo de audio")
-            return False
-        
-        return self._process_audio(audio_path, output_json_path, "Archivo de audio local", author_url="", optimize_for_ui=optimize_for_ui)
+        # ffmpeg decodifica cualquier formato directamente; el archivo pertenece al llamador y no se borra
+        return self._process_audio(audio_file_path, output_json_path, "Archivo de audio local", author_url="", optimize_for_ui=optimize_for_ui, model_name=model_name, delete_audio=False, force=force)
     
-    def transcribe_audio_from_url(self, audio_url: str, output_json_path: str = "transcription.json", optimize_for_ui: bool = True) -> bool:
+    def transcribe_audio_from_url(self, audio_url: str, output_json_path: str = "transcription.json", optimize_for_ui: bool = True, model_name: str = None, force: bool = False) -> bool:
         """Transcribe un archivo de audio desde una URL (storage o web)"""
         print(f"Procesando audio desde URL: {audio_url}")
         
+        if AUDIO_URL_STREAMING:
+            audio, thumbnail_path = self._decode_audio_url_stream(audio_url)
+            if audio is not None:
+                return self._process_audio(None, output_json_path, f"Audio desde URL: {audio_url}", thumbnail_url=thumbnail_path, author_url="", optimize_for_ui=optimize_for_ui, model_name=model_name, force=force, audio=audio)
+            print("↩️ Se descarga el archivo completo")
+        
         # Descargar el archivo de audio
         audio_path = self.download_audio_from_url(audio_url)
         
@@ -456,20 +865,55 @@ class VideoTranscriber:
         # Intentar extraer thumbnail si es un video
         thumbnail_path = ""
         lower_path = audio_path.lower()
-        if lower_path.endswith(('.mp4', '.mov', '.avi', '.mkv', '.webm')):
+        if lower_path.endswith(VIDEO_EXTENSIONS):
             print("Detectado archivo de video, intentando extraer thumbnail...")
             thumbnail_path = self._extract_thumbnail(audio_path)
             if thumbnail_path:
                 print(f"Thumbnail extraído: {thumbnail_path}")
         
-        # Convertir a WAV si es necesario
-        wav_path = self.convert_audio_to_wav(audio_path)
-        
-        if not wav_path:
-            print("Error: No se pudo convertir el archivo de audio")
-            return False
+        return self._process_audio(audio_path, output_json_path, f"Audio desde URL: {audio_url}", thumbnail_url=thumbnail_path, author_url="", optimize_for_ui=optimize_for_ui, model_name=model_name, force=force)
+
+    def _decode_audio_url_stream(self, url: str) -> tuple:
+        """
+        Decodifica el audio de una URL directa pasando el cuerpo de la respuesta a ffmpeg por tubería.
+        Si es un video, la misma ejecución de ffmpeg extrae el thumbnail.
+        Devuelve (audio, ruta del thumbnail) o (None, "") si el flujo no se pudo decodificar.
+        """
+        from urllib.parse import urlparse, unquote
+        thumbnail_path = None
+        try:
+            direct_url = self.get_direct_download_url(url)
+            headers = dict(BROWSER_HEADERS, **{'Accept-Encoding': 'identity'})
+            started = time.time()
+            received = [0]
+            
+            with _http_downloader.session.get(direct_url, headers=headers, stream=True, timeout=_http_downloader.timeout) as response:
+                response.raise_for_status()
+                content_type = response.headers.get('content-type', '').lower()
+                filename = os.path.basename(unquote(urlparse(response.url).path))
+                if 'video/' in content_type or filename.lower().endswith(VIDEO_EXTENSIONS):
+                    base_name = os.path.splitext(filename)[0] or "stream"
+                    thumbnail_path = os.path.join(self.temp_dir, f"{base_name}_thumb.jpg")
+                
+                def body():
+                    for chunk in response.iter_content(chunk_size=_http_downloader.chunk_size):
+                        received[0] += len(chunk)
+                        yield chunk
+                
+                print(f"🌊 Decodificando en streaming ({content_type or 'tipo desconocido'})...")
+                audio = decode_audio_stream(body(), thumbnail_path=thumbnail_path)
+            
+            print(f"🌊 {received[0] / 1e6:.1f} MB decodificados sin archivo temporal en {time.time() - started:.1f}s")
+            if thumbnail_path and os.path.exists(thumbnail_path):
+                print(f"Thumbnail extraído: {thumbnail_path}")
+                return audio, thumbnail_path
+            return audio, ""
         
-        return self._process_audio(wav_path, output_json_path, f"Audio desde URL: {audio_url}", thumbnail_url=thumbnail_path, author_url="", optimize_for_ui=optimize_for_ui)
+        except Exception as e:
+            print(f"⚠️ No se pudo decodificar la URL en streaming: {e}")
+            if thumbnail_path and os.path.exists(thumbnail_path):
+                os.remove(thumbnail_path)
+            return None, ""
 
     def _extract_thumbnail(self, video_path: str) -> str:
         """Extrae un thumbnail del video usando ffmpeg"""
@@ -520,40 +964,32 @@ class VideoTranscriber:
             if not filename or '.' not in filename:
                 filename = "downloaded_audio.mp3"
             
-            # Ruta temporal para el archivo descargado
-            temp_audio_path = os.path.join(self.temp_dir, filename)
+            # Ruta temporal para el archivo descargado, única por URL: otra URL con el mismo nombre
+            # no reanuda sobre su .part, y un reintento de la misma sí
+            url_hash = hashlib.sha1(direct_url.encode('utf-8')).hexdigest()[:16]
+            temp_audio_path = os.path.join(self.temp_dir, f"{url_hash}-{filename}")
             
             # Headers para simular un navegador
-            headers = {
-                'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
-                'Accept': 'audio/*, */*',
-                'Accept-Language': 'es-ES,es;q=0.9,en;q=0.8',
-                'Accept-Encoding': 'gzip, deflate, br',
-                'Referer': 'https://www.google.com/',
-                'Connection': 'keep-alive',
-                'Upgrade-Insecure-Requests': '1'
-            }
+            headers = dict(BROWSER_HEADERS)
             
-            # Descargar el archivo
-            response = requests.get(direct_url, headers=headers, stream=True, timeout=60)
-            response.raise_for_status()
+            # Consultar tamaño, soporte de Range y content-type (pide solo el primer byte)
+            remote = _http_downloader.probe(direct_url, headers)
             
             # Intear deducir extensión del content-type si el archivo no la tiene bien
-            content_type = response.headers.get('content-type', '').lower()
+            content_type = remote['content_type']
             
             # Si detectamos que es video y la extensión es incorrecta
-            if 'video/' in content_type and not filename.lower().endswith(('.mp4', '.mov', '.avi', '.mkv', '.webm')):
+            if 'video/' in content_type and not filename.lower().endswith(VIDEO_EXTENSIONS):
                  if not temp_audio_path.lower().endswith('.mp4'):
                     temp_audio_path += ".mp4"
             
             if not any(t in content_type for t in ['audio/', 'video/', 'application/octet-stream', 'binary']):
                 print("⚠️  Advertencia: El archivo puede no ser multimedia")
             
-            # Guardar el archivo
-            with open(temp_audio_path, 'wb') as f:
-                for chunk in response.iter_content(chunk_size=8192):
-                    if chunk:
-                        f.write(chunk)
+            # Guardar el archivo (reanuda si quedó un .part de un intento anterior)
+            stats = _http_downloader.download(direct_url, temp_audio_path, headers, remote)
+            print(f"📦 {stats['bytes'] / 1e6:.1f} MB en {stats['seconds']:.1f}s "
+                  f"({stats['segments']} segmentos, {stats['resumed_bytes'] / 1e6:.1f} MB reanudados)")
             
             print(f"✅ Archivo descargado: {os.path.basename(temp_audio_path)}")
             return temp_audio_path
@@ -683,109 +1119,291 @@ class VideoTranscriber:
         else:
             return f"{minutes}:{secs:02d}"
 
-    def transcribe_video(self, video_url: str, output_json_path: str = "transcription.json", optimize_for_ui: bool = True, status_callback=None) -> bool:
-        """Proceso completo de transcripción y traducción de video de YouTube"""
+    def transcribe_video(self, video_url: str, output_json_path: str = "transcription.json", optimize_for_ui: bool = True, status_callback=None, model_name: str = None, force: bool = False, on_subtitles=None) -> bool:
+        """
+        Proceso completo de transcripción y traducción de video de YouTube.
+        Si el video ya se transcribió con los mismos parámetros se devuelve el resultado guardado
+        sin descargar (force=True lo ignora y vuelve a procesar).
+        Con TRANSCRIPTION_STREAMING se transcribe mientras se descarga y on_subtitles(nuevos, segundos)
+        recibe los subtítulos de cada ventana en cuanto están traducidos.
+        """
+        video_id = url_media_id(video_url)
+        if video_id and not force:
+            cached = self._result_cache_get(self._result_keys(model_name, optimize_for_ui, video_id=video_id))
+            if cached:
+                cached['url'] = video_url
+                return self._write_result(output_json_path, cached)
+        
+        if TRANSCRIPTION_STREAMING:
+            return self._transcribe_video_streaming(video_url, output_json_path, optimize_for_ui, status_callback, model_name, video_id, on_subtitles)
+        
         print("Descargando video de YouTube...")
-        result = self.download_youtube_video(video_url, status_callback=status_callback)
+        download_stats = {}
+        result = self.download_youtube_video(video_url, status_callback=status_callback, stats=download_stats)
         
         if result[0] is None:
             print("Error: No se pudo descargar el video")
             return False
         
+        print(f"📦 Descarga ({download_stats['profile']}, formato {download_stats['format_id']}"
+              f"{', caché' if download_stats['cache_hit'] else ''}): "
+              f"{download_stats['bytes_downloaded'] / 1e6:.1f} MB en {download_stats['seconds']:.1f}s")
+        
         audio_path, video_title, thumbnail_url, author_url, duration_seconds, category_from_yt = result
         
-        # Convert duration to string format for UI (e.g. 0:26)
-        duration_str = self.format_video_duration(duration_seconds)
+        # Convert duration to string format for UI (e.g. 0:26); si yt-dlp no la da se calcula del audio decodificado
+        duration_str = self.format_video_duration(duration_seconds) if duration_seconds else ""
         
-        return self._process_audio(audio_path, output_json_path, video_url, video_title, thumbnail_url, author_url, optimize_for_ui, duration=duration_str, category=category_from_yt)
+        return self._process_audio(audio_path, output_json_path, video_url, video_title, thumbnail_url, author_url, optimize_for_ui, duration=duration_str, category=category_from_yt, model_name=model_name, force=force, video_id=video_id)
     
-    def _process_audio(self, audio_path: str, output_json_path: str, source_url: str, video_title: str = None, thumbnail_url: str = None, author_url: str = "", optimize_for_ui: bool = True, duration: str = "", category: str = "transcripción") -> bool:
-        """Procesa el audio (común para video y archivos locales) usando Whisper"""
+    def _transcribe_video_streaming(self, video_url: str, output_json_path: str, optimize_for_ui: bool, status_callback, model_name: str, video_id: tuple, on_subtitles) -> bool:
+        """
+        Ingesta en streaming: yt-dlp escribe el audio por stdout, ffmpeg lo decodifica según llega
+        y cada ventana se transcribe y traduce sin esperar al final de la descarga.
+        La extracción se hace aquí una vez (con la estrategia que funcione) y yt-dlp la reutiliza con --load-info-json.
+        """
+        ydl_opts = {
+            'quiet': True,
+            'no_warnings': True,
+            'nocheckcertificate': True,
+            'geo_bypass': True,
+            'source_address': '0.0.0.0',
+            'extractor_args': {
+                'youtube': {
+                    'player_client': ['web', 'android', 'ios', 'mweb'],
+                }
+            },
+            'logger': YtDlpLogger(status_callback)
+        }
         
+        downloader = None
+        decoder = None
+        info_path = None
         try:
-            print("Iniciando transcripción con Whisper (esto puede tardar unos minutos)...")
-            # Transcribir directamente con Whisper
-            # Transcribir directamente con Whisper
-            # Whisper se encarga de dividir el audio y manejar tiempos internamente
-            model = self._get_model()
-            result = model.transcribe(audio_path, language="it")
+            used = {}
+            info, _ = self._run_download_strategies(video_url, ydl_opts, download=False, used=used)
+            video_title, thumbnail_url, author_url, duration_seconds, category = self._info_metadata(info)
+            # El archivo temporal se crea solo si la extracción funcionó (y se cierra al escribirlo)
+            fd, info_path = tempfile.mkstemp(dir=self.temp_dir, suffix='.info.json')
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(yt_dlp.YoutubeDL.sanitize_info(info), f)
             
-            segments = result.get('segments', [])
-            print(f"Whisper generó {len(segments)} segmentos base.")
+            profile = DOWNLOAD_PROFILES['audio']
+            cmd = [
+                sys.executable, '-m', 'yt_dlp',
+                '--load-info-json', info_path,
+                '-f', profile['format'], '-S', ','.join(profile['format_sort']),
+                '-o', '-', '--quiet', '--no-warnings', '--no-progress'
+            ]
+            if used['strategy'].use_cookies:
+                cmd += ['--cookies', self._get_cookiefile()]
             
-            transcriptions = []
+            print(f"📡 Transcripción en streaming (ventanas de {STREAM_WINDOW_SECONDS}s)...")
+            downloader = subprocess.Popen(cmd, stdout=subprocess.PIPE)
+            decoder = ProgressiveDecoder(stdin=downloader.stdout)
+            # ffmpeg tiene su propia copia de la tubería
+            downloader.stdout.close()
             
-            print("Traduciendo segmentos...")
-            for i, segment in enumerate(segments):
-                # if i % 10 == 0:
-                #    print(f"Procesando segmento {i+1}/{len(segments)}")
-                
-                segment_text = segment['text'].strip()
-                if not segment_text:
-                    continue
-                    
-                start_time = segment['start']
-                end_time = segment['end']
-                
-                # Traducir texto
-                translation_en = self.translate_text(segment_text, 'en')
-                translation_pt = self.translate_text(segment_text, 'pt')
-                translation_es = self.translate_text(segment_text, 'es')
-                
-                transcription_data = {
-                    'text': segment_text,
-                    'startTime': self.format_duration(start_time),
-                    'endTime': self.format_duration(end_time),
-                    'translation': translation_es,      # Traducción del texto de este segmento
-                    'translationPR': translation_pt,   # Traducción del texto de este segmento
-                    'translationEN': translation_en,   # Traducción del texto de este segmento
-                    'isWordKey': False
-                }
-                
-                transcriptions.append(transcription_data)
+            subtitles = self._transcribe_stream(decoder, model_name, optimize_for_ui, on_subtitles)
+            if downloader.wait() != 0:
+                raise RuntimeError(f"yt-dlp terminó con código {downloader.returncode}")
             
-            # Optimizar subtítulos para mejor legibilidad en la UI
+            audio = decoder.audio()
+            duration = self.format_video_duration(duration_seconds or len(audio) / SAMPLE_RATE)
+            final_data = self._build_result(video_url, video_title, thumbnail_url, author_url, duration, category, subtitles)
+            
+            if self.result_cache:
+                self.result_cache.put(self._result_keys(model_name, optimize_for_ui, video_id=video_id, audio=audio), final_data)
+            
+            return self._write_result(output_json_path, final_data)
+        
+        except Exception as e:
+            print(f"Error durante la transcripción en streaming: {e}")
+            import traceback
+            traceback.print_exc()
+            return False
+        
+        finally:
+            if decoder:
+                decoder.close()
+            if downloader and downloader.poll() is None:
+                downloader.kill()
+            if info_path and os.path.exists(info_path):
+                os.remove(info_path)
+
+    def _transcribe_stream(self, decoder: ProgressiveDecoder, model_name: str = None, optimize_for_ui: bool = True, on_subtitles=None) -> List[Dict[str, Any]]:
+        """
+        Transcribe ventanas fijas de STREAM_WINDOW_SECONDS a medida que el decodificador las entrega.
+        Cada ventana se envía con CHUNK_OVERLAP_SECONDS de contexto a cada lado y los segmentos
+        se asignan por su punto medio (como en la transcripción por tramos).
+        Devuelve todos los subtítulos ya optimizados y traducidos.
+        """
+        window = STREAM_WINDOW_SECONDS * SAMPLE_RATE
+        overlap = int(CHUNK_OVERLAP_SECONDS * SAMPLE_RATE)
+        to_ms = lambda samples: samples * 1000 // SAMPLE_RATE
+        
+        subtitles = []
+        core_start = 0
+        started = time.time()
+        
+        while True:
+            # Esperar a la ventana completa más el contexto de la siguiente (o al final del audio)
+            available = decoder.wait_for(core_start + window + overlap)
+            if decoder.error:
+                raise RuntimeError(decoder.error)
+            last = decoder.finished and available < core_start + window + overlap
+            if available <= core_start:
+                break
+            
+            core_end = available if last else core_start + window
+            start = max(0, core_start - overlap)
+            end = min(available, core_end + overlap)
+            segments = self._transcribe_audio(decoder.read(start, end), model_name)
+            # En la última ventana todo lo que quede pertenece a ella
+            owned = stitch_segments([(to_ms(start), to_ms(core_start), float('inf') if last else to_ms(core_end), segments)])
+            
+            new_subtitles = self._segments_to_subtitles(owned)
+            if optimize_for_ui:
+                new_subtitles = self._optimize_subtitles_for_ui(new_subtitles, max_chars=80, translate=False)
+            self._translate_subtitles(new_subtitles)
+            subtitles.extend(new_subtitles)
+            
+            print(f"🪟 Ventana {to_ms(core_start) / 1000:.0f}-{to_ms(core_end) / 1000:.0f}s: "
+                  f"{len(new_subtitles)} subtítulos (a los {time.time() - started:.1f}s)")
+            if on_subtitles:
+                on_subtitles(new_subtitles, core_end / SAMPLE_RATE)
+            
+            if last:
+                break
+            core_start = core_end
+        
+        return subtitles
+
+    def _transcribe_segments(self, audio: np.ndarray, model_name: str = None) -> List[Dict[str, Any]]:
+        """Transcribe el audio (float32 mono 16 kHz) con el motor configurado y devuelve sus segmentos (start, end, text)"""
+        print(f"Iniciando transcripción con {TRANSCRIPTION_ENGINE} (esto puede tardar unos minutos)...")
+        
+        if TRANSCRIPTION_CHUNKED and duration_ms(audio) > CHUNK_MAX_SECONDS * 1000:
+            segments = self._transcribe_chunked(audio, model_name)
+        else:
+            # El motor se encarga de dividir el audio y manejar tiempos internamente
+            segments = self._transcribe_audio(audio, model_name)
+        
+        print(f"{TRANSCRIPTION_ENGINE} generó {len(segments)} segmentos base.")
+        return segments
+
+    def _transcribe_audio(self, audio, model_name: str = None) -> List[Dict[str, Any]]:
+        """Transcribe un array float32 en el pool de procesos o en este proceso"""
+        if WHISPER_EXECUTION == "process":
+            model_name = model_name or WHISPER_MODEL
+            if model_name not in WHISPER_ALLOWED_MODELS:
+                raise ValueError(f"Modelo Whisper no permitido: {model_name}")
+            return _get_process_pool().transcribe(audio, model_name, language="it")
+        
+        model = self._get_model(model_name)
+        return _engine.transcribe(model, audio, language="it")
+
+    def _transcribe_chunked(self, audio: np.ndarray, model_name: str = None) -> List[Dict[str, Any]]:
+        """
+        Corta el audio en silencios en tramos de duración acotada, los transcribe
+        en paralelo y une los segmentos con sus tiempos globales.
+        """
+        chunks = plan_chunks(audio, CHUNK_MAX_SECONDS * 1000, CHUNK_MIN_SILENCE_MS, CHUNK_SILENCE_THRESH)
+        overlap_ms = int(CHUNK_OVERLAP_SECONDS * 1000)
+        
+        if WHISPER_EXECUTION == "process":
+            workers = WHISPER_WORKERS
+        elif _engine.thread_safe:
+            workers = CHUNK_WORKERS
+        else:
+            # openai-whisper no admite inferencias simultáneas sobre el mismo modelo
+            print("⚠️ Tramos en serie: usa WHISPER_EXECUTION=process o faster-whisper para paralelizar")
+            workers = 1
+        print(f"🔪 Audio dividido en {len(chunks)} tramos ({workers} en paralelo)")
+        
+        def transcribe_chunk(core_start, core_end):
+            # Cada tramo incluye un poco de solapamiento con sus vecinos
+            start = max(0, core_start - overlap_ms)
+            end = min(duration_ms(audio), core_end + overlap_ms)
+            # slice_ms devuelve una vista: los tramos no copian muestras
+            segments = self._transcribe_audio(slice_ms(audio, start, end), model_name)
+            return start, core_start, core_end, segments
+        
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="chunk") as executor:
+            futures = [executor.submit(transcribe_chunk, core_start, core_end) for core_start, core_end in chunks]
+            results = [future.result() for future in futures]
+        
+        # En el último tramo todo lo que quede pertenece a él (Whisper puede alargar el segmento final
+        # más allá del audio), igual que en la última ventana del modo streaming
+        if results:
+            start, core_start, _, segments = results[-1]
+            results[-1] = (start, core_start, float('inf'), segments)
+        return stitch_segments(results)
+
+    def _segments_to_subtitles(self, segments) -> List[Dict[str, Any]]:
+        """Convierte segmentos de Whisper al formato de subtítulos (sin traducir)"""
+        subtitles = []
+        
+        for segment in segments:
+            segment_text = segment['text'].strip()
+            if not segment_text:
+                continue
+            
+            subtitles.append({
+                'text': segment_text,
+                'startTime': self.format_duration(segment['start']),
+                'endTime': self.format_duration(segment['end']),
+                'translation': "",      # Traducción del texto de este segmento
+                'translationPR': "",   # Traducción del texto de este segmento
+                'translationEN': "",   # Traducción del texto de este segmento
+                'isWordKey': False
+            })
+        
+        return subtitles
+
+    def _process_audio(self, audio_path: str, output_json_path: str, source_url: str, video_title: str = None, thumbnail_url: str = None, author_url: str = "", optimize_for_ui: bool = True, duration: str = "", category: str = "transcripción", model_name: str = None, delete_audio: bool = True, force: bool = False, video_id: tuple = None, audio: np.ndarray = None) -> bool:
+        """
+        Procesa el audio (común para video y archivos locales) usando Whisper.
+        El resultado se guarda en la caché por hash del audio decodificado (y por id de video si se conoce);
+        force=True ignora lo guardado y vuelve a transcribir.
+        Si ya se tiene el audio decodificado (streaming), se pasa en audio y audio_path puede ser None.
+        """
+        
+        try:
+            # Etapa 1: decodificar una sola vez en memoria y transcribir
+            if audio is None:
+                audio = decode_audio(audio_path)
+            print(f"🎧 Audio decodificado en memoria: {len(audio) / SAMPLE_RATE:.1f}s ({audio.nbytes / 1e6:.1f} MB)")
+            if not duration:
+                duration = self.format_video_duration(len(audio) / SAMPLE_RATE)
+            
+            cache_keys = self._result_keys(model_name, optimize_for_ui, video_id=video_id, audio=audio)
+            cached = None if force else self._result_cache_get(cache_keys)
+            if cached:
+                # Mismo audio: se reutilizan los subtítulos con los metadatos de esta fuente
+                final_data = self._build_result(source_url, video_title, thumbnail_url, author_url, duration, category, cached['subtitles'])
+                return self._write_result(output_json_path, final_data)
+            
+            segments = self._transcribe_segments(audio, model_name)
+            transcriptions = self._segments_to_subtitles(segments)
+            
+            # Etapa 2: optimizar subtítulos para mejor legibilidad en la UI
             if optimize_for_ui:
                 print("🔧 Optimizando subtítulos para mejor legibilidad...")
-                transcriptions = self._optimize_subtitles_for_ui(transcriptions, max_chars=80)
+                transcriptions = self._optimize_subtitles_for_ui(transcriptions, max_chars=80, translate=False)
                 print(f"✅ Subtítulos optimizados: {len(transcriptions)} segmentos")
             
-            # Determinar el autor
-            author_field = "DanteStudio"
-            if author_url:
-                author_field = author_url
-            
-            # Crear estructura final del JSON con metadatos correctos
-            final_data = {
-                'url': source_url,                                    # URL real del video
-                'name': video_title if video_title else "Video de YouTube",  # Nombre real del video
-                'description': "Transcripción automática del audio",
-                'category': category,
-                'image': thumbnail_url if thumbnail_url else "",       # Thumbnail del video
-                'author': author_field,
-                'chiave': "transcripción",
-                'livello': "intermedio",
-                'lingua': "it",
-                'views': 0,
-                'duration': duration,                                  # Duración del video
-                'chiaveTranslation': "transcripción",
-                'chiaveTranslationEN': "transcription",
-                'chiaveTranslationPR': "transcrição",
-                'subtitles': transcriptions
-            }
+            # Etapa 3: traducir cada subtítulo final una sola vez
+            print("Traduciendo segmentos...")
+            self._translate_subtitles(transcriptions)
             
-            # Guardar en archivo JSON
-            try:
-                with open(output_json_path, 'w', encoding='utf-8') as f:
-                    json.dump(final_data, f, ensure_ascii=False, indent=2)
-                
-                print(f"Transcripción completada y guardada en {output_json_path}")
-                print(f"Total de segmentos transcritos: {len(transcriptions)}")
-                return True
-                
-            except Exception as e:
-                print(f"Error guardando archivo JSON: {e}")
-                return False
+            final_data = self._build_result(source_url, video_title, thumbnail_url, author_url, duration, category, transcriptions)
+            
+            # Con traducciones pendientes también se guarda: la caché las marca y el backfill las completa
+            if self.result_cache:
+                self.result_cache.put(cache_keys, final_data)
+            
+            return self._write_result(output_json_path, final_data)
             
         except Exception as e:
             print(f"Error durante el procesamiento con Whisper: {e}")
@@ -795,13 +1413,82 @@ class VideoTranscriber:
         
         finally:
             # Limpiar archivos temporales
-            if os.path.join(self.temp_dir) in audio_path: # Solo borrar si está en temp
+            if delete_audio and audio_path and os.path.join(self.temp_dir) in audio_path: # Solo borrar si está en temp
                 try:
                     if os.path.exists(audio_path):
                         os.remove(audio_path)
                 except:
                     pass
 
+    def _result_keys(self, model_name: str, optimize_for_ui: bool, video_id: tuple = None, audio: np.ndarray = None) -> List[str]:
+        """Claves de la caché de resultados: por id de video y/o por hash del audio decodificado"""
+        params = {
+            'engine': TRANSCRIPTION_ENGINE,
+            'model': model_name or WHISPER_MODEL,
+            'optimize_for_ui': optimize_for_ui,
+            'max_chars': 80,
+            'language': 'it',
+            'translation_backend': self.translation_backend.name,
+        }
+        keys = []
+        if video_id:
+            keys.append(result_key('video', ':'.join(video_id), params))
+        if audio is not None:
+            # El array es contiguo: hashlib lee su buffer sin copiarlo
+            keys.append(result_key('audio', hashlib.sha256(audio).hexdigest(), params))
+        return keys
+
+    def _result_cache_get(self, keys: List[str]) -> Dict[str, Any]:
+        if not self.result_cache or not keys:
+            return None
+        cached = self.result_cache.get(keys)
+        if cached:
+            print(f"♻️ Transcripción reutilizada de la caché de resultados ({len(cached.get('subtitles', []))} segmentos)")
+            if has_pending_translations(cached) and self.backfill_translations(cached):
+                # Se completaron traducciones que faltaban: se actualiza la entrada guardada
+                self.result_cache.put(keys, cached)
+        return cached
+
+    def _build_result(self, source_url: str, video_title: str, thumbnail_url: str, author_url: str, duration: str, category: str, transcriptions: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """Estructura final del JSON con los metadatos de la fuente"""
+        # Determinar el autor
+        author_field = "DanteStudio"
+        if author_url:
+            author_field = author_url
+        
+        # Crear estructura final del JSON con metadatos correctos
+        return {
+            'url': source_url,                                    # URL real del video
+            'name': video_title if video_title else "Video de YouTube",  # Nombre real del video
+            'description': "Transcripción automática del audio",
+            'category': category,
+            'image': thumbnail_url if thumbnail_url else "",       # Thumbnail del video
+            'author': author_field,
+            'chiave': "transcripción",
+            'livello': "intermedio",
+            'lingua': "it",
+            'views': 0,
+            'duration': duration,                                  # Duración del video
+            'chiaveTranslation': "transcripción",
+            'chiaveTranslationEN': "transcription",
+            'chiaveTranslationPR': "transcrição",
+            'subtitles': transcriptions
+        }
+
+    def _write_result(self, output_json_path: str, final_data: Dict[str, Any]) -> bool:
+        """Guarda el resultado en el archivo JSON de salida"""
+        try:
+            with open(output_json_path, 'w', encoding='utf-8') as f:
+                json.dump(final_data, f, ensure_ascii=False, indent=2)
+            
+            print(f"Transcripción completada y guardada en {output_json_path}")
+            print(f"Total de segmentos transcritos: {len(final_data['subtitles'])}")
+            return True
+            
+        except Exception as e:
+            print(f"Error guardando archivo JSON: {e}")
+            return False
+
     def cleanup(self):
         """Limpia archivos temporales"""
         import shutil
@@ -811,11 +1498,6 @@ class VideoTranscriber:
             except:
                 pass
         
-        if self.cookie_temp_file and os.path.exists(self.cookie_temp_file):
-            try:
-                os.remove(self.cookie_temp_file)
-            except:
-                pass
 
     def download_video_file(self, youtube_url: str, output_path: str = None, status_callback=None) -> tuple:
         """
@@ -824,9 +1506,11 @@ class VideoTranscriber:
         if output_path is None:
              output_path = os.path.join(self.temp_dir, "%(id)s.%(ext)s")
 
+        # Con empaquetado se prefiere un MP4 H.264/AAC, el contenedor que faststart sabe preparar
+        profile = 'video' if VIDEO_PACKAGING == 'none' else 'video_mp4'
         ydl_opts = {
             # Selector robusto para descarga de video (prioriza 480p)
-            'format': 'bestvideo[height<=480]+bestaudio/best[height<=480]/bestvideo+bestaudio/best',
+            **DOWNLOAD_PROFILES[profile],
             'outtmpl': output_path,
             'quiet': False,
             'no_warnings': False,
@@ -844,49 +1528,19 @@ class VideoTranscriber:
         
         ydl_opts['logger'] = YtDlpLogger(status_callback)
 
-        # 1. Intentar con cookies
-        cookie_file = self._get_cookiefile()
-        if cookie_file:
-            print(f"DEBUG: download_video_file intentando con cookies: {cookie_file}")
-            ydl_opts['cookiefile'] = cookie_file
-            try:
-                with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                    print(f"Descargando video de: {youtube_url} (con cookies)")
-                    info = ydl.extract_info(youtube_url, download=True)
-                    formats = info.get('formats', [])
-                    if any(f.get('vcodec') != 'none' for f in formats):
-                        filename = ydl.prepare_filename(info)
-                        # ... validación de archivo existente ...
-                        if self._verify_downloaded_file(filename):
-                            return filename, info
-                    print("⚠️ Descarga con cookies no encontró video. Intentando sin cookies...")
-            except Exception as e:
-                print(f"⚠️ Intento con cookies falló: {e}. Intentando sin cookies...")
-
-        # 2. Intentar sin cookies
-        print("DEBUG: download_video_file intentando descarga anónima...")
-        ydl_opts.pop('cookiefile', None)
-        ydl_opts.pop('cookiesfrombrowser', None)
-        
-        with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-            print(f"Descargando video de: {youtube_url} (anónimo)")
-            info = ydl.extract_info(youtube_url, download=True)
-            filename = ydl.prepare_filename(info)
-            
-            # Verificar y buscar el archivo final (a veces cambia extensión)
-            if not os.path.exists(filename):
-                base = os.path.splitext(filename)[0]
-                import glob
-                files = glob.glob(f"{base}.*")
-                if files: filename = files[0]
-            
-            if os.path.exists(filename):
-                size = os.path.getsize(filename)
-                print(f"Video descargado en: {filename} (Tamaño: {size} bytes)")
-            else:
-                print(f"❌ ERROR: No se encontró el archivo: {filename}")
-                
-            return filename, info
+        # Sin hash (entrada de la caché de medios anterior a él, descarga que no se pudo seguir) no se deduplica
+        info, filename = self._run_download_strategies(youtube_url, ydl_opts, require_video=True, cache_profile=profile, content_hash=True)
+        print(f"Video descargado en: {filename} (Tamaño: {os.path.getsize(filename)} bytes)")
+        return filename, info
+
+    def _find_downloaded_file(self, filename: str) -> str:
+        """Ruta final de una descarga de yt-dlp (a veces cambia la extensión al unir formatos)."""
+        if not os.path.exists(filename):
+            base = os.path.splitext(filename)[0]
+            import glob
+            files = glob.glob(f"{base}.*")
+            if files: filename = files[0]
+        return filename
 
     def _verify_downloaded_file(self, filename: str) -> bool:
         """Verifica que el archivo exista y no esté vacío."""
@@ -900,20 +1554,128 @@ class VideoTranscriber:
             return True
         return False
 
-    def upload_file_to_backend(self, filepath: str, upload_endpoint: str) -> str:
-        """Uploads the file to the backend and returns the public URL."""
+    def upload_video_to_backend(self, filepath: str, upload_endpoint: str, progress_callback=None, sha256: str = None) -> str:
+        """
+        Empaqueta el video según VIDEO_PACKAGING y lo sube. Devuelve la URL pública
+        (en HLS, la de la playlist). Si el empaquetado falla se sube el archivo original.
+        """
+        mode = VIDEO_PACKAGING
+        if mode == 'faststart' and not filepath.lower().endswith(FASTSTART_EXTENSIONS):
+            print(f"⚠️ faststart solo aplica a MP4/MOV ({os.path.basename(filepath)}): se sube sin empaquetar")
+            mode = 'none'
+        if mode == 'none':
+            return self.upload_file_to_backend(filepath, upload_endpoint, progress_callback, sha256)
+        
+        import shutil
+        package_dir = tempfile.mkdtemp(dir=self.temp_dir, prefix='package-')
+        try:
+            started = time.time()
+            try:
+                if mode == 'faststart':
+                    packaged = faststart(filepath, os.path.join(package_dir, os.path.basename(filepath)))
+                elif mode == 'hls':
+                    hls = segment_hls(filepath, package_dir, HLS_SEGMENT_SECONDS)
+                else:
+                    raise ValueError(f"VIDEO_PACKAGING desconocido: {mode}")
+            except Exception as e:
+                print(f"⚠️ No se pudo empaquetar el video ({mode}): {e}. Se sube sin empaquetar")
+                return self.upload_file_to_backend(filepath, upload_endpoint, progress_callback, sha256)
+            print(f"🎞️ Video empaquetado ({mode}) en {time.time() - started:.1f}s")
+            
+            if mode == 'faststart':
+                # El remux es determinista: la clave es la del contenido descargado más el empaquetado
+                packaged_sha256 = sha256 and hashlib.sha256(f"{sha256}:{mode}".encode()).hexdigest()
+                return self.upload_file_to_backend(packaged, upload_endpoint, progress_callback, packaged_sha256)
+            return self._upload_hls(hls, upload_endpoint, progress_callback)
+        finally:
+            shutil.rmtree(package_dir, ignore_errors=True)
+
+    def _upload_hls(self, hls: Dict[str, Any], upload_endpoint: str, progress_callback=None) -> str:
+        """Sube init y segmentos en paralelo, reescribe la playlist con sus URLs públicas y la sube."""
+        files = hls['files']
+        total = sum(os.path.getsize(path) for path in files)
+        sent = [0]
+        lock = threading.Lock()
+        print(f"⬆️ HLS: {len(files)} archivos, {total / 1e6:.1f} MB")
+        
+        def upload(path):
+            url = self.upload_file_to_backend(path, upload_endpoint, content_type='video/mp4')
+            if not url:
+                raise Exception(f"Fallo en la subida del segmento {os.path.basename(path)}")
+            with lock:
+                sent[0] += os.path.getsize(path)
+                if progress_callback:
+                    progress_callback(sent[0], total)
+            return url
+        
+        with ThreadPoolExecutor(max_workers=_uploader.parallel, thread_name_prefix="hls-upload") as executor:
+            urls = dict(zip((os.path.basename(path) for path in files), executor.map(upload, files)))
+        
+        rewrite_playlist(hls['playlist'], lambda name: urls[name])
+        return self.upload_file_to_backend(hls['playlist'], upload_endpoint, content_type='application/vnd.apple.mpegurl')
+
+    def upload_file_to_backend(self, filepath: str, upload_endpoint: str, progress_callback=None, sha256: str = None, content_type: str = 'video/mp4') -> str:
+        """
+        Uploads the file to the backend and returns the public URL.
+        With UPLOAD_MODE=chunked the file goes in resumable parallel parts; progress_callback(sent, total)
+        is called as parts are acknowledged.
+        With UPLOAD_DEDUP, a file whose content hash (sha256, computed while downloading) was already
+        uploaded reuses the existing public URL: first from the local index, then asking the backend.
+        Without sha256 the file is uploaded as is (it is never re-read just to hash it).
+        """
         print(f"Subiendo {filepath} a {upload_endpoint}...")
+        if _upload_index is not None and sha256:
+            public_url = self._existing_upload(sha256, upload_endpoint)
+            if public_url:
+                if progress_callback:
+                    size = os.path.getsize(filepath)
+                    progress_callback(size, size)
+                return public_url
+        
+        public_url = self._upload_file(filepath, upload_endpoint, progress_callback, sha256, content_type)
+        if _upload_index is not None and sha256 and public_url:
+            _upload_index.put(sha256, upload_endpoint, public_url)
+        return public_url
+
+    def _existing_upload(self, sha256: str, upload_endpoint: str) -> str:
+        """URL pública de un contenido ya subido: índice local y, si no está, HEAD al backend"""
+        public_url = _upload_index.get(sha256, upload_endpoint)
+        if public_url:
+            print(f"♻️ Video ya subido (índice local): {public_url}")
+            return public_url
+        public_url = _uploader.existing_url(upload_endpoint, sha256)
+        if public_url:
+            print(f"♻️ Video ya presente en el backend: {public_url}")
+            _upload_index.put(sha256, upload_endpoint, public_url)
+        return public_url
+
+    def _upload_file(self, filepath: str, upload_endpoint: str, progress_callback=None, sha256: str = None, content_type: str = 'video/mp4') -> str:
+        if UPLOAD_MODE == 'chunked':
+            try:
+                public_url = _uploader.upload(filepath, upload_endpoint, content_type, progress_callback, sha256)
+                print(f"Subida exitosa: {public_url}")
+                return public_url
+            except ChunkedUploadUnsupported as e:
+                print(f"⚠️ {e}. Se usa la subida en una sola petición")
+            except Exception as e:
+                print(f"Error subiendo archivo: {e}")
+                raise e
         try:
             with open(filepath, 'rb') as f:
                 # Add explict MIME type
-                files = {'file': (os.path.basename(filepath), f, 'video/mp4')}
+                files = {'file': (os.path.basename(filepath), f, content_type)}
+                # El hash permite al backend indexar el objeto para la deduplicación
+                data = {'sha256': sha256} if sha256 else None
                 # You can specify a bucket via query param: ?bucket=reels if not in endpoint
-                response = requests.post(upload_endpoint, files=files)
+                response = requests.post(upload_endpoint, files=files, data=data, timeout=UPLOAD_TIMEOUT)
             
             if response.status_code == 200:
                 data = response.json()
                 public_url = data.get('url')
                 print(f"Subida exitosa: {public_url}")
+                if progress_callback:
+                    size = os.path.getsize(filepath)
+                    progress_callback(size, size)
                 return public_url
             else:
                 raise Exception(f"Upload failed: {response.text}")
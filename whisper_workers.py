@@ -0,0 +1,135 @@
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Dict, List
+
+from model_registry import ModelRegistry
+from transcription_engines import create_engine
+
+# Motor y registro de modelos propios de cada proceso worker
+_worker_engine = None
+_worker_registry = None
+
+
+def _init_worker(engine_name: str, default_model: str, threads: int, max_resident: int, events):
+    """
+    Inicializa un proceso worker: fija su presupuesto de hilos y carga el modelo una vez.
+    Avisa al proceso principal por `events` con ('ready', pid) o ('error', pid, mensaje).
+    """
+    global _worker_engine, _worker_registry
+    try:
+        _worker_engine = create_engine(engine_name)
+
+        _worker_registry = ModelRegistry(
+            lambda name: _worker_engine.load(name, threads=threads),
+            max_resident=max_resident,
+            warmup=_worker_engine.warmup
+        )
+        _worker_registry.get(default_model)
+    except Exception as e:
+        events.put(('error', os.getpid(), f"{type(e).__name__}: {e}"))
+        raise
+    events.put(('ready', os.getpid()))
+    print(f"[worker {os.getpid()}] listo con '{default_model}' ({engine_name}, {threads} hilos)")
+
+
+def _worker_ping() -> int:
+    return os.getpid()
+
+
+def _worker_transcribe(audio, model_name: str, language: str) -> List[Dict[str, Any]]:
+    """Transcribe en el worker y devuelve solo lo necesario (start, end, text)."""
+    model = _worker_registry.get(model_name)
+    return _worker_engine.transcribe(model, audio, language=language)
+
+
+class WhisperProcessPool:
+    """
+    Pool de procesos Whisper: cada worker carga el modelo una vez, usa su propio
+    presupuesto de hilos (torch o CTranslate2) y recibe trabajos por la cola del pool.
+    Con N workers se transcriben N audios en paralelo sin competir por el GIL.
+    """
+
+    def __init__(self, workers: int, default_model: str, engine_name: str = "whisper", threads_per_worker: int = None, max_resident: int = 1):
+        cpu_count = os.cpu_count() or 1
+        self.workers = max(1, workers)
+        self.default_model = default_model
+        self.engine_name = engine_name
+        self.threads_per_worker = threads_per_worker or max(1, cpu_count // self.workers)
+        self.max_resident = max_resident
+        # pids de los workers que ya cargaron su modelo (un ping puede responderlo el mismo worker varias veces)
+        self.ready_pids = set()
+        self.last_error = None
+        self._lock = threading.Lock()
+        # 'spawn' evita heredar el estado de torch/hilos del proceso padre
+        self._context = multiprocessing.get_context("spawn")
+        self._events = self._context.SimpleQueue()
+        threading.Thread(target=self._listen, daemon=True, name="whisper-pool-events").start()
+        self._executor = self._new_executor()
+
+    def _new_executor(self) -> ProcessPoolExecutor:
+        return ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=self._context,
+            initializer=_init_worker,
+            initargs=(self.engine_name, self.default_model, self.threads_per_worker, self.max_resident, self._events),
+        )
+
+    def _listen(self):
+        """Recoge los avisos de arranque de los workers."""
+        while True:
+            event = self._events.get()
+            with self._lock:
+                if event[0] == 'ready':
+                    self.ready_pids.add(event[1])
+                else:
+                    self.last_error = f"worker {event[1]}: {event[2]}"
+            if event[0] != 'ready':
+                print(f"⚠️ Worker de Whisper no pudo cargar el modelo ({self.last_error})")
+
+    def warm_up(self):
+        """
+        Arranca todos los workers (cada uno carga su modelo) sin bloquear: el pool crea un proceso
+        por trabajo enviado mientras no haya workers libres. La disponibilidad la dan los avisos
+        de cada worker, no las respuestas a los pings.
+        """
+        for _ in range(self.workers):
+            self._executor.submit(_worker_ping).add_done_callback(self._on_ping)
+
+    def _on_ping(self, future):
+        try:
+            future.result()
+        except Exception as e:
+            print(f"⚠️ Worker de Whisper no pudo arrancar: {e}")
+
+    def transcribe(self, audio, model_name: str = None, language: str = "it") -> List[Dict[str, Any]]:
+        """Envía un trabajo al pool y espera sus segmentos."""
+        args = (_worker_transcribe, audio, model_name or self.default_model, language)
+        executor = self._executor
+        try:
+            return executor.submit(*args).result()
+        except BrokenProcessPool:
+            # Un worker murió (p.ej. por falta de memoria): recrear el pool y reintentar una vez
+            print("⚠️ Pool de Whisper roto. Recreando workers...")
+            with self._lock:
+                if self._executor is executor:
+                    self._executor = self._new_executor()
+                    self.ready_pids = set()
+            return self._executor.submit(*args).result()
+
+    def status(self) -> Dict[str, Any]:
+        with self._lock:
+            ready = min(len(self.ready_pids), self.workers)
+            last_error = self.last_error
+        return {
+            'ready': ready >= self.workers,
+            'workers': self.workers,
+            'ready_workers': ready,
+            'threads_per_worker': self.threads_per_worker,
+            'error': last_error,
+        }
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)